@@ -1,7 +1,9 @@
 from datetime import date
-from key_gen import ALLOWED_KEYS  # type: ignore #contain public key
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import hashes
+from typing import NamedTuple
+from key_gen import ALLOWED_KEYS, signing_scheme, verification_key  # type: ignore #contain public key
+from signatures import get_scheme
+from verify_cache import VERIFY_CACHE
+from instrumentation import INSTRUMENTS
 
 
 # Custom Exception
@@ -9,57 +11,190 @@ from cryptography.hazmat.primitives import hashes
 class RuleViolation(Exception):
     pass
 
+
+MISSING_FIELDS = "Missing important medicine info."
+EXPIRED = "Medicine is expired."
+
+
+class TransferContext(NamedTuple):
+    """Everything a rule may look at for one pending transfer."""
+    data: object        # block.data as decrypted by the buyer
+    location: str
+    add_by: str         # the buyer
+    signature: bytes
+    payload: str
+    sender: str
+    scheme: str = None
+
+
+class Rule:
+    """
+    One smart contract check. cost is relative (1 = a dict lookup, 100 = an RSA
+    verify); the engine runs rules cheapest first and stops at the first violation.
+    Rules that only look at the medicine data can also implement check_batch.
+    """
+    name = "rule"
+    cost = 1
+
+    def check(self, engine, transfer: TransferContext):
+        raise NotImplementedError
+
+    def check_batch(self, data_objs, today_ordinal: int) -> list:
+        """One message (or None if the rule passed) per data object; None means not batchable."""
+        return None
+
+
+class AuthorizationRule(Rule):
+    name = "authorization"
+    cost = 1
+
+    def check(self, engine, transfer):
+        engine._check_authorization(transfer.add_by)
+
+
+class RequiredFieldsRule(Rule):
+    name = "required_fields"
+    cost = 1
+
+    def check(self, engine, transfer):
+        engine._check_required_fields(transfer.data)
+
+    def check_batch(self, data_objs, today_ordinal):
+        return [None if d.name and d.manufacturer and d.batch_id else MISSING_FIELDS for d in data_objs]
+
+
+class ExpiryRule(Rule):
+    name = "expiry"
+    cost = 2
+
+    def check(self, engine, transfer):
+        engine._check_expiry(transfer.data)
+
+    def check_batch(self, data_objs, today_ordinal):
+        # Comparing proleptic day numbers, one today() for the whole batch
+        return [EXPIRED if d.expiry_date.toordinal() <= today_ordinal else None for d in data_objs]
+
+
+class DuplicateBatchRule(Rule):
+    name = "duplicate_batch"
+    cost = 3
+
+    def check(self, engine, transfer):
+        engine._check_duplicate_batch(transfer.data.batch_id)
+
+
+class SignatureRule(Rule):
+    name = "signature"
+    cost = 100
+
+    def check(self, engine, transfer):
+        engine._verify_signature(transfer.signature, transfer.payload, transfer.sender, transfer.scheme)
+
+
+# Rule set every new RuleEngine starts from; deployments can add to or replace it
+DEFAULT_RULES = [AuthorizationRule(), RequiredFieldsRule(), ExpiryRule(), DuplicateBatchRule(), SignatureRule()]
+
+
 class RuleEngine:
-    def __init__(self, blockchain_ref):
+    def __init__(self, blockchain_ref, rules=None):
         self.blockchain = blockchain_ref
+        self._rules = []
+        for rule in DEFAULT_RULES if rules is None else rules:
+            self.register(rule)
+
+    @property
+    def rules(self) -> list:
+        """Registered rules in the order they run."""
+        return list(self._rules)
+
+    def register(self, rule: Rule):
+        """Adds a rule; the list stays sorted by cost, ties keep registration order."""
+        if any(existing.name == rule.name for existing in self._rules):
+            raise ValueError(f"A rule named '{rule.name}' is already registered")
+        self._rules.append(rule)
+        self._rules.sort(key=lambda r: r.cost)
+
+    def unregister(self, name: str):
+        self._rules = [rule for rule in self._rules if rule.name != name]
+
+    def enforce_all_rules(self, data_obj, location, add_by, signature,payload,sender, scheme=None):
 
-    def enforce_all_rules(self, data_obj, location, add_by, signature,payload,sender):
-        
 
-        #Apply all smart contract validations.
+        #Apply all smart contract validations, cheapest first so a doomed transfer never reaches RSA
+        transfer = TransferContext(data_obj, location, add_by, signature, payload, sender, scheme)
+        for rule in self._rules:
+            try:
+                rule.check(self, transfer)
+            except RuleViolation:
+                INSTRUMENTS.count("rule_violations_total", rule=rule.name)
+                raise
+
+    def precheck(self, data_obj):
+        """The data-only rules for one transfer, cheap enough to run before any crypto."""
+        violation = self.evaluate_batch([data_obj])[0]
+        if violation is not None:
+            raise violation
+
+    def evaluate_batch(self, data_objs, today: date = None) -> list:
+        """
+        Runs every batchable rule (fields, expiry, ...) over many pending transfers at once.
+        Returns one RuleViolation per data object, or None where all of them passed.
+        The date is read once for the whole batch.
+        """
+        data_objs = list(data_objs)
+        today_ordinal = (today or date.today()).toordinal()
+        results = [None] * len(data_objs)
+        pending = list(range(len(data_objs)))
+        for rule in self._rules:
+            if not pending:
+                break
+            messages = rule.check_batch([data_objs[position] for position in pending], today_ordinal)
+            if messages is None:
+                continue
+            still_pending = []
+            for position, message in zip(pending, messages):
+                if message is None:
+                    still_pending.append(position)
+                else:
+                    results[position] = RuleViolation(message)
+                    INSTRUMENTS.count("rule_violations_total", rule=rule.name)
+            pending = still_pending
+        return results
 
-        self._check_authorization(add_by)
-        self._verify_signature( signature,payload,sender)
-        self._check_required_fields(data_obj)
-        self._check_expiry(data_obj)
-        #self._check_duplicate_batch(data_obj.batch_id) for future expansion 
-        
 
-  
     def _check_authorization(self, add_by):
         #checking if add_by which is infact buyer is even allow to buy or not
         if add_by not in ALLOWED_KEYS:
             raise RuleViolation(f"{add_by} is not authorized to add blocks(buy medicine).")
 
-    
 
-    def _verify_signature(self,signature,payload,sender):
+
+    def _verify_signature(self,signature,payload,sender, scheme=None):
         # Signature verification step:
        # This confirms that the payload was signed by the actual sender using their private key.
-       #Note add_by is buyer and sender is current owner seller 
+       #Note add_by is buyer and sender is current owner seller
        # This must match the public key of the entity initiating the transfer.
-        public_key = ALLOWED_KEYS[sender] 
+       # scheme is the one recorded for the transfer, by default the sender's current one
+        scheme = scheme or signing_scheme(sender)
         try:
-            public_key.verify(
-                signature,
-                payload.encode('utf-8'),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            public_key = verification_key(sender, scheme)
+            # Usually a cache hit: receive_transfer verified the same signature moments ago
+            VERIFY_CACHE.verify(get_scheme(scheme), public_key, signature, payload.encode('utf-8'))
         except Exception:
             raise RuleViolation("Invalid digital signature.")
 
     def _check_required_fields(self, data_obj):
         if not all([data_obj.name, data_obj.manufacturer, data_obj.batch_id]):
-            raise RuleViolation("Missing important medicine info.")
+            raise RuleViolation(MISSING_FIELDS)
 
     def _check_expiry(self, data_obj):
         if data_obj.expiry_date <= date.today():
-            raise RuleViolation("Medicine is expired.")
-        
-
+            raise RuleViolation(EXPIRED)
 
-    
+    def _check_duplicate_batch(self, batch_id):
+        # The batch must have been minted by this very chain, anything else is a clone
+        index = self.blockchain.batch_index
+        if index is None:
+            return
+        if index.origin(batch_id) != self.blockchain.blocks.get(1).hash:
+            raise RuleViolation(f"Batch {batch_id} was not minted by this chain, possible clone.")
@@ -1,15 +1,35 @@
 from datetime import date
 from block import data
-from key_gen import ALLOWED_KEYS, PRIVATE_KEYS
+from key_gen import ALLOWED_KEYS, PRIVATE_KEYS, signing_key, signing_scheme, verification_key
+from signatures import get_scheme
+from verify_cache import VERIFY_CACHE
+from instrumentation import INSTRUMENTS, WARNING
+import key_gen
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import hashlib
 import json
+import os
+import struct
+import threading
+import time
 import zlib
 
 class SecureTransfer:
     
     MAX_ENCRYPTABLE_SIZE = 214  # For RSA-2048
 
+    # Hybrid envelope: MAGIC | wrapped key length (u16) | RSA-OAEP wrapped AES key | nonce | AES-GCM ciphertext
+    HYBRID_MAGIC = b"MCHY1"
+    NONCE_SIZE = 12
+    SESSION_KEY_TTL = 300.0  # seconds a wrapped session key is reused for one seller/buyer pair
+    MAX_SESSION_KEYS = 10_000  # per cache; the oldest entries go first beyond that
+
+    _session_lock = threading.Lock()
+    _session_keys = {}    # (seller, buyer) -> (aes key, wrapped key, expires at)
+    _unwrapped_keys = {}  # (buyer, digest of wrapped key) -> (aes key, expires at)
+
     @staticmethod
     def _compress_data(data_dict: dict) -> bytes:
         """Compress data to stay within size limits"""
@@ -33,8 +53,8 @@ class SecureTransfer:
         return compressed
 
     @staticmethod
-    def _serialize_block(block) -> bytes:
-        """Safe serialization of block data"""
+    def _serialize_block(block, lossless: bool = False) -> bytes:
+        """Safe serialization of block data, lossless skips the RSA size trimming"""
         data_dict = {
             'batch_id': block.data.batch_id,
             'name': block.data.name,
@@ -43,16 +63,120 @@ class SecureTransfer:
             'index': block.index,
             'owner': block.current_owner
         }
+        if lossless:
+            return zlib.compress(json.dumps(data_dict, separators=(',', ':')).encode('utf-8'))
         return SecureTransfer._compress_data(data_dict)
+
+    @staticmethod
+    def _oaep():
+        return padding.OAEP(
+            mgf=padding.MGF1(hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None
+        )
+
+    @staticmethod
+    def _store_session(cache: dict, cache_key, entry: tuple, now: float):
+        """Inserts entry (expiry last) with _session_lock held, dropping expired and excess entries."""
+        # Re-inserting keeps the dict in expiry order (every entry gets the same TTL),
+        # so everything expired sits at the front
+        cache.pop(cache_key, None)
+        cache[cache_key] = entry
+        while cache:
+            oldest = next(iter(cache))
+            if cache[oldest][-1] > now and len(cache) <= SecureTransfer.MAX_SESSION_KEYS:
+                break
+            del cache[oldest]
+
+    @staticmethod
+    def _session_key(seller: str, buyer: str) -> tuple[bytes, bytes]:
+        """AES key for this seller/buyer pair plus its RSA-wrapped form, reused until the TTL runs out."""
+        now = time.monotonic()
+        with SecureTransfer._session_lock:
+            cached = SecureTransfer._session_keys.get((seller, buyer))
+            if cached and cached[2] > now:
+                return cached[0], cached[1]
+
+        key = AESGCM.generate_key(bit_length=256)
+        wrapped_key = ALLOWED_KEYS[buyer].encrypt(key, SecureTransfer._oaep())
+        with SecureTransfer._session_lock:
+            SecureTransfer._store_session(SecureTransfer._session_keys, (seller, buyer),
+                                          (key, wrapped_key, now + SecureTransfer.SESSION_KEY_TTL), now)
+        return key, wrapped_key
+
+    @staticmethod
+    def _unwrap_key(buyer: str, wrapped_key: bytes) -> bytes:
+        """Buyer side of _session_key: one RSA decrypt per wrapped key and TTL window."""
+        now = time.monotonic()
+        cache_key = (buyer, hashlib.sha256(wrapped_key).digest())
+        with SecureTransfer._session_lock:
+            cached = SecureTransfer._unwrapped_keys.get(cache_key)
+            if cached and cached[1] > now:
+                return cached[0]
+
+        key = PRIVATE_KEYS[buyer].decrypt(wrapped_key, SecureTransfer._oaep())
+        with SecureTransfer._session_lock:
+            SecureTransfer._store_session(SecureTransfer._unwrapped_keys, cache_key,
+                                          (key, now + SecureTransfer.SESSION_KEY_TTL), now)
+        return key
+
+    @staticmethod
+    def clear_session_keys():
+        """Forgets every cached session key, e.g. after a stakeholder's RSA key changed."""
+        with SecureTransfer._session_lock:
+            SecureTransfer._session_keys.clear()
+            SecureTransfer._unwrapped_keys.clear()
+
+    @staticmethod
+    def _on_key_change(name: str):
+        """Session keys wrapped for (or by) a rotated/revoked stakeholder must not be reused."""
+        with SecureTransfer._session_lock:
+            for pair in [pair for pair in SecureTransfer._session_keys if name in pair]:
+                del SecureTransfer._session_keys[pair]
+            for cached in [cached for cached in SecureTransfer._unwrapped_keys if cached[0] == name]:
+                del SecureTransfer._unwrapped_keys[cached]
+
+    @staticmethod
+    def _seal_hybrid(seller: str, buyer: str, plaintext: bytes) -> bytes:
+        key, wrapped_key = SecureTransfer._session_key(seller, buyer)
+        nonce = os.urandom(SecureTransfer.NONCE_SIZE)
+        # Binding the parties as associated data stops an envelope being replayed to another pair
+        ciphertext = AESGCM(key).encrypt(nonce, plaintext, f"{seller}|{buyer}".encode('utf-8'))
+        return (SecureTransfer.HYBRID_MAGIC + struct.pack(">H", len(wrapped_key))
+                + wrapped_key + nonce + ciphertext)
+
+    @staticmethod
+    def _open_hybrid(seller: str, buyer: str, envelope: bytes) -> bytes:
+        start = len(SecureTransfer.HYBRID_MAGIC)
+        (key_length,) = struct.unpack_from(">H", envelope, start)
+        start += 2
+        wrapped_key = envelope[start:start + key_length]
+        start += key_length
+        nonce = envelope[start:start + SecureTransfer.NONCE_SIZE]
+        ciphertext = envelope[start + SecureTransfer.NONCE_SIZE:]
+        try:
+            key = SecureTransfer._unwrap_key(buyer, wrapped_key)
+            return AESGCM(key).decrypt(nonce, ciphertext, f"{seller}|{buyer}".encode('utf-8'))
+        except Exception as e:
+            raise ValueError(f"Hybrid envelope could not be opened by {buyer}: {e!r}")
     
     @staticmethod
-    def initiate_transfer(initiated_by: str, buyer: str, block,payload_to_sign:bytes) -> tuple[bytes, bytes]:
+    def initiate_transfer(initiated_by: str, buyer: str, block,payload_to_sign:bytes, hybrid: bool = False,
+                          scheme: str = None) -> tuple[bytes, bytes]:
         """Encrypts the block data for the buyer and signs the payload using sender's private key"""
         """Initiate a secure transfer with  signature"""
         if not block.is_legitimate_owner(initiated_by):
             raise ValueError("Sender lacks ownership rights")
 
         try:
+            # Hybrid mode seals the full block with AES-GCM under an RSA-wrapped session key, no size limit
+            if hybrid:
+                with INSTRUMENTS.phase("encrypt"):
+                    encrypted_block = SecureTransfer._seal_hybrid(
+                        initiated_by, buyer, SecureTransfer._serialize_block(block, lossless=True)
+                    )
+                return encrypted_block, SecureTransfer._sign(initiated_by, payload_to_sign, scheme)
+
             block_bytes = SecureTransfer._serialize_block(block)
             if len(block_bytes) > SecureTransfer.MAX_ENCRYPTABLE_SIZE:
                 raise ValueError(
@@ -60,62 +184,53 @@ class SecureTransfer:
                     f"Maximum allowed: {SecureTransfer.MAX_ENCRYPTABLE_SIZE}"
                 )
              # Encrypt block using buyer's/add_by public key  
-            encrypted_block = ALLOWED_KEYS[buyer].encrypt(
-                block_bytes,
-                padding.OAEP(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
+            with INSTRUMENTS.phase("encrypt"):
+                encrypted_block = ALLOWED_KEYS[buyer].encrypt(block_bytes, SecureTransfer._oaep())
             
             # Sign the specific transfer payload with sender/seller private key 
-            signature = PRIVATE_KEYS[initiated_by].sign(
-                payload_to_sign,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            signature = SecureTransfer._sign(initiated_by, payload_to_sign, scheme)
             # Return encrypted block (only buyer can decrypt) and sender's digital signature (used to verify authenticity)
             return encrypted_block, signature
             
         except Exception as e:
             raise ValueError(f"Transfer initiation failed: {str(e)}")
 
+    @staticmethod
+    def _sign(initiated_by: str, payload_to_sign: bytes, scheme: str = None) -> bytes:
+        # scheme None means whatever the sender currently signs with
+        scheme = scheme or signing_scheme(initiated_by)
+        with INSTRUMENTS.phase("sign"):
+            return get_scheme(scheme).sign(signing_key(initiated_by, scheme), payload_to_sign)
+
     @staticmethod
     def receive_transfer(initiated_by: str, buyer: str, 
                        encrypted_block: bytes, new_location: str, 
-                       signature: bytes,original_payload:bytes) -> tuple[data, str, str, bytes]:
+                       signature: bytes,original_payload:bytes, scheme: str = None) -> tuple[data, str, str, bytes]:
         """Transfer receive verifies sender's signature and decrypts the received block data."""
          # Signature must be verified before decrypting the payload
         try:
             
-            ALLOWED_KEYS[initiated_by].verify(
-                signature,
-                original_payload,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            scheme = scheme or signing_scheme(initiated_by)
+            with INSTRUMENTS.phase("verify"):
+                VERIFY_CACHE.verify(get_scheme(scheme), verification_key(initiated_by, scheme), signature, original_payload)
         except ValueError as e:
-            print("The payout is being corrupted")
+            INSTRUMENTS.count("signature_failures_total")
+            INSTRUMENTS.event(WARNING, "transfer.payload_corrupted", sender=initiated_by, buyer=buyer, error=e)
+        except Exception:
+            INSTRUMENTS.count("signature_failures_total")
+            raise
         
         try:
-            # Decrypt with buyer's private key
-            decrypted_bytes = PRIVATE_KEYS[buyer].decrypt(
-                encrypted_block,
-                padding.OAEP(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    algorithm=hashes.SHA256(),
-                    label=None
-                )
-            )
-        except ValueError as e:
-            print("The buyer is not authorised")
+            with INSTRUMENTS.phase("decrypt"):
+                if encrypted_block.startswith(SecureTransfer.HYBRID_MAGIC):
+                    decrypted_bytes = SecureTransfer._open_hybrid(initiated_by, buyer, encrypted_block)
+                else:
+                    # Legacy format: the whole block was OAEP-encrypted with buyer's public key
+                    decrypted_bytes = PRIVATE_KEYS[buyer].decrypt(encrypted_block, SecureTransfer._oaep())
+        except Exception as e:
+            INSTRUMENTS.count("decryption_failures_total")
+            INSTRUMENTS.event(WARNING, "transfer.decryption_failed", sender=initiated_by, buyer=buyer, error=e)
+            raise
             # Handle both compressed and uncompressed data
         try:
             decompressed = zlib.decompress(decrypted_bytes).decode('utf-8')
@@ -134,4 +249,7 @@ class SecureTransfer:
             buyer,
             signature# The sender's digital signature over the original transfer payload.
                     # This proves authenticity (only sender could have signed) and integrity (payload unchanged).
-        )
\ No newline at end of file
+        )
+
+
+key_gen.KEY_CHANGE_LISTENERS.append(SecureTransfer._on_key_change)
@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from block import Block, data
+from blockchain import BlockChain
+
+
+class AsyncLedger:
+    """
+    asyncio front-end for chain creation, transfers and validation.
+    The blocking RSA work runs on a bounded executor, appends to the same chain
+    are serialized by a per-chain asyncio.Lock while different chains proceed
+    concurrently, and at most max_in_flight operations run at once; callers
+    beyond that wait (backpressure) instead of piling work onto the executor.
+    """
+
+    def __init__(self, max_workers: int = None, max_in_flight: int = 64, executor=None):
+        self.max_in_flight = max_in_flight
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+        self._owns_executor = executor is None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._chain_locks = weakref.WeakKeyDictionary()     # chain -> asyncio.Lock
+        self.in_flight = 0
+
+    def _lock_for(self, chain: BlockChain) -> asyncio.Lock:
+        lock = self._chain_locks.get(chain)
+        if lock is None:
+            lock = self._chain_locks[chain] = asyncio.Lock()
+        return lock
+
+    async def _offload(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def _bounded(self, coroutine):
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await coroutine
+            finally:
+                self.in_flight -= 1
+
+    async def create_chain(self, medicine_data: data, creator_id: str, initial_location: str, **kwargs) -> BlockChain:
+        return await self._bounded(self._offload(BlockChain, medicine_data, creator_id, initial_location, **kwargs))
+
+    async def transfer(self, chain: BlockChain, buyer: str, new_status: str, new_location: str) -> Block:
+        """Awaitable secure_add_block; hops on one chain are applied in call order."""
+        # Chain lock before the slot: hops queued on one busy batch must not hold
+        # slots that other batches could use while they wait for their turn
+        async with self._lock_for(chain):
+            # The whole call, fsync and ChainConflict retries included, runs off the event loop
+            return await self._bounded(self._offload(chain.secure_add_block, buyer, new_status, new_location))
+
+    async def validate(self, chain: BlockChain, deep: bool = False) -> bool:
+        async with self._lock_for(chain):
+            return await self._bounded(self._offload(chain.validate, deep))
+
+    async def close(self):
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,247 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from cryptography.hazmat.primitives import serialization
+
+import key_gen
+from block import Block
+from blockchain import BlockChain
+from segment_log import SegmentReader
+from signatures import get_scheme
+
+
+class Finding(NamedTuple):
+    index: int      # block the problem was found at
+    kind: str       # unreadable, torn_tail, hash_mismatch, broken_link, bad_history, unknown_signer, bad_signature
+    detail: str
+
+
+@dataclass
+class ChainAudit:
+    path: str               # segment path, or None for an in-memory chain
+    batch_id: object = None
+    blocks: int = 0
+    findings: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.findings
+
+
+@dataclass(frozen=True)
+class AuditProgress:
+    chains_done: int
+    chains_total: int       # including chains skipped because an earlier run audited them
+    blocks: int
+    elapsed: float
+
+    @property
+    def blocks_per_s(self) -> float:
+        return self.blocks / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def chains_per_s(self) -> float:
+        return self.chains_done / self.elapsed if self.elapsed else 0.0
+
+
+def _signed_by(block: Block, previous: Block):
+    """(signer, payload) the block's stored signature must verify against."""
+    if block.index == 1:
+        # The creator signed the manufacturing block itself
+        return block.added_by, BlockChain.build_payload(block.data, block.location, block.added_by)
+    # A transfer block carries the seller's signature over the block it was sold from
+    signer = previous.current_owner
+    return signer, BlockChain.build_payload(previous.data, previous.location, signer)
+
+
+def audit_blocks(blocks, public_key, audit: ChainAudit) -> ChainAudit:
+    """
+    Checks hash links and every stored signature while streaming blocks once.
+    public_key(signer, scheme) returns the key or None; findings go into audit.
+    A Block's hash is computed from its fields, so stored hashes are checked
+    where the records are decoded (_iter_segment).
+    """
+    previous = None
+    for block in blocks:
+        audit.blocks += 1
+        if audit.batch_id is None and block.index > 0:
+            audit.batch_id = block.data.batch_id
+        if previous is not None and (block.index != previous.index + 1 or block.previous_hash != previous.hash):
+            audit.findings.append(Finding(block.index, "broken_link", f"does not link to block {previous.index}"))
+        # Each transfer adds the seller to the owners before it, and nothing else
+        if previous is not None and block.index > 1 and block.history != previous.history.append(previous.current_owner):
+            audit.findings.append(Finding(block.index, "bad_history", f"past owners do not follow block {previous.index}"))
+
+        if block.index > 0:
+            signer, payload = _signed_by(block, previous) if (previous or block.index == 1) else (None, None)
+            key = public_key(signer, block.sig_scheme) if signer else None
+            if key is None:
+                audit.findings.append(Finding(block.index, "unknown_signer", f"no {block.sig_scheme} key for {signer}"))
+            else:
+                try:
+                    get_scheme(block.sig_scheme).verify(key, block.signature, payload.encode('utf-8'))
+                except Exception:
+                    audit.findings.append(Finding(block.index, "bad_signature", f"signature of {signer} does not verify"))
+        previous = block
+    return audit
+
+
+def _iter_segment(segment: SegmentReader, audit: ChainAudit):
+    # Decodes one record at a time; blocks only link back weakly, so finished ones can be freed
+    # and only the (shared) history nodes of the current block stay alive
+    previous = None
+    for position in range(len(segment)):
+        try:
+            record = json.loads(segment.read(position))
+            block = Block.from_record(record, previous, check_hash=False)
+        except (KeyError, TypeError, ValueError) as e:
+            # A record that will not decode (torn, checksum) ends the walk of this chain
+            audit.findings.append(Finding(position, "unreadable", str(e)))
+            return
+        if block.hash != record['hash']:
+            audit.findings.append(Finding(position, "hash_mismatch", "stored hash does not match the block"))
+        yield block
+        previous = block
+
+
+def _current_key(signer, scheme):
+    try:
+        return key_gen.verification_key(signer, scheme)
+    except (KeyError, ValueError):
+        return None
+
+
+def audit_chain(chain: BlockChain) -> ChainAudit:
+    """Audits an in-memory chain with the keys this process holds."""
+    start = time.perf_counter()
+    audit = audit_blocks(chain.blocks.iter_forward(), _current_key, ChainAudit(path=None))
+    audit.seconds = time.perf_counter() - start
+    return audit
+
+
+def public_key_pems(names=None) -> dict:
+    """{(stakeholder, scheme): public key PEM} for handing keys to worker processes."""
+    names = set(key_gen.stakeholders) if names is None else set(names)
+    pairs = {(name, key_gen.DEFAULT_SCHEME) for name in names}
+    pairs |= {(name, scheme) for name, scheme in key_gen.VERIFY_KEYS if name in names}
+    pems = {}
+    for name, scheme in pairs:
+        key = _current_key(name, scheme)
+        if key is not None:
+            pems[(name, scheme)] = key.public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+    return pems
+
+
+# ---- Worker side ----
+
+_WORKER_KEYS = {}
+
+
+def _init_worker(pems: dict):
+    _WORKER_KEYS.clear()
+    for signer_scheme, pem in pems.items():
+        _WORKER_KEYS[signer_scheme] = serialization.load_pem_public_key(pem)
+
+
+def _worker_key(signer, scheme):
+    return _WORKER_KEYS.get((signer, scheme))
+
+
+def _audit_segment(path: str, public_key=_worker_key) -> ChainAudit:
+    start = time.perf_counter()
+    audit = ChainAudit(path=path)
+    try:
+        # Read-only: a missing file must not be created, nor a torn tail cut off before it is reported
+        with SegmentReader(path) as segment:
+            audit_blocks(_iter_segment(segment, audit), public_key, audit)
+            if segment.torn_index_bytes:
+                audit.findings.append(Finding(len(segment), "torn_tail",
+                                              f"{segment.torn_index_bytes} bytes of a partial index entry"))
+            if segment.unindexed_bytes:
+                audit.findings.append(Finding(len(segment), "torn_tail",
+                                              f"{segment.unindexed_bytes} bytes after the last indexed record"))
+    except Exception as e:
+        audit.findings.append(Finding(audit.blocks, "unreadable", str(e)))
+    audit.seconds = time.perf_counter() - start
+    return audit
+
+
+class AuditEngine:
+    """
+    Audits persisted chains (SegmentLog paths) on a process pool: every hash,
+    every link and every stored signature, against the signers' public keys.
+
+    Results stream back as chains finish, with at most a few chains per worker
+    in flight. With state_path each finished chain is appended to a JSON-lines
+    file and a later run over the same paths skips them, so an interrupted audit
+    resumes where it stopped. processes=0 audits in the calling process.
+    """
+
+    def __init__(self, processes: int = None, state_path: str = None, progress=None, keys: dict = None):
+        self.processes = os.cpu_count() if processes is None else processes
+        self.state_path = state_path
+        self.progress = progress            # progress(AuditProgress) after every chain
+        self.keys = keys                    # public_key_pems() output, default: every key known here
+
+    def completed(self) -> set:
+        """Paths an earlier run already audited."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return set()
+        with open(self.state_path, encoding="utf-8") as f:
+            return {json.loads(line)["path"] for line in f if line.strip()}
+
+    def _record(self, audit: ChainAudit):
+        if not self.state_path:
+            return
+        with open(self.state_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "path": audit.path, "batch_id": audit.batch_id, "blocks": audit.blocks,
+                "findings": [list(finding) for finding in audit.findings],
+            }, default=str) + "\n")
+
+    def _results(self, paths):
+        if self.processes == 0:
+            _init_worker(self.keys if self.keys is not None else public_key_pems())
+            for path in paths:
+                yield _audit_segment(path)
+            return
+
+        window = 2 * self.processes
+        with ProcessPoolExecutor(
+            max_workers=self.processes, initializer=_init_worker,
+            initargs=(self.keys if self.keys is not None else public_key_pems(),)
+        ) as pool:
+            paths = iter(paths)
+            pending = set()
+            while True:
+                for path in paths:
+                    pending.add(pool.submit(_audit_segment, path))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def run(self, paths):
+        """Yields one ChainAudit per path not audited before, as they complete."""
+        paths = list(paths)
+        done_before = self.completed()
+        todo = [path for path in paths if path not in done_before]
+        start = time.perf_counter()
+        chains, blocks = len(paths) - len(todo), 0
+        for audit in self._results(todo):
+            self._record(audit)
+            chains += 1
+            blocks += audit.blocks
+            if self.progress is not None:
+                self.progress(AuditProgress(chains, len(paths), blocks, time.perf_counter() - start))
+            yield audit
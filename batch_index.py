@@ -0,0 +1,232 @@
+import hashlib
+import math
+import sqlite3
+import threading
+
+from RuleEngine import RuleViolation
+
+
+def batch_key(batch_id) -> str:
+    """Canonical form of a batch ID; 101 and "101" are the same physical batch."""
+    return str(batch_id).strip()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter. False positives happen at about error_rate once
+    capacity items are in; false negatives never do.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher: k indexes from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows instead of degrading: once the current filter holds
+    its capacity a new one twice as large, at half the error rate, is stacked on.
+    The overall false-positive rate stays under about 2 * error_rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self._filters = [BloomFilter(capacity, error_rate / 2)]
+
+    def add(self, key: str):
+        current = self._filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * 2, current.error_rate / 2)
+            self._filters.append(current)
+        current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return any(key in bloom for bloom in self._filters)
+
+    @property
+    def count(self) -> int:
+        return sum(bloom.count for bloom in self._filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bloom.nbytes for bloom in self._filters)
+
+
+class BatchIndex:
+    """
+    Every batch ID ever minted, with the hash of the block that created it.
+    A Bloom filter answers "never seen" without touching the exact store; only
+    possible hits go on to it. With path the exact store is an SQLite file, so
+    memory stays at the filter (~2 MB per million IDs at the default error
+    rate) even for tens of millions of batches; without it a dict is used.
+    The filter starts at capacity (or twice the IDs already in the file, if
+    more) and grows when it fills, so the error rate holds either way.
+    """
+
+    def __init__(self, path: str = None, capacity: int = 1_000_000, error_rate: float = 0.001):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conflicts = []             # (batch_id, origin hash) clones found by rebuild()
+        self.exact_lookups = 0          # queries the filter could not answer alone
+        self._deferred_commit = False   # rebuild() commits once at the end
+        if path is None:
+            self._origins = {}
+            self._db = None
+            self._bloom = ScalableBloomFilter(capacity, error_rate)
+        else:
+            self._origins = None
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS batches (batch_id TEXT PRIMARY KEY, origin TEXT NOT NULL)")
+            existing = self._db.execute("SELECT COUNT(*) FROM batches").fetchone()[0]
+            self._bloom = ScalableBloomFilter(max(capacity, 2 * existing), error_rate)
+            for (key,) in self._db.execute("SELECT batch_id FROM batches"):
+                self._bloom.add(key)
+
+    def _lookup(self, key: str):
+        self.exact_lookups += 1
+        if self._db is None:
+            return self._origins.get(key)
+        row = self._db.execute("SELECT origin FROM batches WHERE batch_id = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def origin(self, batch_id) -> str:
+        """Hash of the block that minted batch_id, or None if it was never registered."""
+        key = batch_key(batch_id)
+        if key not in self._bloom:
+            return None
+        with self._lock:
+            return self._lookup(key)
+
+    def __contains__(self, batch_id) -> bool:
+        return self.origin(batch_id) is not None
+
+    def register(self, batch_id, origin_hash: str):
+        """
+        Claims batch_id for the chain whose creation block hashes to origin_hash.
+        Re-registering the same origin is a no-op; a different origin is a clone
+        and raises RuleViolation.
+        """
+        key = batch_key(batch_id)
+        with self._lock:
+            existing = self._lookup(key) if key in self._bloom else None
+            if existing is not None:
+                if existing != origin_hash:
+                    raise RuleViolation(f"Batch {batch_id} already exists, refusing to mint a clone.")
+                return
+            if self._db is None:
+                self._origins[key] = origin_hash
+            else:
+                self._db.execute("INSERT INTO batches VALUES (?, ?)", (key, origin_hash))
+                if not self._deferred_commit:
+                    self._db.commit()
+            self._bloom.add(key)
+
+    def release(self, batch_id, origin_hash: str):
+        """
+        Drops the claim register() made for origin_hash, if it is still the one
+        on record; for a mint that failed after registering. The filter keeps the
+        key, which only costs an exact lookup on it later.
+        """
+        key = batch_key(batch_id)
+        with self._lock:
+            if key not in self._bloom or self._lookup(key) != origin_hash:
+                return
+            if self._db is None:
+                del self._origins[key]
+            else:
+                self._db.execute("DELETE FROM batches WHERE batch_id = ?", (key,))
+                if not self._deferred_commit:
+                    self._db.commit()
+
+    def backfill(self, chains) -> list:
+        """
+        Registers the origin of every chain given (chains minted before the index
+        was installed), first come first served. Returns the clones found, which
+        are also added to .conflicts.
+        """
+        found = []
+        for chain in chains:
+            if len(chain.blocks) < 2:
+                continue
+            origin = chain.blocks.get(1)
+            try:
+                self.register(origin.data.batch_id, origin.hash)
+            except RuleViolation:
+                found.append((origin.data.batch_id, origin.hash))
+        self.conflicts.extend(found)
+        return found
+
+    def __len__(self):
+        with self._lock:
+            if self._db is None:
+                return len(self._origins)
+            return self._db.execute("SELECT COUNT(*) FROM batches").fetchone()[0]
+
+    @classmethod
+    def rebuild(cls, segments, **kwargs):
+        """
+        Re-creates the index from persisted chains (SegmentLogs), first come first
+        served in the order given. Clones are collected in .conflicts, not raised.
+        """
+        index = cls(**kwargs)
+        index._deferred_commit = True
+        try:
+            for segment in segments:
+                if len(segment) < 2:
+                    continue
+                origin = segment.get(1)
+                try:
+                    index.register(origin.data.batch_id, origin.hash)
+                except RuleViolation:
+                    index.conflicts.append((origin.data.batch_id, origin.hash))
+        finally:
+            index._deferred_commit = False
+            if index._db is not None:
+                index._db.commit()
+        return index
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+
+
+# Index consulted by BlockChain creation and RuleEngine; None disables clone detection
+BATCH_INDEX = None
+
+
+def use_batch_index(index: BatchIndex = None, registry=None, **kwargs) -> BatchIndex:
+    """
+    Installs index (or a new BatchIndex(**kwargs)) as the process-wide batch index.
+    With registry the chains it already holds are registered first, otherwise
+    their transfers would be refused as clones.
+    """
+    global BATCH_INDEX
+    index = index if index is not None else BatchIndex(**kwargs)
+    if registry is not None:
+        index.backfill(chain for _, chain in registry)
+    BATCH_INDEX = index
+    return BATCH_INDEX
@@ -0,0 +1,676 @@
+"""
+Performance benchmarks for the hot paths of the ledger.
+Usage: python benchmarks.py [benchmark ...] [--save results.json] [--compare baseline.json]
+(no benchmark names runs all of them; --compare exits 1 if anything regressed)
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import key_gen
+from block import Block, data
+from keystore import KeyStore
+
+
+def bench_key_cold_start(names=None, workers: int = None) -> dict:
+    """
+    Process start-up cost of getting every stakeholder's keys.
+    Before: serial RSA generation into the in-process dicts.
+    After: parallel generation of missing keys once, then lazy PEM loading.
+    """
+    names = list(dict.fromkeys(names or key_gen.stakeholders))
+    results = {"stakeholders": len(names), "cpus": os.cpu_count()}
+
+    start = time.perf_counter()
+    key_gen.generate_keys_for_stakeholders(names)
+    results["serial_generate_s"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        KeyStore(directory).generate_missing(names, workers=workers)
+        results["parallel_generate_s"] = time.perf_counter() - start
+
+        # Restart with keys on disk: nothing happens until a key is used.
+        # The files were just written here, so the RSA consistency check is skipped (timed separately)
+        start = time.perf_counter()
+        KeyStore(directory, check_rsa_keys=False).private_key(names[0])
+        results["lazy_first_key_s"] = time.perf_counter() - start
+
+        store = KeyStore(directory, check_rsa_keys=False)
+        start = time.perf_counter()
+        for name in names:
+            store.private_key(name)
+            store.public_key(name)
+        results["lazy_all_keys_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        KeyStore(directory).private_key(names[0])
+        results["checked_first_key_s"] = time.perf_counter() - start
+    return results
+
+
+def _fresh(text: str) -> str:
+    # A new string object with the same value, like json.loads produces when decoding
+    return "".join(list(text))
+
+
+def bench_block_memory(blocks: int = 20000, hops: int = 5) -> dict:
+    """
+    Bytes per in-memory block for many short chains (hops blocks per batch),
+    with every string field freshly allocated as it is when decoded from disk.
+    """
+    owners = ["PharmaCorp", "Dist_X", "Retail_Y", "MediLife", "PharmaX"]
+    statuses = ["MANUFACTURED", "SHIPPED", "IN_TRANSIT", "DELIVERED", "SOLD"]
+    expiry = date.today() + timedelta(days=365)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = []
+    previous = None
+    for n in range(blocks):
+        hop = n % hops
+        if hop == 0:
+            medicine = data(batch_id=n, name=_fresh("Aspirin Forte"), manufacturer=_fresh("PharmaCorp"), expiry_date=expiry)
+            previous = None
+        previous = Block(
+            index=hop,
+            data=medicine,
+            previous_block=previous,
+            previous_hash=previous.hash if previous else "0" * 64,
+            location=_fresh(f"{owners[hop]} Warehouse"),
+            added_by=_fresh(owners[hop]),
+            signature=b"\x00" * 256,
+            status=_fresh(statuses[hop]),
+            current_owner=_fresh(owners[hop]),
+            # Chains share history nodes between consecutive blocks
+            transfer_history=previous.history.append(_fresh(owners[hop - 1])) if previous else [],
+            timestamp=1_700_000_000.0 + n
+        )
+        kept.append(previous)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for block in kept[:2000]:
+        block.calculate_hash()
+    hash_us = (time.perf_counter() - start) / min(len(kept), 2000) * 1e6
+    return {"blocks": blocks, "bytes_per_block": used / blocks, "calculate_hash_us": hash_us}
+
+
+def bench_history_growth(lengths=(100, 1000, 10000)) -> dict:
+    """Memory and time per appended block on one long chain; flat numbers mean O(1) appends."""
+    owners = ["PharmaCorp", "Dist_X", "Retail_Y"]
+    medicine = data(batch_id=1, name="Aspirin Forte", manufacturer="PharmaCorp",
+                    expiry_date=date.today() + timedelta(days=365))
+    results = {}
+    for length in lengths:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        block = None
+        for index in range(length):
+            owner = owners[index % len(owners)]
+            block = Block(
+                index=index, data=medicine, previous_block=block,
+                previous_hash=block.hash if block else "0" * 64,
+                location="Warehouse", added_by=owner, signature=b"sig", status="SHIPPED",
+                current_owner=owner,
+                transfer_history=block.history.append(block.current_owner) if block else [],
+                timestamp=1_700_000_000.0 + index
+            )
+        elapsed = time.perf_counter() - start
+        used = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        results[f"bytes_per_block@{length}"] = used / length
+        results[f"append_us@{length}"] = elapsed / length * 1e6
+    return results
+
+
+def _ensure_keys():
+    missing = [name for name in key_gen.stakeholders if name not in key_gen.PRIVATE_KEYS]
+    key_gen.generate_keys_for_stakeholders(missing)
+
+
+def _medicine(batch_id) -> data:
+    return data(batch_id=batch_id, name="Aspirin Forte", manufacturer="PharmaCorp",
+                expiry_date=date.today() + timedelta(days=365))
+
+
+def bench_concurrent_appends(thread_counts=(1, 2, 4, 8), transfers_per_thread: int = 40) -> dict:
+    """
+    Transfer throughput as threads are added. Each thread drives its own chain
+    (the scaling case); the shared run has every thread hit one chain to count conflicts.
+    """
+    from blockchain import BlockChain, ChainConflict
+    _ensure_keys()
+    owners = ["Dist_X", "Retail_Y"]
+    results = {}
+
+    def drive(chain, count, conflicts):
+        for n in range(count):
+            try:
+                chain.secure_add_block(owners[n % 2], "SHIPPED", "Warehouse")
+            except ChainConflict:
+                conflicts.append(1)
+
+    for shared in (False, True):
+        for threads in thread_counts:
+            chains = [BlockChain(_medicine(n + 1), "PharmaCorp", "Factory") for n in range(1 if shared else threads)]
+            conflicts = []
+            workers = [
+                threading.Thread(target=drive, args=(chains[0 if shared else n], transfers_per_thread, conflicts))
+                for n in range(threads)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            appended = sum(len(chain.blocks) - 2 for chain in chains)
+            label = "shared_chain" if shared else "own_chain"
+            results[f"{label}_transfers_per_s@{threads}"] = appended / elapsed
+            if shared:
+                results[f"{label}_conflicts@{threads}"] = len(conflicts)
+    return results
+
+
+def _median_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def bench_chain_init(repeat: int = 30) -> dict:
+    """BlockChain.__init__: genesis block plus the signed manufacturing block."""
+    from blockchain import BlockChain
+    _ensure_keys()
+    return {"init_us": _median_us(lambda: BlockChain(_medicine(1), "PharmaCorp", "Factory"), repeat)}
+
+
+def bench_transfer_phases(repeat: int = 50) -> dict:
+    """Every step of secure_add_block in isolation, then the whole call."""
+    from blockchain import BlockChain
+    from SecureTransfer import SecureTransfer
+    from signatures import get_scheme
+    from verify_cache import VERIFY_CACHE
+    _ensure_keys()
+    chain = BlockChain(_medicine(1), "PharmaCorp", "Factory")
+    last = chain.last_block
+    sender, buyer = last.current_owner, "Dist_X"
+    payload = chain.build_payload(last.data, last.location, sender)
+    payload_bytes = payload.encode()
+    scheme = get_scheme(key_gen.signing_scheme(sender))
+    public_key = key_gen.verification_key(sender)
+
+    signature = SecureTransfer._sign(sender, payload_bytes)
+    serialized = SecureTransfer._serialize_block(last)
+    encrypted = key_gen.ALLOWED_KEYS[buyer].encrypt(serialized, SecureTransfer._oaep())
+
+    def rules_uncached():
+        VERIFY_CACHE.clear()
+        chain.rule_engine.enforce_all_rules(last.data, "Warehouse", buyer, signature, payload, sender)
+
+    results = {
+        "sign_us": _median_us(lambda: SecureTransfer._sign(sender, payload_bytes), repeat),
+        "serialize_compress_us": _median_us(lambda: SecureTransfer._serialize_block(last), repeat),
+        "encrypt_oaep_us": _median_us(
+            lambda: key_gen.ALLOWED_KEYS[buyer].encrypt(serialized, SecureTransfer._oaep()), repeat),
+        "decrypt_oaep_us": _median_us(
+            lambda: key_gen.PRIVATE_KEYS[buyer].decrypt(encrypted, SecureTransfer._oaep()), repeat),
+        "verify_receive_us": _median_us(lambda: scheme.verify(public_key, signature, payload_bytes), repeat),
+        "verify_rules_cached_us": _median_us(
+            lambda: chain.rule_engine._verify_signature(signature, payload, sender), repeat),
+        "rules_uncached_us": _median_us(rules_uncached, repeat),
+        "calculate_hash_us": _median_us(last.calculate_hash, repeat),
+    }
+    owners = [buyer, "Retail_Y"]
+    hops = iter(range(repeat * 2))
+    results["secure_add_block_us"] = _median_us(
+        lambda: chain.secure_add_block(owners[next(hops) % 2], "SHIPPED", "Warehouse"), repeat)
+    return results
+
+
+def bench_instrumentation(repeat: int = 50) -> dict:
+    """secure_add_block with the instrumentation hooks disabled and enabled."""
+    from blockchain import BlockChain
+    from instrumentation import INSTRUMENTS
+    _ensure_keys()
+    chain = BlockChain(_medicine(1), "PharmaCorp", "Factory")
+    owners = ["Dist_X", "Retail_Y"]
+    hops = iter(range(repeat * 4))
+    results = {}
+    was_enabled = INSTRUMENTS.enabled
+    try:
+        for enabled in (False, True):
+            INSTRUMENTS.enabled = enabled
+            label = "enabled" if enabled else "disabled"
+            results[f"secure_add_block_{label}_us"] = _median_us(
+                lambda: chain.secure_add_block(owners[next(hops) % 2], "SHIPPED", "Warehouse"), repeat)
+    finally:
+        INSTRUMENTS.enabled = was_enabled
+    return results
+
+
+def bench_rule_batch(pending: int = 10000, repeat: int = 5) -> dict:
+    """Field and expiry checks for many pending transfers: one by one vs evaluate_batch."""
+    from blockchain import BlockChain
+    _ensure_keys()
+    engine = BlockChain(_medicine(1), "PharmaCorp", "Factory").rule_engine
+    batch = [_medicine(n + 1) for n in range(pending)]
+
+    def one_by_one():
+        for medicine in batch:
+            engine._check_required_fields(medicine)
+            engine._check_expiry(medicine)
+
+    return {
+        "per_transfer_us": _median_us(one_by_one, repeat),
+        "evaluate_batch_us": _median_us(lambda: engine.evaluate_batch(batch), repeat),
+    }
+
+
+def bench_batch_index(batches: int = 200000, probes: int = 20000) -> dict:
+    """Clone-detection index: registration, unseen (Bloom-only) and known lookups, filter size."""
+    from batch_index import BatchIndex
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        for backing, path in (("memory", None), ("sqlite", os.path.join(directory, "batches.db"))):
+            index = BatchIndex(path=path, capacity=batches)
+            start = time.perf_counter()
+            for n in range(batches):
+                index.register(n + 1, "origin")
+            results[f"{backing}_registers_per_s"] = batches / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for n in range(probes):
+                index.origin(f"unseen-{n}")
+            results[f"{backing}_unseen_lookups_per_s"] = probes / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for n in range(probes):
+                index.origin(n + 1)
+            results[f"{backing}_known_lookups_per_s"] = probes / (time.perf_counter() - start)
+            results["bloom_bytes_per_batch"] = index._bloom.nbytes / batches
+            index.close()
+    return results
+
+
+def bench_lookup(batches: int = 500, queries: int = 200000) -> dict:
+    """Counterfeit scans against a registry: bulk and single verification rates, cache hit rate."""
+    import random
+    from lookup import LookupService
+    from registry import LedgerRegistry
+    _ensure_keys()
+    registry = LedgerRegistry()
+    for n in range(batches):
+        registry.create_chain(_medicine(n + 1), "PharmaCorp", "Factory")
+    service = LookupService(registry)
+    rng = random.Random(14)
+    # Mostly genuine scans of a hot subset, some wrong holders, some made-up batch IDs
+    scans = [
+        (int(rng.paretovariate(1.2)) % batches + 1, "PharmaCorp" if rng.random() < 0.9 else "Dist_X", "Factory")
+        if rng.random() < 0.95 else (batches + rng.randrange(batches), "PharmaCorp")
+        for _ in range(queries)
+    ]
+    start = time.perf_counter()
+    service.verify_many(scans)
+    results = {"bulk_lookups_per_s": queries / (time.perf_counter() - start)}
+    start = time.perf_counter()
+    for scan in scans:
+        service.verify(*scan)
+    results["single_lookups_per_s"] = queries / (time.perf_counter() - start)
+    results["hit_rate"] = service.stats()["hit_rate"]
+    return results
+
+
+def _grow_chain(chain, length: int):
+    """Appends synthetic (unsigned) blocks until the chain has length blocks; no crypto involved."""
+    owners = ["Dist_X", "Retail_Y"]
+    while len(chain.blocks) < length:
+        last = chain.last_block
+        owner = owners[last.index % 2]
+        chain._append_block(Block(
+            index=last.index + 1, data=last.data, previous_block=last, previous_hash=last.hash,
+            location="Warehouse", added_by=owner, signature=b"sig", status="SHIPPED",
+            current_owner=owner, transfer_history=last.history.append(last.current_owner)
+        ))
+
+
+def bench_restart(lengths=(1000, 10000)) -> dict:
+    """Process restart: replaying the whole segment vs starting from a snapshot."""
+    from blockchain import BlockChain
+    from segment_log import SegmentLog
+    from snapshot import save_snapshot
+    _ensure_keys()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for length in lengths:
+            path = os.path.join(directory, f"chain_{length}")
+            chain = BlockChain(_medicine(1), "PharmaCorp", "Factory", segment=SegmentLog(path))
+            _grow_chain(chain, length)
+            chain.validate()
+            save_snapshot(chain, f"{path}.snap")
+            chain.segment.close()
+
+            for label, kwargs in (("replay", {}), ("snapshot", {"snapshot": f"{path}.snap"})):
+                with SegmentLog(path) as segment:
+                    start = time.perf_counter()
+                    BlockChain.restore(segment, **kwargs).validate()
+                    results[f"{label}_restart_s@{length}"] = time.perf_counter() - start
+    return results
+
+
+def bench_stream(lengths=(2000, 20000)) -> dict:
+    """Streaming export/import throughput and the exporter's peak memory as the ledger grows."""
+    from blockchain import BlockChain
+    from ledger_stream import export_blocks, import_blocks
+
+    class Sink:
+        def write(self, chunk):
+            pass
+
+    _ensure_keys()
+    results = {}
+    for length in lengths:
+        chain = BlockChain(_medicine(1), "PharmaCorp", "Factory")
+        _grow_chain(chain, length)
+        for format in ("ndjson", "binary"):
+            start = time.perf_counter()
+            export_blocks(chain.blocks.iter_forward(), Sink(), format)
+            results[f"{format}_export_blocks_per_s@{length}"] = length / (time.perf_counter() - start)
+            tracemalloc.start()
+            export_blocks(chain.blocks.iter_forward(), Sink(), format)
+            results[f"{format}_export_peak_bytes@{length}"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            out = io.BytesIO()
+            export_blocks(chain.blocks.iter_forward(), out, format)
+            results[f"{format}_bytes_per_block@{length}"] = len(out.getvalue()) / length
+            out.seek(0)
+            start = time.perf_counter()
+            for _ in import_blocks(out):
+                pass
+            results[f"{format}_import_blocks_per_s@{length}"] = length / (time.perf_counter() - start)
+    return results
+
+
+def bench_merkle(sizes=(1000, 100000)) -> dict:
+    """Merkle accumulator: append cost, proof generation/verification and proof size vs a full validate()."""
+    import hashlib
+    from merkle import MerkleAccumulator, verify_consistency, verify_inclusion
+    results = {}
+    for size in sizes:
+        hashes = [hashlib.sha256(str(n).encode()).hexdigest() for n in range(size)]
+        tree = MerkleAccumulator()
+        start = time.perf_counter()
+        for block_hash in hashes:
+            tree.append(block_hash)
+        results[f"append_us@{size}"] = (time.perf_counter() - start) / size * 1e6
+
+        index, root = size // 3, tree.root()
+        proof = tree.inclusion_proof(index)
+        results[f"inclusion_proof_us@{size}"] = _median_us(lambda: tree.inclusion_proof(index), 50)
+        results[f"verify_inclusion_us@{size}"] = _median_us(
+            lambda: verify_inclusion(hashes[index], index, size, proof, root), 50)
+        results[f"inclusion_proof_bytes@{size}"] = 32 * len(proof)
+        old_size = size // 2 + 1
+        old_root, consistency = tree.root(old_size), tree.consistency_proof(old_size)
+        results[f"verify_consistency_us@{size}"] = _median_us(
+            lambda: verify_consistency(old_size, size, old_root, root, consistency), 50)
+    return results
+
+
+def bench_audit(chains: int = 16, transfers: int = 30, process_counts=(0, 1, 2, 4)) -> dict:
+    """Full audit (hashes, links, every stored signature) of persisted chains, in-process and on a pool."""
+    from audit import AuditEngine
+    from blockchain import BlockChain
+    from segment_log import SegmentLog
+    _ensure_keys()
+    owners = ["Dist_X", "Retail_Y"]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for n in range(chains):
+            path = os.path.join(directory, f"batch_{n}")
+            chain = BlockChain(_medicine(n + 1), "PharmaCorp", "Factory", segment=SegmentLog(path))
+            for hop in range(transfers):
+                chain.secure_add_block(owners[hop % 2], "SHIPPED", "Warehouse")
+            chain.segment.close()
+            paths.append(path)
+
+        for processes in process_counts:
+            start = time.perf_counter()
+            blocks = sum(audit.blocks for audit in AuditEngine(processes=processes).run(paths))
+            results[f"blocks_per_s@{processes}"] = blocks / (time.perf_counter() - start)
+    return results
+
+
+def bench_workload(batches: int = 2000, rate: float = 200.0) -> dict:
+    """Synthetic supply-chain load: sustained rate and tail latency flat out and at a target rate."""
+    import batch_index
+    from workload import Workload, WorkloadSpec, run_workload
+    _ensure_keys()
+    results = {}
+    previous = batch_index.BATCH_INDEX
+    try:
+        for label, target, first_id in (("max", None, 1), ("paced", rate, 10_000_001)):
+            # Fresh index and batch ids per run, so clones are caught and nothing else collides
+            batch_index.use_batch_index(capacity=max(batches, 1000))
+            spec = WorkloadSpec(batches=batches if target is None else batches // 4, first_batch_id=first_id)
+            report = run_workload(Workload(spec), rate=target)
+            results[f"{label}_ops_per_s"] = report.ops_per_s
+            results[f"{label}_p50_ms"] = report.p50_ms
+            results[f"{label}_p99_ms"] = report.p99_ms
+            results[f"{label}_undetected"] = report.undetected
+        spec = WorkloadSpec(batches=batches // 4, first_batch_id=20_000_001)
+        results["peak_bytes"] = run_workload(Workload(spec), trace_memory=True).peak_bytes
+    finally:
+        batch_index.BATCH_INDEX = previous
+    return results
+
+
+def bench_temporal(lengths=(1000, 10000), queries: int = 2000) -> dict:
+    """Owner-at-time-T queries: walking previous_block pointers vs the timeline, single and bulk."""
+    import random
+    from blockchain import BlockChain
+    from temporal import ChainTimeline
+    _ensure_keys()
+    rng = random.Random(0)
+    results = {}
+    for length in lengths:
+        chain = BlockChain(_medicine(1), "PharmaCorp", "Factory")
+        timeline = ChainTimeline(chain)
+        start = time.perf_counter()
+        _grow_chain(chain, length)
+        results[f"grow_with_index_us@{length}"] = (time.perf_counter() - start) / length * 1e6
+        first, last = chain.blocks.get(0).timestamp, chain.last_block.timestamp
+        times = [rng.uniform(first, last) for _ in range(queries)]
+
+        def walk(t):
+            block = chain.last_block
+            while block is not None and block.timestamp > t:
+                block = block.previous_block
+            return block
+
+        walked = times[:max(1, queries // 10)]     # the walk is slow, a sample is enough
+        start = time.perf_counter()
+        for t in walked:
+            walk(t)
+        results[f"walk_us@{length}"] = (time.perf_counter() - start) / len(walked) * 1e6
+        start = time.perf_counter()
+        for t in times:
+            timeline.at(t)
+        results[f"bisect_us@{length}"] = (time.perf_counter() - start) / queries * 1e6
+        start = time.perf_counter()
+        timeline.at_many(times)
+        results[f"bulk_us@{length}"] = (time.perf_counter() - start) / queries * 1e6
+    return results
+
+
+def bench_inventory(chains: int = 500, repeat: int = 200) -> dict:
+    """Batches held by one stakeholder: scanning every chain's tip vs the inventory index."""
+    from inventory import InventoryIndex
+    from registry import LedgerRegistry
+    _ensure_keys()
+    registry = LedgerRegistry()
+    inventory = InventoryIndex(registry)
+    for n in range(chains):
+        registry.create_chain(_medicine(n + 1), "PharmaCorp", "Factory")
+    for n in range(0, chains, 2):
+        registry.transfer(n + 1, "Dist_X", "SHIPPED", "Warehouse")
+
+    def scan():
+        return [batch_id for batch_id, chain in registry if chain.last_block.current_owner == "Dist_X"]
+
+    results = {
+        f"scan_us@{chains}": _median_us(scan, 5),
+        f"count_us@{chains}": _median_us(lambda: inventory.count_held_by("Dist_X"), repeat),
+        f"page_us@{chains}": _median_us(lambda: inventory.held_by("Dist_X", 0, 100), repeat),
+    }
+    start = time.perf_counter()
+    inventory.rebuild()
+    results[f"rebuild_ms@{chains}"] = (time.perf_counter() - start) * 1e3
+    return results
+
+
+def bench_chain_scans(lengths=(10, 100, 1000, 10000, 100000)) -> dict:
+    """validate() (deep and incremental) and get_all_blocks() as the chain grows."""
+    from blockchain import BlockChain
+    _ensure_keys()
+    chain = BlockChain(_medicine(1), "PharmaCorp", "Factory")
+    results = {}
+    for length in lengths:
+        _grow_chain(chain, length)
+        repeat = 5 if length <= 10000 else 1
+        results[f"validate_deep_us@{length}"] = _median_us(lambda: chain.validate(deep=True), repeat)
+
+        def one_more_block():
+            _grow_chain(chain, len(chain.blocks) + 1)
+            chain.validate()
+        results[f"append_validate_incremental_us@{length}"] = _median_us(one_more_block, repeat)
+        results[f"get_all_blocks_us@{length}"] = _median_us(chain.get_all_blocks, repeat)
+    return results
+
+
+BENCHMARKS = {
+    "keystore": bench_key_cold_start,
+    "block_memory": bench_block_memory,
+    "history_growth": bench_history_growth,
+    "concurrent_appends": bench_concurrent_appends,
+    "chain_init": bench_chain_init,
+    "transfer_phases": bench_transfer_phases,
+    "chain_scans": bench_chain_scans,
+    "instrumentation": bench_instrumentation,
+    "rule_batch": bench_rule_batch,
+    "batch_index": bench_batch_index,
+    "lookup": bench_lookup,
+    "restart": bench_restart,
+    "stream": bench_stream,
+    "merkle": bench_merkle,
+    "audit": bench_audit,
+    "workload": bench_workload,
+    "temporal": bench_temporal,
+    "inventory": bench_inventory,
+}
+
+
+def _direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 for informational values."""
+    name = metric.split("@")[0]
+    if name.endswith("per_s"):
+        return 1
+    if name.endswith(("_s", "_us", "_ms")) or "bytes" in name:
+        return -1
+    return 0
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Metrics that got worse than the baseline by more than threshold (0.10 = 10%)."""
+    regressions = []
+    for bench, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            before = baseline["results"].get(bench, {}).get(metric)
+            direction = _direction(metric)
+            if before in (None, 0) or direction == 0:
+                continue
+            change = (value - before) / before
+            if change * direction < -threshold:
+                regressions.append(f"{bench}.{metric}: {before:.3f} -> {value:.3f} ({change:+.1%})")
+    return regressions
+
+
+@contextlib.contextmanager
+def _quiet_events():
+    logger = logging.getLogger("medichain")
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def run(names, **overrides) -> dict:
+    """Runs the named benchmarks and returns them in the saved-results format."""
+    results = {}
+    for name in names:
+        kwargs = overrides.get(name, {})
+        # Rule violations and the like are logged as warnings, keep the report readable
+        with _quiet_events():
+            results[name] = BENCHMARKS[name](**kwargs)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", choices=[[], *BENCHMARKS], default=[])
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--max-length", type=int, default=100000, help="longest chain for chain_scans (up to 1000000)")
+    args = parser.parse_args(argv)
+
+    lengths = tuple(n for n in (10, 100, 1000, 10000, 100000, 1000000) if n <= args.max_length)
+    report = run(args.benchmarks or list(BENCHMARKS), chain_scans={"lengths": lengths})
+
+    for name, metrics in report["results"].items():
+        print(f"== {name}")
+        for metric, value in metrics.items():
+            print(f"  {metric:<36} {value:.6f}" if isinstance(value, float) else f"  {metric:<36} {value}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
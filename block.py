@@ -1,11 +1,91 @@
+import base64
 import hashlib
+import json
+import struct
+import sys
 import time
+import weakref
 from dataclasses import dataclass
 from datetime import date
 
+# Prefix of the canonical encoding, bump it if the hashed fields ever change
+HASH_DOMAIN = b"medichain-block-v4"
 
 
-@dataclass(frozen=True)
+def _field(value: bytes) -> bytes:
+    # Length prefix makes the encoding unambiguous ("ab"+"c" != "a"+"bc")
+    return struct.pack(">I", len(value)) + value
+
+
+def _intern(value):
+    # Owners, locations and statuses repeat across millions of blocks, keep one copy each
+    return sys.intern(value) if type(value) is str else value
+
+
+class History:
+    """
+    Persistent list of past owners. Each node adds one owner on top of the
+    history it extends, so the histories of consecutive blocks share every
+    node but the last: appending is O(1) in time and memory.
+    digest is a rolling SHA-256 over the whole history and goes into block hashes.
+    """
+    __slots__ = ("owner", "parent", "length", "digest")
+
+    def __init__(self, owner: str = None, parent: 'History' = None):
+        init = object.__setattr__
+        init(self, "owner", _intern(owner))
+        init(self, "parent", parent)
+        if parent is None:
+            init(self, "length", 0)
+            init(self, "digest", hashlib.sha256(b"medichain-history").digest())
+        else:
+            init(self, "length", parent.length + 1)
+            init(self, "digest", hashlib.sha256(parent.digest + _field(owner.encode('utf-8'))).digest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"History is immutable, cannot set '{name}'")
+
+    def append(self, owner: str) -> 'History':
+        """A new history with owner added, this one stays unchanged."""
+        return History(owner, self)
+
+    @classmethod
+    def from_iterable(cls, owners) -> 'History':
+        node = EMPTY_HISTORY
+        for owner in owners:
+            node = node.append(owner)
+        return node
+
+    def iter_reverse(self):
+        """Past owners newest first, lazily."""
+        node = self
+        while node.parent is not None:
+            yield node.owner
+            node = node.parent
+
+    def __iter__(self):
+        """Past owners oldest first (walks the nodes once, then replays them)."""
+        return reversed(list(self.iter_reverse()))
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if isinstance(other, History):
+            return self.digest == other.digest
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return f"History({list(self)!r})"
+
+
+EMPTY_HISTORY = History()
+
+
+@dataclass(frozen=True, slots=True)
 class data:
     batch_id: int
     name: str
@@ -14,6 +94,18 @@ class data:
 
 
 class Block:
+    """
+    One immutable step in a batch's life. Slotted (no per-instance __dict__),
+    repeated strings are interned and the hash is computed once on creation.
+    The link to the previous block is a weak reference: the chain's BlockStore
+    owns the blocks, so a block kept on its own never pins its ancestors.
+    """
+    __slots__ = (
+        "index", "timestamp", "data", "_previous", "previous_hash", "location",
+        "added_by", "signature", "status", "current_owner", "_history", "sig_scheme", "hash",
+        "__weakref__"
+    )
+
     def __init__(
         self, 
         index: int,
@@ -25,21 +117,50 @@ class Block:
         signature: bytes,                # Digital signature from current_owner
         status: str,                     # e.g., "MANUFACTURED", "DELIVERED"
         current_owner: str,              # Public key of owner (e.g., "PharmaCorp_PubKey")
-        transfer_history: list[str],     # List of past owners ["Owner1", "Owner2"]
-        timestamp: float = None          # Auto-generated if None
+        transfer_history,                # Past owners: a History node or a list ["Owner1", "Owner2"]
+        timestamp: float = None,         # Auto-generated if None
+        sig_scheme: str = "rsa-pss"      # Scheme that produced signature (see signatures.py)
     ):
-        self.index = index               #what index is it 
-        self.timestamp = timestamp or time.time()
-        self.data = data                  # Immutable medicine data
-        self.previous_block = previous_block
-        self.previous_hash = previous_hash
-        self.location = location
-        self.added_by = added_by
-        self.signature = signature
-        self.status = status              # New: Track lifecycle state
-        self.current_owner = current_owner # New: Ownership tracking
-        self.transfer_history = transfer_history.copy()  # New: Audit trail
-        self.hash = self.calculate_hash()  # Includes all fields
+        init = object.__setattr__        # __setattr__ below refuses changes
+        init(self, "index", index)               #what index is it 
+        init(self, "timestamp", timestamp or time.time())
+        init(self, "data", data)                  # Immutable medicine data
+        init(self, "_previous", weakref.ref(previous_block) if previous_block is not None else None)
+        init(self, "previous_hash", previous_hash)
+        init(self, "location", _intern(location))
+        init(self, "added_by", _intern(added_by))
+        init(self, "signature", signature)
+        init(self, "status", _intern(status))              # New: Track lifecycle state
+        init(self, "current_owner", _intern(current_owner)) # New: Ownership tracking
+        if not isinstance(transfer_history, History):
+            transfer_history = History.from_iterable(transfer_history)
+        init(self, "_history", transfer_history)  # New: Audit trail, shared with the previous block
+        init(self, "sig_scheme", _intern(sig_scheme))
+        init(self, "hash", self.calculate_hash())  # Includes all fields
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Block is immutable, cannot set '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Block is immutable, cannot delete '{name}'")
+
+    @property
+    def previous_block(self) -> 'Block':
+        """The block this one was built on, while something (normally the chain) still holds it."""
+        return self._previous() if self._previous is not None else None
+
+    @property
+    def history(self) -> History:
+        """The shared history node, extend it with .append() for the next block."""
+        return self._history
+
+    @property
+    def transfer_history(self) -> list[str]:
+        """Past owners, oldest first, materialized on demand (O(len))."""
+        return list(self._history)
+
+    def iter_history(self, newest_first: bool = False):
+        return self._history.iter_reverse() if newest_first else iter(self._history)
 
     #to check that owner that is pretending is real owner or not 
     def is_legitimate_owner(self, claimed_owner: str, require_current: bool = True) -> bool:
@@ -65,13 +186,102 @@ class Block:
         
         return True
   
+    def canonical_bytes(self) -> bytes:
+        """Length-prefixed binary encoding of every hashed field, in a fixed order."""
+        text = lambda value: _field(value.encode('utf-8'))
+        parts = [
+            HASH_DOMAIN,
+            struct.pack(">q", self.index),
+            struct.pack(">d", self.timestamp),
+            text(repr(self.data.batch_id)),     # repr keeps 1 and "1" apart
+            text(self.data.name),
+            text(self.data.manufacturer),
+            text(self.data.expiry_date.isoformat()),
+            text(self.previous_hash),
+            text(self.location),
+            text(self.added_by),
+            text(self.current_owner),
+            text(self.status),
+            text(self.sig_scheme),
+            _field(self.signature),             # a swapped signature changes the hash
+            struct.pack(">I", self._history.length),
+            self._history.digest,               # covers every past owner
+        ]
+        return b"".join(parts)
+
     def calculate_hash(self):
-        block_contents = (
-            f"{self.index}{self.location}{self.added_by}"
-            f"{self.timestamp}{self.data.batch_id}{self.data.name}"
-            f"{self.data.manufacturer}{self.data.expiry_date}{self.previous_hash}{self.transfer_history}{self.current_owner}{self.status}"
+        # Recomputes from the fields on purpose: validate() compares it with the stored hash
+        return hashlib.sha256(self.canonical_bytes()).hexdigest()
+    def to_record(self, with_history: bool = True) -> dict:
+        """
+        Every field of the block as plain JSON types (used for persistence).
+        with_history=False leaves out the owner list, for formats that carry it incrementally.
+        """
+        record = {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'batch_id': self.data.batch_id,
+            'name': self.data.name,
+            'manufacturer': self.data.manufacturer,
+            'expiry_date': self.data.expiry_date.isoformat(),
+            'previous_hash': self.previous_hash,
+            'location': self.location,
+            'added_by': self.added_by,
+            'signature': base64.b64encode(self.signature).decode('ascii'),
+            'sig_scheme': self.sig_scheme,
+            'status': self.status,
+            'current_owner': self.current_owner,
+            'hash': self.hash,
+        }
+        if with_history:
+            # Full list so a record decodes on its own, without its predecessors
+            record['transfer_history'] = self.transfer_history
+        return record
+
+    @classmethod
+    def from_record(cls, record: dict, previous_block: 'Block' = None, check_hash: bool = True) -> 'Block':
+        """
+        Rebuilds a block from to_record() output, rejecting it if the hash does not match
+        (check_hash=False leaves that comparison to the caller, e.g. an auditor).
+        transfer_history may also be a ready History node.
+        """
+        history = record['transfer_history']
+        if (previous_block is not None and isinstance(history, list)
+                and len(history) == previous_block.history.length + 1
+                and all(a == b for a, b in zip(reversed(history[:-1]), previous_block.history.iter_reverse()))):
+            # Same past owners as the predecessor: share its nodes. Anything else is built
+            # from the record itself, so a rewritten entry reaches the hash check below
+            history = previous_block.history.append(history[-1])
+        block = cls(
+            index=record['index'],
+            data=data(
+                batch_id=record['batch_id'],
+                name=record['name'],
+                manufacturer=record['manufacturer'],
+                expiry_date=date.fromisoformat(record['expiry_date'])
+            ),
+            previous_block=previous_block,
+            previous_hash=record['previous_hash'],
+            location=record['location'],
+            added_by=record['added_by'],
+            signature=base64.b64decode(record['signature']),
+            status=record['status'],
+            current_owner=record['current_owner'],
+            transfer_history=history,
+            timestamp=record['timestamp'],
+            sig_scheme=record.get('sig_scheme', 'rsa-pss')
         )
-        return hashlib.sha256(block_contents.encode()).hexdigest()
+        if check_hash and block.hash != record['hash']:
+            raise ValueError(f"Block {record['index']} does not match its recorded hash")
+        return block
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(self.to_record(), separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, payload: bytes, previous_block: 'Block' = None) -> 'Block':
+        return cls.from_record(json.loads(payload), previous_block)
+
     #only for nice output
     def __repr__(self):
        return f"<Block {self.index} | Owner: {self.current_owner} | Added By: {self.added_by} | Loc: {self.location}>"
@@ -0,0 +1,153 @@
+import json
+
+from block import Block
+
+
+class BlockStore:
+    """
+    Array-backed storage for the blocks of one chain.
+    Blocks are kept in append order (position == block.index) next to a
+    hash -> position map, so lookups by index or by hash are O(1).
+    """
+
+    def __init__(self):
+        self._blocks: list[Block] = []
+        self._positions: dict[str, int] = {}
+
+    def append(self, block: Block):
+        # Positions and indices must stay in step, otherwise get(index) lies
+        if block.index != len(self._blocks):
+            raise ValueError(
+                f"Block index {block.index} does not follow the store tip ({len(self._blocks) - 1})"
+            )
+        self._blocks.append(block)
+        self._positions[block.hash] = block.index
+
+    def get(self, index: int) -> Block:
+        """Block at the given index, negative indices count from the tip."""
+        return self._blocks[index]
+
+    def timestamp_at(self, index: int) -> float:
+        """Timestamp of the block at index (a LazyBlockStore answers without loading it)."""
+        return self._blocks[index].timestamp
+
+    def get_by_hash(self, block_hash: str):
+        """Block with this hash, or None if the chain does not contain it."""
+        position = self._positions.get(block_hash)
+        return None if position is None else self._blocks[position]
+
+    def slice(self, start: int = 0, stop: int = None) -> list[Block]:
+        """Blocks in [start, stop) in chain order."""
+        return self._blocks[start:stop]
+
+    def iter_forward(self, start: int = 0):
+        """Lazily yields blocks from start up to the tip."""
+        for position in range(start, len(self._blocks)):
+            yield self._blocks[position]
+
+    def iter_reverse(self, start: int = None):
+        """Lazily yields blocks from start (default: the tip) down to genesis."""
+        if start is None:
+            start = len(self._blocks) - 1
+        for position in range(start, -1, -1):
+            yield self._blocks[position]
+
+    @property
+    def last(self):
+        return self._blocks[-1] if self._blocks else None
+
+    def __getitem__(self, item):
+        # Works for both ints and slices
+        return self._blocks[item]
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __iter__(self):
+        return self.iter_forward()
+
+    def __contains__(self, block_hash):
+        return block_hash in self._positions
+
+
+class LazyBlockStore(BlockStore):
+    """
+    BlockStore over a SegmentLog that only holds the blocks it was given (the
+    tip region after a snapshot restore). Older blocks are decoded from the
+    segment the first time something asks for them, checked against the
+    segment index and whichever neighbours are already loaded, and kept from then on.
+    """
+
+    def __init__(self, segment, known_blocks: list[Block]):
+        super().__init__()
+        self.segment = segment
+        first = known_blocks[0].index
+        self._blocks = [None] * first + list(known_blocks)
+        self._positions = {block.hash: block.index for block in known_blocks}
+        self._hashes_indexed = False    # _positions also covers blocks not loaded yet
+        self.loads = 0                  # blocks decoded from the segment so far
+
+    def _load(self, position: int) -> Block:
+        previous = self._blocks[position - 1] if position > 0 else None
+        block = self.segment.get(position, previous)
+        if block.hash != self.segment.hash_at(position):
+            raise ValueError(f"Block {position} does not match the segment index")
+        if previous is not None and block.previous_hash != previous.hash:
+            raise ValueError(f"Block {position} does not link to block {position - 1}")
+        above = self._blocks[position + 1] if position + 1 < len(self._blocks) else None
+        if above is not None and above.previous_hash != block.hash:
+            raise ValueError(f"Block {position + 1} does not link to block {position}")
+        self._blocks[position] = block
+        self._positions[block.hash] = position
+        self.loads += 1
+        return block
+
+    def get(self, index: int) -> Block:
+        block = self._blocks[index]
+        if block is None:
+            block = self._load(index if index >= 0 else len(self._blocks) + index)
+        return block
+
+    def timestamp_at(self, index: int) -> float:
+        # Read from the record alone, so an index over times does not pull the chain into memory;
+        # the block itself is still checked when something loads it
+        block = self._blocks[index]
+        if block is not None:
+            return block.timestamp
+        return json.loads(self.segment.read(index))['timestamp']
+
+    def _index_hashes(self):
+        # Hashes come straight from the segment's index, nothing is decoded
+        for position, block in enumerate(self._blocks):
+            if block is None:
+                self._positions[self.segment.hash_at(position)] = position
+        self._hashes_indexed = True
+
+    def get_by_hash(self, block_hash: str):
+        if block_hash not in self._positions and not self._hashes_indexed:
+            self._index_hashes()
+        position = self._positions.get(block_hash)
+        return None if position is None else self.get(position)
+
+    def slice(self, start: int = 0, stop: int = None) -> list[Block]:
+        return [self.get(position) for position in range(*slice(start, stop).indices(len(self._blocks)))]
+
+    def iter_forward(self, start: int = 0):
+        for position in range(start, len(self._blocks)):
+            yield self.get(position)
+
+    def iter_reverse(self, start: int = None):
+        if start is None:
+            start = len(self._blocks) - 1
+        for position in range(start, -1, -1):
+            yield self.get(position)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get(position) for position in range(*item.indices(len(self._blocks)))]
+        return self.get(item)
+
+    def __contains__(self, block_hash):
+        if block_hash not in self._positions and not self._hashes_indexed:
+            self._index_hashes()
+        return block_hash in self._positions
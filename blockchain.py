@@ -1,37 +1,147 @@
 # In blockchain.py
 
 import hashlib
+import threading
+import batch_index
+from dataclasses import dataclass
 from datetime import date
 from block import Block, data
-from key_gen import ALLOWED_KEYS, PRIVATE_KEYS # type: ignore
+from block_store import BlockStore, LazyBlockStore
+from key_gen import ALLOWED_KEYS, PRIVATE_KEYS, signing_key, signing_scheme # type: ignore
 from SecureTransfer import SecureTransfer
 from RuleEngine import RuleViolation, RuleEngine # type: ignore
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+from signatures import get_scheme
+from instrumentation import INSTRUMENTS, INFO, WARNING
+from snapshot import Snapshot, SnapshotError
+from merkle import MerkleAccumulator
 
 GENESIS_DATA = data(batch_id=-1, name="Genesis", manufacturer="System", expiry_date=date.today())
 
+
+class ChainConflict(Exception):
+    """The chain tip moved while a transfer was in flight and it could not be re-applied."""
+    pass
+
+
+@dataclass(frozen=True)
+class PreparedTransfer:
+    """Output of the crypto half of a transfer, waiting to be committed to the chain."""
+    tip: Block             # block the transfer was prepared against
+    sender: str
+    buyer: str
+    data: data             # as decrypted by the buyer
+    location: str
+    add_by: str
+    signature: bytes       # sender's signature over payload
+    payload: str
+    scheme: str
+
 class BlockChain:
     # REFACTORED __init__
-    def __init__(self, medicine_data: data, creator_id: str, initial_location: str):
+    def __init__(self, medicine_data: data, creator_id: str, initial_location: str, segment=None,
+                 hybrid_transfers: bool = False, rules=None):
         """
         Initializes a new blockchain.
         This creates the Genesis Block (index 0) and the first real block 
         (index 1) representing the product's creation, signed by the creator.
+        If a SegmentLog is given every block is also persisted to it; appends
+        are group-committed unless it was opened with durable=True.
+        hybrid_transfers sends blocks in the AES-GCM envelope instead of plain RSA-OAEP.
+        rules replaces RuleEngine.DEFAULT_RULES for this chain.
         """
         if creator_id not in PRIVATE_KEYS:
             raise ValueError(f"Creator '{creator_id}' does not have a private key to sign the first block.")
 
         # 1. Create the Genesis Block (the anchor of the chain)
+        self._init_state(segment)
+        self.hybrid_transfers = hybrid_transfers
         self.head = self._create_genesis_block()
-        self.last_block = self.head
+        self._append_block(self.head)
 
         # 2. Create and add the first "Manufacturing" block
         self._create_and_add_first_block(medicine_data, creator_id, initial_location)
 
         # 3. Initialize the rule engine AFTER the chain has its first real block
-        self.rule_engine = RuleEngine(self)
+        self.rule_engine = RuleEngine(self, rules)
+
+    def _init_state(self, segment):
+        self.blocks = BlockStore()
+        # Only held for the compare-and-swap of the tip, never during crypto
+        self._tip_lock = threading.Lock()
+        self.segment = segment
+        self.hybrid_transfers = False
+        self.last_block = None
+        # Last (index, hash) that validate() verified; blocks up to it are trusted
+        self._checkpoint = None
+        self._listeners = []
+        # Merkle tree over the block hashes, for O(log n) inclusion/consistency proofs
+        self.merkle = MerkleAccumulator()
+
+    @property
+    def batch_index(self):
+        """The batch index clone checks go to (batch_index.BATCH_INDEX), or None."""
+        return batch_index.BATCH_INDEX
+
+    @classmethod
+    def restore(cls, segment, rules=None, snapshot=None):
+        """
+        Rebuilds a chain from the blocks persisted in a SegmentLog.
+        Every decoded block is checked against its recorded hash; new blocks keep
+        being appended to the same segment. With a batch index installed the batch
+        is (re-)registered, a clone of an already known batch raises RuleViolation.
+
+        With a snapshot (a Snapshot or the path of one) only the snapshot's tip and
+        any blocks appended after it are decoded. Older blocks are loaded from the
+        segment when first needed, and validate() trusts the snapshot's watermark.
+        The tip must match the segment's hash at that position, else SnapshotError.
+        """
+        if len(segment) == 0:
+            raise ValueError("Segment holds no blocks to restore")
+        chain = cls.__new__(cls)
+        chain._init_state(None)
+        if snapshot is None:
+            for block in segment:
+                chain._append_block(block)
+        else:
+            chain._restore_snapshot(segment, snapshot)
+        chain.head = chain.blocks.get(0)
+        if chain.batch_index is not None and len(chain.blocks) > 1:
+            origin = chain.blocks.get(1)
+            chain.batch_index.register(origin.data.batch_id, origin.hash)
+        chain.segment = segment
+        chain.rule_engine = RuleEngine(chain, rules)
+        return chain
+
 
+    def _restore_snapshot(self, segment, snapshot):
+        if not isinstance(snapshot, Snapshot):
+            snapshot = Snapshot.load(snapshot)
+        tip = snapshot.tip_block()
+        if len(segment) < snapshot.length or segment.hash_at(snapshot.length - 1) != tip.hash:
+            raise SnapshotError("Snapshot tip is not in the segment, refusing to trust it")
+
+        # Blocks appended after the snapshot was taken are replayed forward from its tip
+        known = [tip]
+        for position in range(snapshot.length, len(segment)):
+            block = segment.get(position, known[-1])
+            if block.previous_hash != known[-1].hash:
+                raise ValueError(f"Block {position} does not link to block {position - 1}")
+            known.append(block)
+
+        self.blocks = LazyBlockStore(segment, known)
+        self.last_block = known[-1]
+        if snapshot.merkle_frontier is not None:
+            # Only the peaks come from the snapshot; older subtrees are hashed from the index when a proof needs them
+            self.merkle = MerkleAccumulator.from_frontier(snapshot.length, list(snapshot.merkle_frontier),
+                                                          segment.hash_at)
+            for position in range(snapshot.length, len(segment)):
+                self.merkle.append(segment.hash_at(position))
+        else:
+            # Leaves come from the segment index, nothing older gets decoded for them
+            self.merkle = MerkleAccumulator(segment.hash_at(position) for position in range(len(segment)))
+        watermark = snapshot.watermark
+        if watermark and watermark[0] < len(segment) and segment.hash_at(watermark[0]) == watermark[1]:
+            self._checkpoint = watermark
 
     def _create_genesis_block(self):
         """Creates the static, unchangeable first block of the chain."""
@@ -55,15 +165,9 @@ class BlockChain:
         # The payload for the creation event
         payload_to_sign = self.build_payload(medicine_data, initial_location, creator_id).encode('utf-8')
 
-        # The creator signs the payload with their private key
-        signature = PRIVATE_KEYS[creator_id].sign(
-            payload_to_sign,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        # The creator signs the payload with their private key, in whatever scheme they use
+        scheme = signing_scheme(creator_id)
+        signature = get_scheme(scheme).sign(signing_key(creator_id, scheme), payload_to_sign)
 
         # Create the first real block
         first_block = Block(
@@ -76,39 +180,115 @@ class BlockChain:
             signature=signature, # The signature from the creator
             status="MANUFACTURED",
             current_owner=creator_id, # The creator is the first owner
-            transfer_history=[] # History is empty, this is the origin
+            transfer_history=[], # History is empty, this is the origin
+            sig_scheme=scheme
         )
 
-        # Link this block to the chain
-        self.last_block = first_block
-        print(f"Blockchain initialized for Batch ID {medicine_data.batch_id}. First block created by {creator_id}.")
+        # A batch can only be minted once, a second chain for it is a clone
+        index = self.batch_index
+        if index is not None:
+            index.register(medicine_data.batch_id, first_block.hash)
+
+        # Link this block to the chain; if that fails the batch was never minted
+        try:
+            self._append_block(first_block)
+        except BaseException:
+            if index is not None:
+                index.release(medicine_data.batch_id, first_block.hash)
+            raise
+        INSTRUMENTS.count("chains_created_total")
+        INSTRUMENTS.event(INFO, "chain.created", batch_id=medicine_data.batch_id, creator=creator_id)
 
     # The rest of your blockchain.py file (build_payload, secure_add_block, etc.) remains the same.
     # Make sure you have made the changes to secure_add_block and the RuleEngine as discussed before.
 
-    def build_payload(self, data, location, add_by):
+    def _append_block(self, block: Block, expected_tip: Block = None):
+        """
+        Adds a block to the indexed store (and the segment, if any) and moves the tip to it.
+        With expected_tip this is a compare-and-swap: it fails with ChainConflict
+        unless the tip is still the block the new one was built on.
+        """
+        with self._tip_lock:
+            if expected_tip is not None and self.last_block is not expected_tip:
+                raise ChainConflict(
+                    f"Tip moved from block {expected_tip.index} to {self.last_block.index} during the transfer"
+                )
+            self.blocks.append(block)
+            if self.segment is not None:
+                self.segment.append(block)
+            self.last_block = block
+            self.merkle.append(block.hash)
+            for callback in self._listeners:
+                callback(self, block)
+
+    def add_listener(self, callback):
+        """
+        callback(chain, block) runs after every append, still under the tip lock,
+        so readers never see the new tip before listeners (caches, indexes) do.
+        Keep it cheap and never call back into the chain's append path from it.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    @staticmethod
+    def build_payload(data, location, add_by):
+        # What the sender of a hop signs; the auditor rebuilds it to re-check stored signatures
         return f"{data.batch_id}|{data.name}|{data.manufacturer}|{data.expiry_date}|{add_by}|{location}"
 
 
-    def secure_add_block(self, buyer: str, new_status: str, new_location: str):
+    def secure_add_block(self, buyer: str, new_status: str, new_location: str, max_retries: int = 3):
         """
         Complete secure transfer:
         1. Sender signs payload and encrypts block
         2. Buyer decrypts and verifies signature
         3. RuleEngine enforces policies and checks authenticity
         4. New block is added to the chain
-        """
-
+        Steps 1-2 are prepare_transfer(), 3-4 are commit_transfer().
 
+        Safe to call from several threads: the crypto runs without a lock and the
+        append is a compare-and-swap on the tip. If another append got in first the
+        transfer is redone on the new tip, as long as the same owner still holds the
+        batch; otherwise (or after max_retries) ChainConflict is raised.
+        """
+        sender = None
+        for attempt in range(max_retries + 1):
+            prepared = self.prepare_transfer(buyer, new_location)
+            if sender is None:
+                sender = prepared.sender
+            elif prepared.sender != sender:
+                raise ChainConflict(
+                    f"Batch changed hands from {sender} to {prepared.sender} during the transfer to {buyer}"
+                )
+            try:
+                return self.commit_transfer(prepared, new_status)
+            except ChainConflict:
+                if attempt == max_retries:
+                    raise
 
+    def prepare_transfer(self, buyer: str, new_location: str) -> PreparedTransfer:
+        """
+        The cryptographic half of a transfer from the current owner to buyer.
+        Touches no chain state, so it is safe to run on a worker thread.
+        """
         last = self.last_block  # it takes the object of blockchain class which can be viewed as list of block last is the current block or say seller block
         sender = last.current_owner  # get the seller or currennt owner name
         # Verify sender owns the block
         if not last.is_legitimate_owner(sender):
             raise ValueError("Current owner cannot initiate transfer")
+
+        # Expired or incomplete batches are refused before any RSA work is spent on them
+        try:
+            self.rule_engine.precheck(last.data)
+        except RuleViolation as rv:
+            self._rule_violation(rv, last.data, sender, buyer)
+            raise
         
         # Construct the payload representing this transfer , must match exactly for signing and verifying
         transfer_payload = self.build_payload(last.data, last.location, sender) 
+        # Scheme is fixed once here so signing, both verifications and the block agree on it
+        scheme = signing_scheme(sender)
 
         # Step 1: SecureTransfer initiate encrypted transfer as well as verify
         # The sender signs the payload with their private key. This signature proves authorship.
@@ -116,7 +296,9 @@ class BlockChain:
             initiated_by=sender,
             buyer=buyer,
             block=last,
-            payload_to_sign=transfer_payload.encode()
+            payload_to_sign=transfer_payload.encode(),
+            hybrid=self.hybrid_transfers,
+            scheme=scheme
         )
 
         # Step 2: Buyer receives and decrypts it and retrieves sender's signature
@@ -127,59 +309,97 @@ class BlockChain:
             encrypted_block=encrypted_block,
             new_location=new_location,
             signature=transfer_sig,
-            original_payload=transfer_payload.encode()
+            original_payload=transfer_payload.encode(),
+            scheme=scheme
         )
-     
+        return PreparedTransfer(last, sender, buyer, received_data, location, add_by, sig, transfer_payload, scheme)
+
+    def commit_transfer(self, prepared: PreparedTransfer, new_status: str) -> Block:
+        """Rule checks and the append for a prepared transfer; the tip must not have moved since."""
+        last = prepared.tip
+        if last is not self.last_block:
+            # Cheap early exit, the authoritative check is the compare-and-swap below
+            raise ChainConflict("Chain tip moved since the transfer was prepared")
+
             # Step 3: Enforce smart contract rules and validate sender's digital signature
             # This ensures the sender is authentic and the payload has not been tampered with.
 
         try:
-            self.rule_engine.enforce_all_rules(received_data, new_location, add_by, sig,transfer_payload,sender)
+            with INSTRUMENTS.phase("rules"):
+                self.rule_engine.enforce_all_rules(
+                    prepared.data, prepared.location, prepared.add_by, prepared.signature,
+                    prepared.payload, prepared.sender, prepared.scheme
+                )
         except RuleViolation as rv:
-            print(f" Rule violation: {rv}")
+            self._rule_violation(rv, prepared.data, prepared.sender, prepared.buyer)
             raise
 
          #4 . Create new block (using transfer signature)
-        new_block = Block(
-            index=self.last_block.index + 1,
-            data=received_data,
-            previous_block=last,
-            previous_hash=last.hash,
-            location=location,
-            added_by=buyer,  # The buyer is adding this new block
-            signature=transfer_sig,  # Reuse the transfer signature
-            status=new_status,
-            current_owner=buyer,
-            transfer_history=[*last.transfer_history, sender]
-        )
+        with INSTRUMENTS.phase("hash"):
+            new_block = Block(
+                index=last.index + 1,
+                data=prepared.data,
+                previous_block=last,
+                previous_hash=last.hash,
+                location=prepared.location,
+                added_by=prepared.buyer,  # The buyer is adding this new block
+                signature=prepared.signature,  # Reuse the transfer signature
+                status=new_status,
+                current_owner=prepared.buyer,
+                transfer_history=last.history.append(prepared.sender),  # O(1), shares last's history
+                sig_scheme=prepared.scheme
+            )
         
-        self.last_block = new_block
-        print(f"Secure Block Added — Now owned by {buyer} at {new_location}")
+        self._append_block(new_block, expected_tip=last)
+        INSTRUMENTS.count("transfers_total")
+        INSTRUMENTS.event(INFO, "transfer.committed", batch_id=prepared.data.batch_id, index=new_block.index,
+                          owner=prepared.buyer, location=prepared.location)
+        return new_block
+
+    def _rule_violation(self, violation, data_obj, sender, buyer):
+        INSTRUMENTS.event(WARNING, "transfer.rule_violation", batch_id=data_obj.batch_id,
+                          sender=sender, buyer=buyer, reason=violation)
 
-    def validate(self):
-        current_block = self.last_block
+    def validate(self, deep: bool = False) -> bool:
+        """
+        Checks the hash links of the chain.
+        Only blocks appended since the last successful validation are re-hashed;
+        the walk stops at the checkpoint and trusts everything below it.
+        Pass deep=True to ignore the checkpoint and re-verify every block.
+        """
+        stop = -1 if deep or self._checkpoint is None else self._checkpoint[0]
+
+        if stop >= 0 and self.blocks.get(stop).hash != self._checkpoint[1]:
+            # The trusted block itself was swapped out
+            return False
 
-        while current_block is not None:
+        for current_block in self.blocks.iter_reverse():
+            if current_block.index == stop:
+                break
             if current_block.hash != current_block.calculate_hash():
                 return False
-            if current_block.previous_block is not None:
-                if current_block.previous_hash != current_block.previous_block.calculate_hash():
+            # The previous block's own hash gets re-computed on the next iteration
+            if current_block.index > 0:
+                previous = self.blocks.get(current_block.index - 1)
+                if current_block.previous_hash != previous.hash:
                     return False
-            current_block = current_block.previous_block
 
+        self._checkpoint = (self.last_block.index, self.last_block.hash)
         return True
 
+    @property
+    def checkpoint(self):
+        """(index, hash) of the last block verified by validate(), or None."""
+        return self._checkpoint
+
+    def invalidate_checkpoint(self):
+        """Drops the trusted checkpoint so the next validate() re-checks the whole chain."""
+        self._checkpoint = None
+
     def get_all_blocks(self):
-        # Go from last block to head (reverse order)
-        blocks = []
-        current = self.last_block
-        while current:
-            blocks.insert(0, current)
-            current = current.previous_block
-        return blocks
+        """All blocks from genesis to the tip."""
+        return self.blocks.slice()
 
     def print_chain(self):
-        current = self.last_block
-        while current:
+        for current in self.blocks.iter_reverse():
             print(f"Index: {current.index}, Location: {current.location}, By: {current.added_by}, Hash: {current.hash}")
-            current = current.previous_block
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from block import Block
+from blockchain import BlockChain
+
+
+class TransferRequest(NamedTuple):
+    chain: BlockChain
+    buyer: str
+    new_status: str
+    new_location: str
+
+
+@dataclass
+class TransferResult:
+    request: TransferRequest
+    block: Block = None
+    error: Exception = None     # RuleViolation, ValueError, ... when the hop was refused
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _prepare(request: TransferRequest):
+    try:
+        return request.chain.prepare_transfer(request.buyer, request.new_location), None
+    except Exception as e:
+        return None, e
+
+
+def _prescreen(requests, results):
+    """Field and expiry rules for every request in one batch per rule engine."""
+    today = date.today()
+    by_engine = {}
+    for position, request in enumerate(requests):
+        engine = request.chain.rule_engine
+        by_engine.setdefault(id(engine), (engine, []))[1].append(position)
+    for engine, positions in by_engine.values():
+        # A batch's data never changes hop to hop, the tip's copy stands for every pending hop
+        violations = engine.evaluate_batch([requests[position].chain.last_block.data for position in positions], today)
+        for position, violation in zip(positions, violations):
+            results[position].error = violation
+
+
+def bulk_secure_transfer(requests, max_workers: int = None, executor=None) -> list[TransferResult]:
+    """
+    Runs many secure transfers, for any number of chains, and returns one result
+    per request in request order. A refused hop only fails its own result.
+
+    Requests are processed in waves: wave k holds the k-th hop of every chain.
+    The crypto of a wave (sign, OAEP, verify) runs on a thread pool, since the
+    cryptography backend releases the GIL. The commits (rules, hashing, append)
+    then happen on the calling thread in request order, so each chain sees its
+    hops exactly in the order given.
+    Expired or incomplete batches are weeded out up front by RuleEngine.evaluate_batch,
+    so they cost no RSA work at all.
+    """
+    requests = [TransferRequest(*request) for request in requests]
+    results = [TransferResult(request) for request in requests]
+
+    _prescreen(requests, results)
+
+    waves = []
+    seen = {}
+    for position, request in enumerate(requests):
+        if results[position].error is not None:
+            continue
+        hop = seen.get(id(request.chain), 0)
+        seen[id(request.chain)] = hop + 1
+        if hop == len(waves):
+            waves.append([])
+        waves[hop].append(position)
+
+    pool = executor or ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+    try:
+        for wave in waves:
+            prepared = pool.map(_prepare, [requests[position] for position in wave])
+            for position, (transfer, error) in zip(wave, prepared):
+                result = results[position]
+                if error is not None:
+                    result.error = error
+                    continue
+                try:
+                    result.block = result.request.chain.commit_transfer(transfer, result.request.new_status)
+                except Exception as e:
+                    result.error = e
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return results
@@ -0,0 +1,181 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+
+# Upper bounds (seconds) of the latency histogram buckets, 50us .. 1s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+logger = logging.getLogger("medichain")
+
+
+@dataclass(frozen=True)
+class Event:
+    timestamp: float
+    level: int
+    name: str                       # dotted, e.g. "transfer.committed"
+    fields: dict = field(default_factory=dict)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Phase:
+    __slots__ = ("instruments", "name", "start")
+
+    def __init__(self, instruments, name):
+        self.instruments = instruments
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.instruments.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NOOP = contextlib.nullcontext()
+
+
+class Instrumentation:
+    """
+    Per-phase latency histograms, counters and a levelled event stream.
+    While disabled, phase() and count() do nothing beyond a flag check; events
+    still reach the "medichain" logger if it is enabled for their level.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+        self._counters: dict[tuple, float] = {}      # (name, sorted label items) -> value
+        self._subscribers = []
+
+    # ---- Metrics ----
+
+    def phase(self, name: str):
+        """Context manager timing one phase of a transfer (sign, encrypt, rules, hash, ...)."""
+        if not self.enabled:
+            return _NOOP
+        return _Phase(self, name)
+
+    def observe(self, phase: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(phase)
+            if histogram is None:
+                histogram = self._histograms[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, phase: str) -> Histogram:
+        return self._histograms.get(phase)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    # ---- Events ----
+
+    def subscribe(self, callback):
+        """callback(Event) is called for every event while instrumentation is enabled."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def event(self, level: int, name: str, **fields):
+        to_log = logger.isEnabledFor(level)
+        if not (self.enabled and self._subscribers) and not to_log:
+            return
+        event = Event(time.time(), level, name, fields)
+        if to_log:
+            details = " ".join(f"{key}={value}" for key, value in fields.items())
+            logger.log(level, f"{name} {details}".rstrip())
+        if self.enabled:
+            for callback in list(self._subscribers):
+                callback(event)
+
+    # ---- Export ----
+
+    def snapshot(self) -> dict:
+        """Plain-data copy of every metric, for pluggable exporters."""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": {
+                    phase: {"buckets": list(h.buckets), "counts": list(h.counts), "sum": h.sum, "count": h.count}
+                    for phase, h in self._histograms.items()
+                },
+            }
+
+    def export(self, callback):
+        """Hands snapshot() to callback, e.g. a StatsD or OpenTelemetry bridge."""
+        callback(self.snapshot())
+
+    def export_prometheus(self, prefix: str = "medichain") -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        snapshot = self.snapshot()
+        lines = []
+        by_name = {}
+        for counter in snapshot["counters"]:
+            by_name.setdefault(counter["name"], []).append(counter)
+        for name in sorted(by_name):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for counter in by_name[name]:
+                lines.append(f"{prefix}_{name}{_labels(counter['labels'])} {counter['value']}")
+
+        if snapshot["histograms"]:
+            metric = f"{prefix}_phase_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for phase in sorted(snapshot["histograms"]):
+                h = snapshot["histograms"][phase]
+                cumulative = 0
+                for bound, count in zip([*h["buckets"], "+Inf"], h["counts"]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_labels({'phase': phase, 'le': bound})} {cumulative}")
+                lines.append(f"{metric}_sum{_labels({'phase': phase})} {h['sum']}")
+                lines.append(f"{metric}_count{_labels({'phase': phase})} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+# Process-wide instance the ledger reports to; enable it with INSTRUMENTS.enabled = True
+INSTRUMENTS = Instrumentation()
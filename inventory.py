@@ -0,0 +1,189 @@
+import threading
+
+
+class _Bucket:
+    """Set of batch ids that also keeps them in a list, for O(1) add/remove and slicing by offset."""
+    __slots__ = ("items", "positions")
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def add(self, batch_id):
+        if batch_id not in self.positions:
+            self.positions[batch_id] = len(self.items)
+            self.items.append(batch_id)
+
+    def discard(self, batch_id):
+        position = self.positions.pop(batch_id, None)
+        if position is None:
+            return
+        # Move the last item into the hole
+        last = self.items.pop()
+        if last != batch_id:
+            self.items[position] = last
+            self.positions[last] = position
+
+    def __len__(self):
+        return len(self.items)
+
+
+class InventoryIndex:
+    """
+    Who holds what right now: stakeholder -> batch ids they currently own and
+    status -> batch ids currently in that state, for stock and recall audits
+    that must not scan every chain's tip.
+
+    Fed by chain listeners, which run under the chain's tip lock, so the index
+    moves a batch in the same step the append makes it visible. With a registry
+    every chain it has or gets is followed; standalone chains join via track().
+    Counts are O(1); listings come in pages (offset/limit), and a batch that
+    moves while a caller pages through may show up on another page or not at all.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._by_owner = {}
+        self._by_status = {}
+        self._current = {}      # batch_id -> (tip index, owner, status)
+        if registry is not None:
+            registry.add_listener(self._on_append, replay=True)
+
+    def track(self, chain):
+        """Follows a chain that is not in the registry."""
+        chain.add_listener(self._on_append)
+        self._on_append(chain, chain.last_block)
+
+    def untrack(self, chain):
+        chain.remove_listener(self._on_append)
+        with self._lock:
+            self._remove(chain.last_block.data.batch_id)
+
+    def _on_append(self, chain, block):
+        with self._lock:
+            self._place(block)
+
+    def _place(self, block):
+        batch_id = block.data.batch_id
+        current = self._current.get(batch_id)
+        if current is not None:
+            if current[0] >= block.index:
+                return      # already saw this block or a later one
+            self._remove(batch_id)
+        self._current[batch_id] = (block.index, block.current_owner, block.status)
+        self._by_owner.setdefault(block.current_owner, _Bucket()).add(batch_id)
+        self._by_status.setdefault(block.status, _Bucket()).add(batch_id)
+
+    def _remove(self, batch_id):
+        current = self._current.pop(batch_id, None)
+        if current is None:
+            return
+        _, owner, status = current
+        for buckets, key in ((self._by_owner, owner), (self._by_status, status)):
+            bucket = buckets[key]
+            bucket.discard(batch_id)
+            if not bucket:
+                del buckets[key]
+
+    # ---- Queries ----
+
+    def holder(self, batch_id):
+        """(owner, status) of a batch as indexed, or None."""
+        current = self._current.get(batch_id)
+        return current[1:] if current is not None else None
+
+    def count_held_by(self, owner: str) -> int:
+        bucket = self._by_owner.get(owner)
+        return len(bucket) if bucket is not None else 0
+
+    def count_with_status(self, status: str) -> int:
+        bucket = self._by_status.get(status)
+        return len(bucket) if bucket is not None else 0
+
+    def _page(self, buckets, key, offset, limit):
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                return []
+            return bucket.items[offset:None if limit is None else offset + limit]
+
+    def held_by(self, owner: str, offset: int = 0, limit: int = None) -> list:
+        """Batch ids owner currently holds, limit of them starting at offset."""
+        return self._page(self._by_owner, owner, offset, limit)
+
+    def with_status(self, status: str, offset: int = 0, limit: int = None) -> list:
+        return self._page(self._by_status, status, offset, limit)
+
+    def iter_held_by(self, owner: str, page_size: int = 1000):
+        """Yields owner's batch ids page by page (lists of up to page_size)."""
+        offset = 0
+        while True:
+            page = self.held_by(owner, offset, page_size)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+
+    def iter_with_status(self, status: str, page_size: int = 1000):
+        offset = 0
+        while True:
+            page = self.with_status(status, offset, page_size)
+            if not page:
+                return
+            yield page
+            offset += len(page)
+
+    def owners(self) -> dict:
+        """owner -> number of batches held, for everyone holding any."""
+        with self._lock:
+            return {owner: len(bucket) for owner, bucket in self._by_owner.items()}
+
+    def __len__(self):
+        return len(self._current)
+
+    # ---- Consistency ----
+
+    def _chains(self, chains):
+        if chains is not None:
+            return chains
+        if self.registry is None:
+            raise ValueError("No registry to check against, pass the chains")
+        return (chain for _, chain in self.registry)
+
+    def check(self, chains=None) -> list[str]:
+        """
+        Compares the index with the tips of the ledger's chains (default: the
+        registry's). Returns a description of every difference, empty if none.
+        """
+        problems = []
+        seen = set()
+        for chain in self._chains(chains):
+            tip = chain.last_block
+            batch_id = tip.data.batch_id
+            seen.add(batch_id)
+            indexed = self.holder(batch_id)
+            if indexed is None:
+                problems.append(f"Batch {batch_id} is missing from the index")
+            elif indexed != (tip.current_owner, tip.status):
+                problems.append(
+                    f"Batch {batch_id} indexed as {indexed}, ledger says {(tip.current_owner, tip.status)}"
+                )
+        with self._lock:
+            stale = [batch_id for batch_id in self._current if batch_id not in seen]
+            for buckets in (self._by_owner, self._by_status):
+                for key, bucket in buckets.items():
+                    if any(bucket.items[p] != b for b, p in bucket.positions.items()):
+                        problems.append(f"Bucket {key} is corrupt")
+        problems.extend(f"Batch {batch_id} is indexed but not in the ledger" for batch_id in stale)
+        return problems
+
+    def rebuild(self, chains=None) -> list[str]:
+        """Replaces the index with the ledger's current state; returns what check() found beforehand."""
+        chains = list(self._chains(chains))
+        problems = self.check(chains)
+        with self._lock:
+            self._by_owner, self._by_status, self._current = {}, {}, {}
+            for chain in chains:
+                self._place(chain.last_block)
+        return problems
@@ -1,22 +1,75 @@
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.backends import default_backend
-import os
+from keystore import KeyStore, _generate_pem
+from signatures import DEFAULT_SCHEME, get_scheme
+from verify_cache import VERIFY_CACHE
+from concurrent.futures import ProcessPoolExecutor
 
 
-# Define the stakeholders
+# Define the stakeholders (each one once, duplicates used to be generated twice)
 stakeholders = [
     "PharmaCorp", "OldLabs", "MediLife",
-    "Dist_X", "Retail_Y" ,"PharmaCorp", "Dist_X", "Retail_Y", 
+    "Dist_X", "Retail_Y",
     "PharmaX", "SYSTEM"
 ]
 
+# Keystore the key dictionaries fall back to for names they do not hold (see use_keystore)
+KEYSTORE = None
+
+
+class _KeyRing(dict):
+    """
+    dict of stakeholder -> key. Keys set directly stay pinned in the dict;
+    anything else is loaded lazily from KEYSTORE (which caches it) on first use.
+    """
+
+    def __init__(self, kind):
+        super().__init__()
+        self.kind = kind
+
+    def __missing__(self, name):
+        if KEYSTORE is not None and name not in REVOKED:
+            return KEYSTORE.private_key(name) if self.kind == "private" else KEYSTORE.public_key(name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        if dict.__contains__(self, name):
+            return True
+        if KEYSTORE is None or name in REVOKED:
+            return False
+        return KEYSTORE.has_private_key(name) if self.kind == "private" else KEYSTORE.has_public_key(name)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+
 # Create dictionaries to hold keys
-ALLOWED_KEYS = {}   # public keys for signature verification
-PRIVATE_KEYS = {}   # private keys for signing
+ALLOWED_KEYS = _KeyRing("public")   # public keys for signature verification
+PRIVATE_KEYS = _KeyRing("private")  # private keys for signing
 
+# Signing keys for schemes other than RSA-PSS, keyed by (stakeholder, scheme).
+# RSA-PSS signing uses PRIVATE_KEYS/ALLOWED_KEYS, which also stay the encryption keys.
+SIGNING_KEYS = {}
+VERIFY_KEYS = {}
+SIGNING_SCHEMES = {}   # stakeholder -> scheme they currently sign with (default rsa-pss)
+REVOKED = set()        # stakeholders whose keys must not be served any more
+
+# Called with a stakeholder's name whenever their keys are rotated or revoked
+KEY_CHANGE_LISTENERS = []
+
+
+def generate_keys_for_stakeholders(names, workers: int = 1):
+    # workers > 1 generates the key pairs in parallel worker processes
+    names = list(dict.fromkeys(names))
+    if workers > 1 and len(names) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, private_pem, _ in pool.map(_generate_pem, names):
+                private_key = serialization.load_pem_private_key(private_pem, password=None, backend=default_backend())
+                PRIVATE_KEYS[name] = private_key
+                ALLOWED_KEYS[name] = private_key.public_key()
+        return
 
-def generate_keys_for_stakeholders(names):
     for name in names:
         private_key = rsa.generate_private_key(
             public_exponent=65537,
@@ -29,6 +82,92 @@ def generate_keys_for_stakeholders(names):
         PRIVATE_KEYS[name] = private_key
         ALLOWED_KEYS[name] = public_key
 
+
+def generate_signing_keys(names, scheme: str = "ed25519"):
+    """Gives each stakeholder a key for scheme and switches their signing over to it."""
+    signer = get_scheme(scheme)
+    for name in dict.fromkeys(names):
+        if scheme != DEFAULT_SCHEME:
+            private_key = signer.generate_private_key()
+            SIGNING_KEYS[(name, scheme)] = private_key
+            VERIFY_KEYS[(name, scheme)] = private_key.public_key()
+        SIGNING_SCHEMES[name] = scheme
+
+
+def signing_scheme(name: str) -> str:
+    return SIGNING_SCHEMES.get(name, DEFAULT_SCHEME)
+
+
+def signing_key(name: str, scheme: str = None):
+    scheme = scheme or signing_scheme(name)
+    if scheme == DEFAULT_SCHEME:
+        return PRIVATE_KEYS[name]
+    return SIGNING_KEYS[(name, scheme)]
+
+
+def verification_key(name: str, scheme: str = None):
+    # Old blocks name their scheme explicitly, so keys of a scheme a stakeholder
+    # migrated away from remain usable for verification
+    scheme = scheme or signing_scheme(name)
+    if name in REVOKED:
+        raise KeyError(f"Keys of {name} were revoked")
+    if scheme == DEFAULT_SCHEME:
+        return ALLOWED_KEYS[name]
+    return VERIFY_KEYS[(name, scheme)]
+
+
+def _public_keys_of(name):
+    keys = [VERIFY_KEYS[key] for key in VERIFY_KEYS if key[0] == name]
+    if name in ALLOWED_KEYS:
+        keys.append(ALLOWED_KEYS[name])
+    return keys
+
+
+def _keys_changed(name, old_public_keys):
+    for public_key in old_public_keys:
+        VERIFY_CACHE.invalidate_key(public_key)
+    if KEYSTORE is not None:
+        KEYSTORE.evict(name)
+    for listener in KEY_CHANGE_LISTENERS:
+        listener(name)
+
+
+def rotate_keys(name: str):
+    """New key pair(s) for a stakeholder; cached verifications under the old keys are dropped."""
+    old_public_keys = _public_keys_of(name)
+    REVOKED.discard(name)
+    generate_keys_for_stakeholders([name])
+    scheme = signing_scheme(name)
+    if scheme != DEFAULT_SCHEME:
+        generate_signing_keys([name], scheme)
+    _keys_changed(name, old_public_keys)
+
+
+def revoke_keys(name: str):
+    """Removes every key of a stakeholder; they can no longer sign, buy or be verified."""
+    old_public_keys = _public_keys_of(name)
+    REVOKED.add(name)
+    for keyring in (ALLOWED_KEYS, PRIVATE_KEYS):
+        keyring.pop(name, None)
+    for keys in (SIGNING_KEYS, VERIFY_KEYS):
+        for key in [key for key in keys if key[0] == name]:
+            del keys[key]
+    SIGNING_SCHEMES.pop(name, None)
+    _keys_changed(name, old_public_keys)
+
+
+def use_keystore(directory: str = "keys", generate_missing=None, cache_size: int = 256) -> KeyStore:
+    """
+    Serves keys lazily from the PEM files under directory instead of generating
+    them in-process. Names in generate_missing without keys on disk are generated
+    in parallel first.
+    """
+    global KEYSTORE
+    KEYSTORE = KeyStore(directory, cache_size=cache_size)
+    if generate_missing:
+        KEYSTORE.generate_missing(generate_missing)
+    return KEYSTORE
+
 # Optional: Function to serialize public key if needed optional for now
 def get_serialized_public_key(name):
     if name not in ALLOWED_KEYS:
@@ -48,17 +187,13 @@ def get_serialized_private_key(name):
         encryption_algorithm=serialization.NoEncryption()
     )
 
-def save_keys_to_files():
-    os.makedirs("keys/public", exist_ok=True)
-    os.makedirs("keys/private", exist_ok=True)
+def save_keys_to_files(directory: str = "keys"):
+    store = KeyStore(directory)
     for name in stakeholders:
-        with open(f"keys/private/{name}_private.pem", "wb") as f:
-            f.write(get_serialized_private_key(name))
-
-        with open(f"keys/public/{name}_public.pem", "wb") as f:
-            f.write(get_serialized_public_key(name))
+        store.store(name, get_serialized_private_key(name), get_serialized_public_key(name))
 
 
 if __name__ == '__main__':
-    generate_keys_for_stakeholders(stakeholders)
-    save_keys_to_files()
+    # Only generates what is not on disk yet, in parallel
+    generated = KeyStore("keys").generate_missing(stakeholders)
+    print(f"Generated keys for: {', '.join(generated) or 'nobody, all keys exist'}")
@@ -0,0 +1,155 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+
+def _generate_pem(name: str) -> tuple[str, bytes, bytes]:
+    """Generates one RSA key pair and returns it as PEM (runs in a worker process)."""
+    private_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=2048,
+        backend=default_backend()
+    )
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.TraditionalOpenSSL,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return name, private_pem, public_pem
+
+
+class KeyStore:
+    """
+    Stakeholder keys on disk, in the layout written by key_gen.save_keys_to_files:
+    <directory>/private/<name>_private.pem and <directory>/public/<name>_public.pem.
+    Keys are deserialized on first use and kept in a bounded LRU cache.
+    OpenSSL's RSA consistency check runs on every private key loaded. It costs
+    ~40ms per key, most of the load time; check_rsa_keys=False skips it, for
+    key files known not to have been tampered with (benchmarks, a private
+    directory this process just wrote).
+    Which names have keys is read from the directories once and then kept up to
+    date by store(); call refresh() after adding key files behind its back.
+    """
+
+    def __init__(self, directory: str = "keys", cache_size: int = 256, check_rsa_keys: bool = True):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.check_rsa_keys = check_rsa_keys
+        self._cache = OrderedDict()     # (kind, name) -> key object
+        self._lock = threading.Lock()
+        self._known = None              # kind -> names with a key file, scanned on first use
+        self.loads = 0                  # PEM files actually deserialized
+
+    def private_path(self, name: str) -> str:
+        return os.path.join(self.directory, "private", f"{name}_private.pem")
+
+    def public_path(self, name: str) -> str:
+        return os.path.join(self.directory, "public", f"{name}_public.pem")
+
+    def refresh(self):
+        """Re-reads which names have key files (authorization checks ask on every transfer)."""
+        known = {}
+        for kind in ("private", "public"):
+            suffix = f"_{kind}.pem"
+            try:
+                files = os.listdir(os.path.join(self.directory, kind))
+            except FileNotFoundError:
+                files = []
+            known[kind] = {f[:-len(suffix)] for f in files if f.endswith(suffix)}
+        with self._lock:
+            self._known = known
+
+    def _has(self, kind: str, name: str) -> bool:
+        if self._known is None:
+            self.refresh()
+        return name in self._known[kind]
+
+    def has_private_key(self, name: str) -> bool:
+        return self._has("private", name)
+
+    def has_public_key(self, name: str) -> bool:
+        return self._has("public", name)
+
+    def _load(self, kind: str, name: str):
+        with self._lock:
+            key = self._cache.get((kind, name))
+            if key is not None:
+                self._cache.move_to_end((kind, name))
+                return key
+
+        if kind == "private":
+            path = self.private_path(name)
+            loader = lambda pem: serialization.load_pem_private_key(
+                pem, password=None, backend=default_backend(),
+                unsafe_skip_rsa_key_validation=not self.check_rsa_keys
+            )
+        else:
+            path = self.public_path(name)
+            loader = lambda pem: serialization.load_pem_public_key(pem, backend=default_backend())
+        try:
+            with open(path, "rb") as f:
+                key = loader(f.read())
+        except FileNotFoundError:
+            raise KeyError(f"No {kind} key stored for {name}")
+
+        with self._lock:
+            self.loads += 1
+            self._cache[(kind, name)] = key
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return key
+
+    def private_key(self, name: str):
+        return self._load("private", name)
+
+    def public_key(self, name: str):
+        return self._load("public", name)
+
+    def store(self, name: str, private_pem: bytes, public_pem: bytes):
+        os.makedirs(os.path.dirname(self.private_path(name)), exist_ok=True)
+        os.makedirs(os.path.dirname(self.public_path(name)), exist_ok=True)
+        with open(self.private_path(name), "wb") as f:
+            f.write(private_pem)
+        with open(self.public_path(name), "wb") as f:
+            f.write(public_pem)
+        if self._known is None:
+            self.refresh()
+        with self._lock:
+            self._known["private"].add(name)
+            self._known["public"].add(name)
+        self.evict(name)
+
+    def generate_missing(self, names, workers: int = None) -> list[str]:
+        """
+        Generates key pairs for every name that has none on disk yet, spread over
+        a process pool (RSA key generation is CPU bound). Returns the generated names.
+        """
+        missing = [name for name in dict.fromkeys(names) if not self.has_private_key(name)]
+        if not missing:
+            return []
+        if len(missing) == 1 or workers == 1:
+            results = map(_generate_pem, missing)
+        else:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                results = list(pool.map(_generate_pem, missing))
+        for name, private_pem, public_pem in results:
+            self.store(name, private_pem, public_pem)
+        return missing
+
+    def evict(self, name: str):
+        """Drops cached key objects for name, e.g. after its files were rotated."""
+        with self._lock:
+            self._cache.pop(("private", name), None)
+            self._cache.pop(("public", name), None)
+
+    def __contains__(self, name):
+        return self.has_public_key(name)
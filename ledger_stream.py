@@ -0,0 +1,262 @@
+import itertools
+import json
+import struct
+import zlib
+from datetime import date
+
+from block import Block, data
+from segment_log import RECORD_HEADER
+
+# Streams carry one block per record. The first record holds the full owner
+# history; every later one only the owners added since the record before it
+# (history_tail), so a record stays small however long the chain gets.
+#
+# ndjson: one JSON object per line, Block.to_record() fields plus
+#         history_length and history_tail (or transfer_history on the first line)
+# binary: BINARY_MAGIC, then records framed like segment files
+#         [payload length u32][crc32 u32][payload], see _pack_binary for the payload
+BINARY_MAGIC = b"MCEXP001"
+_STRING = struct.Struct(">I")
+_FIXED = struct.Struct(">qdI")          # index, timestamp, expiry date as a proleptic ordinal
+
+
+def _history_delta(block: Block, previous: Block):
+    """(length, owners since previous) or (length, None) when previous is no prefix of block's history."""
+    history = block.history
+    if previous is None:
+        return history.length, None
+    added = history.length - previous.history.length
+    if added < 0:
+        return history.length, None
+    tail = []
+    node = history
+    for _ in range(added):
+        tail.append(node.owner)
+        node = node.parent
+    if node.digest != previous.history.digest:
+        return history.length, None
+    tail.reverse()
+    return history.length, tail
+
+
+def _history_for(length: int, tail, full, previous: Block):
+    if tail is None:
+        return full
+    if previous is None:
+        raise ValueError("Stream starts with an incremental record, the full history is missing")
+    history = previous.history
+    for owner in tail:
+        history = history.append(owner)
+    if history.length != length:
+        raise ValueError(f"History tail does not extend the previous block's history to {length} owners")
+    return history
+
+
+# ---- ndjson ----
+
+def iter_ndjson(blocks):
+    """Yields the blocks as newline-terminated JSON lines (bytes), lazily."""
+    previous = None
+    for block in blocks:
+        length, tail = _history_delta(block, previous)
+        record = block.to_record(with_history=tail is None)
+        record['history_length'] = length
+        if tail is not None:
+            record['history_tail'] = tail
+        yield json.dumps(record, separators=(',', ':')).encode('utf-8') + b"\n"
+        previous = block
+
+
+def _read_ndjson(stream, previous=None):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            record['transfer_history'] = _history_for(
+                record['history_length'], record.get('history_tail'), record.get('transfer_history'), previous
+            )
+            block = Block.from_record(record)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Line {line_number} of the export is damaged: {e}")
+        yield block
+        previous = block
+
+
+# ---- binary ----
+
+def _pack_string(value: str) -> bytes:
+    encoded = value.encode('utf-8')
+    return _STRING.pack(len(encoded)) + encoded
+
+
+def _pack_binary(block: Block, previous: Block) -> bytes:
+    length, tail = _history_delta(block, previous)
+    owners = block.transfer_history if tail is None else tail
+    batch_id = block.data.batch_id
+    parts = [
+        _FIXED.pack(block.index, block.timestamp, block.data.expiry_date.toordinal()),
+        # batch IDs may be ints or strings and the block hash tells them apart
+        b"i" if isinstance(batch_id, int) else b"s",
+        _pack_string(str(batch_id)),
+        _pack_string(block.data.name),
+        _pack_string(block.data.manufacturer),
+        _pack_string(block.previous_hash),
+        _pack_string(block.location),
+        _pack_string(block.added_by),
+        _STRING.pack(len(block.signature)) + block.signature,
+        _pack_string(block.sig_scheme),
+        _pack_string(block.status),
+        _pack_string(block.current_owner),
+        bytes.fromhex(block.hash),
+        _STRING.pack(length),
+        b"t" if tail is not None else b"f",     # tail or full history follows
+        _STRING.pack(len(owners)),
+        *(_pack_string(owner) for owner in owners),
+    ]
+    return b"".join(parts)
+
+
+def _unpack_binary(payload: bytes, previous: Block) -> Block:
+    view = memoryview(payload)
+    offset = 0
+
+    def raw() -> bytes:
+        nonlocal offset
+        (size,) = _STRING.unpack_from(view, offset)
+        offset += _STRING.size + size
+        if offset > len(view):
+            raise ValueError("Record is truncated")
+        return bytes(view[offset - size:offset])
+
+    def string() -> str:
+        return raw().decode('utf-8')
+
+    index, timestamp, expiry = _FIXED.unpack_from(view, 0)
+    offset = _FIXED.size
+    kind = payload[offset:offset + 1]
+    offset += 1
+    batch_id = int(string()) if kind == b"i" else string()
+    name, manufacturer, previous_hash, location, added_by = (string() for _ in range(5))
+    signature = raw()
+    sig_scheme, status, current_owner = string(), string(), string()
+    recorded_hash = payload[offset:offset + 32].hex()
+    offset += 32
+    (length,) = _STRING.unpack_from(view, offset)
+    incremental = payload[offset + _STRING.size:offset + _STRING.size + 1] == b"t"
+    offset += _STRING.size + 1
+    (count,) = _STRING.unpack_from(view, offset)
+    offset += _STRING.size
+    owners = [string() for _ in range(count)]
+
+    block = Block(
+        index=index,
+        data=data(batch_id=batch_id, name=name, manufacturer=manufacturer, expiry_date=date.fromordinal(expiry)),
+        previous_block=None,
+        previous_hash=previous_hash,
+        location=location,
+        added_by=added_by,
+        signature=signature,
+        status=status,
+        current_owner=current_owner,
+        transfer_history=_history_for(length, owners if incremental else None, owners, previous),
+        timestamp=timestamp,
+        sig_scheme=sig_scheme,
+    )
+    if block.hash != recorded_hash:
+        raise ValueError(f"Block {index} does not match its recorded hash")
+    return block
+
+
+def iter_binary(blocks):
+    """Yields the binary export (magic, then one framed record per block) in chunks, lazily."""
+    yield BINARY_MAGIC
+    previous = None
+    for block in blocks:
+        payload = _pack_binary(block, previous)
+        yield RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        previous = block
+
+
+def _read_binary(stream, previous=None):
+    position = 0
+    while True:
+        header = stream.read(RECORD_HEADER.size)
+        if not header:
+            return
+        if len(header) < RECORD_HEADER.size:
+            raise ValueError(f"Record {position} of the export is truncated")
+        size, crc = RECORD_HEADER.unpack(header)
+        payload = stream.read(size)
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            raise ValueError(f"Record {position} of the export failed its checksum")
+        try:
+            block = _unpack_binary(payload, previous)
+        except (struct.error, UnicodeDecodeError, ValueError) as e:
+            raise ValueError(f"Record {position} of the export is damaged: {e}")
+        yield block
+        previous = block
+        position += 1
+
+
+# ---- Public API ----
+
+FORMATS = {"ndjson": iter_ndjson, "binary": iter_binary}
+
+
+def export_blocks(blocks, out, format: str = "ndjson") -> int:
+    """
+    Writes blocks (any iterable: chain.blocks.iter_forward(), a SegmentLog, ...)
+    to the binary file object out. Only one block is encoded at a time.
+    Returns the number of blocks written.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format '{format}'")
+    count = 0
+
+    def counted():
+        nonlocal count
+        for block in blocks:
+            count += 1
+            yield block
+
+    for chunk in FORMATS[format](counted()):
+        out.write(chunk)
+    return count
+
+
+def import_blocks(stream, verify_links: bool = True):
+    """
+    Lazily decodes an export written by export_blocks, detecting its format.
+    Every block is checked against its recorded hash and, with verify_links,
+    against the block before it (consecutive index, previous_hash), so a broken
+    or reordered stream fails at the first bad record instead of at the end.
+    Yielded blocks are not linked via previous_block, so nothing accumulates
+    unless the caller keeps them.
+    """
+    prefix = stream.read(len(BINARY_MAGIC))
+    if prefix == BINARY_MAGIC:
+        records = _read_binary(stream)
+    else:
+        # No seek, so pipes work too: glue the peeked bytes back onto the first line
+        records = _read_ndjson(itertools.chain([prefix + stream.readline()], stream))
+
+    previous = None
+    for block in records:
+        if verify_links and previous is not None:
+            if block.index != previous.index + 1:
+                raise ValueError(f"Block {block.index} follows block {previous.index} in the export")
+            if block.previous_hash != previous.hash:
+                raise ValueError(f"Block {block.index} does not link to block {previous.index}")
+        yield block
+        previous = block
+
+
+def import_to_segment(stream, segment) -> int:
+    """Streams an export into a (fresh) SegmentLog; BlockChain.restore(segment) then opens it."""
+    count = 0
+    for block in import_blocks(stream):
+        segment.append(block)
+        count += 1
+    segment.flush()
+    return count
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from registry import LedgerRegistry
+
+
+class Verdict(NamedTuple):
+    """Answer to one scan: is this batch real, and does the claimed holder own it?"""
+    batch_id: object
+    known: bool             # the registry has a chain for the batch
+    owner_matches: bool
+    location_matches: bool  # None when the query gave no location
+    owner: str = None       # current owner / location / status per the ledger
+    location: str = None
+    status: str = None
+    error: str = None       # set instead of raising for malformed queries
+
+    @property
+    def genuine(self) -> bool:
+        return self.known and self.owner_matches and self.location_matches is not False
+
+
+_UNKNOWN = (None, None, None)
+
+
+class LookupService:
+    """
+    Read-optimized, non-raising verification of (batch_id, claimed_owner[, location])
+    scans against a LedgerRegistry. The tip facts of hot batches (owner, location,
+    status) sit in an LRU cache whose entries expire after ttl seconds and are
+    dropped the moment a transfer appends to the batch's chain. Unknown batches are
+    cached too, since counterfeit probes tend to repeat, until the batch is created.
+    """
+
+    def __init__(self, registry: LedgerRegistry, cache_size: int = 100_000, ttl: float = 60.0):
+        self.registry = registry
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache = OrderedDict()     # batch_id -> (expires at, (owner, location, status))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        registry.add_listener(self._on_append)
+
+    def _on_append(self, chain, block):
+        with self._lock:
+            self._cache.pop(block.data.batch_id, None)
+
+    def invalidate(self, batch_id=None):
+        """Drops one batch (or everything) from the cache."""
+        with self._lock:
+            if batch_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(batch_id, None)
+
+    def _tip(self, batch_id):
+        chain = self.registry.get(batch_id)
+        return chain.last_block if chain is not None else None
+
+    @staticmethod
+    def _facts(tip):
+        return (tip.current_owner, tip.location, tip.status) if tip is not None else _UNKNOWN
+
+    @staticmethod
+    def _parse(query):
+        try:
+            batch_id, claimed_owner, *rest = query
+            location = rest[0] if rest else None
+            hash(batch_id)
+        except (TypeError, ValueError) as e:
+            return Verdict(None, False, False, None, error=f"Malformed query {query!r}: {e}")
+        return batch_id, claimed_owner, location
+
+    @staticmethod
+    def _verdict(batch_id, claimed_owner, location, facts) -> Verdict:
+        owner, current_location, status = facts
+        if owner is None:
+            return Verdict(batch_id, False, False, None if location is None else False)
+        return Verdict(
+            batch_id,
+            True,
+            claimed_owner == owner,
+            None if location is None else location == current_location,
+            owner, current_location, status,
+        )
+
+    def verify(self, batch_id, claimed_owner: str, location: str = None) -> Verdict:
+        """Block.is_legitimate_owner for a scan, without the exceptions."""
+        return self.verify_many([(batch_id, claimed_owner, location)])[0]
+
+    def verify_many(self, queries) -> list[Verdict]:
+        """
+        One Verdict per (batch_id, claimed_owner[, location]) query, in order.
+        The lock is only held to copy cache entries out and put fresh ones in;
+        tips are read and verdicts built outside it, so a large batch never
+        holds up the transfers whose listeners invalidate the cache.
+        """
+        parsed = [self._parse(query) for query in queries]
+        now = time.monotonic()
+        facts, missing = {}, []
+        with self._lock:
+            for query in parsed:
+                if isinstance(query, Verdict):
+                    continue
+                batch_id = query[0]
+                if batch_id in facts:
+                    self.hits += 1
+                    continue
+                cached = self._cache.get(batch_id)
+                if cached is not None and cached[0] > now:
+                    self._cache.move_to_end(batch_id)
+                    self.hits += 1
+                    facts[batch_id] = cached[1]
+                else:
+                    facts[batch_id] = None
+                    missing.append(batch_id)
+
+        tips = [(batch_id, self._tip(batch_id)) for batch_id in missing]
+        for batch_id, tip in tips:
+            facts[batch_id] = self._facts(tip)
+
+        if tips:
+            with self._lock:
+                self.misses += len(tips)
+                for batch_id, tip in tips:
+                    # A transfer since the read already dropped the entry; caching it now would resurrect it
+                    if self._tip(batch_id) is not tip:
+                        continue
+                    self._cache[batch_id] = (now + self.ttl, facts[batch_id])
+                    self._cache.move_to_end(batch_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [query if isinstance(query, Verdict) else self._verdict(*query, facts[query[0]])
+                for query in parsed]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,210 @@
+import hashlib
+
+# Tree hashing as in RFC 6962 / RFC 9162: leaves and interior nodes get
+# different one-byte prefixes, so a leaf can never pass for a subtree.
+_LEAF = b"\x00"
+_NODE = b"\x01"
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+
+def _leaf(block_hash: str) -> bytes:
+    return hashlib.sha256(_LEAF + bytes.fromhex(block_hash)).digest()
+
+
+def _node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE + left + right).digest()
+
+
+def _split(size: int) -> int:
+    # Largest power of two strictly below size
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+class MerkleAccumulator:
+    """
+    Merkle tree over the block hashes of one chain, grown one leaf per append.
+    Every complete (power-of-two, aligned) subtree hash is kept, so an append
+    costs O(1) amortized hashes and roots of any past size, inclusion proofs
+    and consistency proofs take O(log n) hashes.
+
+    A tree restored from its frontier (from_frontier) only knows the peaks;
+    older subtree hashes are computed from leaf_hash the first time a proof
+    needs them, and kept.
+    """
+
+    def __init__(self, block_hashes=()):
+        # _levels[k][i] = hash of the complete subtree over leaves [i * 2**k, (i + 1) * 2**k),
+        # None where a restored tree has not needed it yet
+        self._levels: list[list[bytes]] = [[]]
+        self._leaf_hash = None
+        for block_hash in block_hashes:
+            self.append(block_hash)
+
+    @classmethod
+    def from_frontier(cls, size: int, frontier: list[str], leaf_hash) -> 'MerkleAccumulator':
+        """
+        Tree of size leaves from frontier() output; leaf_hash(position) returns
+        the block hash at position when an older subtree is needed.
+        """
+        peaks = [level for level in range(size.bit_length() - 1, -1, -1) if size >> level & 1]
+        if len(peaks) != len(frontier):
+            raise ValueError(f"A tree of size {size} has {len(peaks)} peaks, got {len(frontier)}")
+        tree = cls()
+        tree._leaf_hash = leaf_hash
+        tree._levels = [[None] * (size >> level) for level in range(max(size.bit_length(), 1))]
+        for level, peak in zip(peaks, frontier):
+            tree._levels[level][-1] = bytes.fromhex(peak)
+        return tree
+
+    def frontier(self, size: int = None) -> list[str]:
+        """Hashes of the complete subtrees covering the first size leaves, largest first."""
+        size = self._check_size(size)
+        peaks, start = [], 0
+        for level in range(size.bit_length() - 1, -1, -1):
+            if size >> level & 1:
+                peaks.append(self._subtree(start, start + (1 << level)).hex())
+                start += 1 << level
+        return peaks
+
+    def append(self, block_hash: str):
+        levels = self._levels
+        levels[0].append(_leaf(block_hash))
+        level = 0
+        while len(levels[level]) % 2 == 0:
+            if len(levels) == level + 1:
+                levels.append([])
+            # The left node is always a peak, which a restored tree holds
+            levels[level + 1].append(_node(levels[level][-2], levels[level][-1]))
+            level += 1
+
+    @property
+    def size(self) -> int:
+        return len(self._levels[0])
+
+    def __len__(self):
+        return self.size
+
+    def _subtree(self, start: int, end: int) -> bytes:
+        size = end - start
+        if size & (size - 1) == 0 and start % size == 0:
+            level = size.bit_length() - 1
+            node = self._levels[level][start >> level]
+            if node is None:
+                if level == 0:
+                    node = _leaf(self._leaf_hash(start))
+                else:
+                    half = start + size // 2
+                    node = _node(self._subtree(start, half), self._subtree(half, end))
+                self._levels[level][start >> level] = node
+            return node
+        k = _split(size)
+        return _node(self._subtree(start, start + k), self._subtree(start + k, end))
+
+    def _check_size(self, size):
+        if size is None:
+            return self.size
+        if not 0 <= size <= self.size:
+            raise ValueError(f"Tree has {self.size} leaves, no state of size {size}")
+        return size
+
+    def root(self, size: int = None) -> str:
+        """Root over the first size leaves (default: all of them)."""
+        size = self._check_size(size)
+        return self._subtree(0, size).hex() if size else EMPTY_ROOT
+
+    def inclusion_proof(self, index: int, size: int = None) -> list[str]:
+        """Audit path showing leaf index is in the tree of the given size."""
+        size = self._check_size(size)
+        if not 0 <= index < size:
+            raise ValueError(f"Leaf {index} is not in a tree of size {size}")
+        proof = []
+        start, end = 0, size
+        while end - start > 1:
+            k = _split(end - start)
+            if index < start + k:
+                proof.append(self._subtree(start + k, end))
+                end = start + k
+            else:
+                proof.append(self._subtree(start, start + k))
+                start += k
+        return [node.hex() for node in reversed(proof)]
+
+    def consistency_proof(self, old_size: int, new_size: int = None) -> list[str]:
+        """Proof that the tree of old_size is a prefix of the tree of new_size."""
+        new_size = self._check_size(new_size)
+        if not 0 <= old_size <= new_size:
+            raise ValueError(f"Cannot prove size {old_size} against size {new_size}")
+        if old_size in (0, new_size):
+            return []
+        proof = []
+        start, end, complete = 0, new_size, True
+        while True:
+            if old_size == end:
+                if not complete:
+                    proof.append(self._subtree(start, end))
+                break
+            k = _split(end - start)
+            if old_size <= start + k:
+                proof.append(self._subtree(start + k, end))
+                end = start + k
+            else:
+                proof.append(self._subtree(start, start + k))
+                start += k
+                complete = False
+        return [node.hex() for node in reversed(proof)]
+
+
+def verify_inclusion(block_hash: str, index: int, size: int, proof: list[str], root: str) -> bool:
+    """Light-client check that block_hash sits at index in the tree of size with this root."""
+    if not 0 <= index < size:
+        return False
+    fn, sn = index, size - 1
+    r = _leaf(block_hash)
+    for sibling in proof:
+        if sn == 0:
+            return False
+        sibling = bytes.fromhex(sibling)
+        if fn & 1 or fn == sn:
+            r = _node(sibling, r)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = _node(r, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r.hex() == root
+
+
+def verify_consistency(old_size: int, new_size: int, old_root: str, new_root: str, proof: list[str]) -> bool:
+    """Light-client check that the chain with old_root was only appended to, reaching new_root."""
+    if not 0 <= old_size <= new_size:
+        return False
+    if old_size == new_size:
+        return not proof and old_root == new_root
+    if old_size == 0:
+        return not proof
+    if not proof:
+        return False
+    path = [bytes.fromhex(node) for node in proof]
+    if old_size & (old_size - 1) == 0:
+        path.insert(0, bytes.fromhex(old_root))
+    fn, sn = old_size - 1, new_size - 1
+    while fn & 1:
+        fn >>= 1
+        sn >>= 1
+    fr = sr = path[0]
+    for node in path[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr = _node(node, fr)
+            sr = _node(node, sr)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            sr = _node(sr, node)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and fr.hex() == old_root and sr.hex() == new_root
@@ -0,0 +1,158 @@
+import threading
+import zlib
+from dataclasses import dataclass
+
+from block import data
+from blockchain import BlockChain
+
+
+@dataclass(frozen=True)
+class ShardStats:
+    shard: int
+    chains: int      # batches living in this shard
+    blocks: int      # blocks across those chains
+    appends: int     # transfers routed through the registry
+    lookups: int     # get() calls that landed here
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()    # guards chains/chain_locks, never held during crypto
+        self.chains: dict = {}
+        self.chain_locks: dict = {}
+        self.appends = 0
+        self.lookups = 0
+
+
+class LedgerRegistry:
+    """
+    Owns the chains of many medicine batches, sharded by batch_id.
+    Each shard has its own lock for membership changes and each chain its own
+    lock for appends, so transfers on different batches run in parallel.
+    """
+
+    def __init__(self, shards: int = 16):
+        if shards < 1:
+            raise ValueError("Registry needs at least one shard")
+        self._shards = [_Shard() for _ in range(shards)]
+        self._listeners = []
+
+    def shard_of(self, batch_id) -> int:
+        # crc32 instead of hash() so placement is stable across processes
+        return zlib.crc32(repr(batch_id).encode('utf-8')) % len(self._shards)
+
+    def _shard(self, batch_id) -> _Shard:
+        return self._shards[self.shard_of(batch_id)]
+
+    def create_chain(self, medicine_data: data, creator_id: str, initial_location: str, **kwargs) -> BlockChain:
+        """Creates the chain for a new batch; a batch_id can only be registered once."""
+        shard = self._shard(medicine_data.batch_id)
+        with shard.lock:
+            if medicine_data.batch_id in shard.chains:
+                raise ValueError(f"Batch {medicine_data.batch_id} already has a chain")
+
+        # Signing the first block is slow, so it happens outside the shard lock
+        chain = BlockChain(medicine_data, creator_id, initial_location, **kwargs)
+        self.add_chain(chain)
+        return chain
+
+    def add_chain(self, chain: BlockChain):
+        """Registers an existing (e.g. restored) chain under its batch_id."""
+        batch_id = chain.last_block.data.batch_id
+        shard = self._shard(batch_id)
+        with shard.lock:
+            if batch_id in shard.chains:
+                raise ValueError(f"Batch {batch_id} already has a chain")
+            shard.chains[batch_id] = chain
+            shard.chain_locks[batch_id] = threading.Lock()
+            # A listener added after this point finds the chain in the shard and attaches itself
+            listeners = list(self._listeners)
+            for callback in listeners:
+                chain.add_listener(callback)
+        # The batch's tip just became visible through the registry
+        for callback in listeners:
+            callback(chain, chain.last_block)
+
+    def add_listener(self, callback, replay: bool = False):
+        """
+        callback(chain, block) for every block appended to any registered chain,
+        and once with the tip when a chain joins the registry.
+        With replay it is also called with the current tip of every chain already
+        here once it listens to them, so an index built late misses neither the
+        old chains nor an append in between.
+        """
+        # All shards locked: a chain joining concurrently gets the callback either
+        # from add_chain or from here, never from both
+        for shard in self._shards:
+            shard.lock.acquire()
+        try:
+            self._listeners.append(callback)
+            chains = [chain for shard in self._shards for chain in shard.chains.values()]
+            for chain in chains:
+                chain.add_listener(callback)
+        finally:
+            for shard in reversed(self._shards):
+                shard.lock.release()
+        if replay:
+            for chain in chains:
+                callback(chain, chain.last_block)
+
+    def get(self, batch_id) -> BlockChain:
+        """Chain of a batch, or None if the registry does not know it."""
+        shard = self._shard(batch_id)
+        shard.lookups += 1      # load statistic only, not worth a lock on the read path
+        return shard.chains.get(batch_id)
+
+    def transfer(self, batch_id, buyer: str, new_status: str, new_location: str) -> BlockChain:
+        """secure_add_block on a batch's chain, serialized per batch only."""
+        shard = self._shard(batch_id)
+        with shard.lock:
+            chain = shard.chains.get(batch_id)
+            chain_lock = shard.chain_locks.get(batch_id)
+        if chain is None:
+            raise KeyError(f"Unknown batch {batch_id}")
+
+        with chain_lock:
+            chain.secure_add_block(buyer, new_status, new_location)
+        with shard.lock:
+            shard.appends += 1
+        return chain
+
+    def shard_stats(self) -> list[ShardStats]:
+        """Per-shard size and load, for spotting hot or oversized shards."""
+        stats = []
+        for number, shard in enumerate(self._shards):
+            with shard.lock:
+                chains = list(shard.chains.values())
+                appends, lookups = shard.appends, shard.lookups
+            stats.append(ShardStats(
+                shard=number,
+                chains=len(chains),
+                blocks=sum(len(chain.blocks) for chain in chains),
+                appends=appends,
+                lookups=lookups
+            ))
+        return stats
+
+    def imbalance(self) -> float:
+        """Largest shard size over the mean shard size (1.0 means perfectly even)."""
+        sizes = [s.chains for s in self.shard_stats()]
+        mean = sum(sizes) / len(sizes)
+        return max(sizes) / mean if mean else 1.0
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    def __contains__(self, batch_id):
+        return batch_id in self._shard(batch_id).chains
+
+    def __len__(self):
+        return sum(len(shard.chains) for shard in self._shards)
+
+    def __iter__(self):
+        """Yields (batch_id, chain) pairs shard by shard."""
+        for shard in self._shards:
+            with shard.lock:
+                items = list(shard.chains.items())
+            yield from items
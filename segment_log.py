@@ -0,0 +1,413 @@
+import atexit
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from block import Block
+
+# On-disk layout of one chain:
+#   <path>.seg  magic + records   [payload length u32][crc32 u32][payload]
+#   <path>.idx  magic + entries   [offset u64][length u32][crc32 u32][block hash 32 bytes]
+# Index entries are fixed width, so entry k lives at a known offset and the
+# index file can be memory-mapped and read without parsing anything before it.
+DATA_MAGIC = b"MCSEG001"
+INDEX_MAGIC = b"MCIDX001"
+RECORD_HEADER = struct.Struct(">II")
+INDEX_ENTRY = struct.Struct(">QII32s")
+
+# Open segments, so queued blocks still reach the disk when the process exits normally
+_OPEN_SEGMENTS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_segments():
+    for segment in list(_OPEN_SEGMENTS):
+        segment.flush()
+
+
+class _LateFlusher:
+    """
+    One daemon thread for every segment in the process: a heap of
+    (deadline, segment) commits each group that waited max_delay without
+    filling up, so segments cost no thread of their own.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []                 # (deadline, tie-breaker, weakref to the segment)
+        self._order = itertools.count()
+        self._thread = None
+
+    def schedule(self, segment, deadline: float):
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._order), weakref.ref(segment)))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="segment-flusher", daemon=True)
+                self._thread.start()
+            elif self._heap[0][0] == deadline:
+                self._cond.notify()     # the new deadline comes first, wake up earlier
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, ref = heapq.heappop(self._heap)
+            segment = ref()
+            if segment is not None:
+                try:
+                    segment._flush_late_group()
+                except Exception:
+                    # The next append or close() commits the group and raises to its caller
+                    pass
+
+
+_FLUSHER = _LateFlusher()
+
+
+class SegmentLog:
+    """
+    Durable, append-only block file for one chain.
+    Appends are buffered and committed in groups: one write + fsync covers
+    every block queued since the previous commit. Data is fsynced before the
+    index, so after a crash only the tail can be torn and _recover() cuts it off.
+
+    A group is committed once it holds group_size blocks or its oldest block
+    has waited max_delay seconds (a shared flusher thread covers a lone group
+    nobody appends after), and at close() or interpreter exit. Until then a crash loses it;
+    with durable=True every append waits for its own commit instead.
+
+    Each open segment holds two file descriptors and an mmap. A process
+    keeping very many chains open needs a raised descriptor limit, or should
+    close the segments of chains it is not using and restore them on demand.
+    """
+
+    def __init__(self, path: str, group_size: int = 64, max_delay: float = 0.05, durable: bool = False):
+        self.data_path = f"{path}.seg"
+        self.index_path = f"{path}.idx"
+        self.group_size = group_size        # commit once this many blocks are queued
+        self.max_delay = max_delay          # ... or the oldest queued block is this old (seconds)
+        self.durable = durable              # default for append(durable=...)
+
+        self._lock = threading.Lock()       # guards the pending queue and the counters
+        self._io_lock = threading.Lock()    # one commit at a time
+        self._pending: list[tuple[int, Block, bytes]] = []
+        self._buffered: dict[int, Block] = {}   # appended but not yet durable
+        self._oldest_pending = None
+        self._closed = False
+        self._index_map = None
+        self.truncated_bytes = 0            # how much torn tail recovery removed
+
+        self._data = self._open(self.data_path, DATA_MAGIC)
+        self._index = self._open(self.index_path, INDEX_MAGIC)
+        self._recover()
+        self._remap()
+        _OPEN_SEGMENTS.add(self)
+
+    @staticmethod
+    def _open(path, magic):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        f = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            f.write(magic)
+            f.flush()
+            os.fsync(f.fileno())
+        elif f.read(len(magic)) != magic:
+            f.close()
+            raise ValueError(f"{path} is not a segment file")
+        return f
+
+    # ---- Recovery ----
+
+    def _read_record(self, offset, data_size):
+        """(length, crc, payload) of a complete, checksum-valid record at offset, else None."""
+        if offset + RECORD_HEADER.size > data_size:
+            return None
+        length, crc = RECORD_HEADER.unpack(os.pread(self._data.fileno(), RECORD_HEADER.size, offset))
+        end = offset + RECORD_HEADER.size + length
+        if end > data_size:
+            return None
+        payload = os.pread(self._data.fileno(), length, offset + RECORD_HEADER.size)
+        if zlib.crc32(payload) != crc:
+            return None
+        return length, crc, payload
+
+    def _recover(self):
+        data_size = os.fstat(self._data.fileno()).st_size
+        index_size = os.fstat(self._index.fileno()).st_size
+        count = (index_size - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+
+        # Drop index entries that point past the data or at a record that fails its checksum.
+        # Only the tail can be bad since data is always fsynced before the index.
+        data_end = len(DATA_MAGIC)
+        while count > 0:
+            entry = os.pread(self._index.fileno(), INDEX_ENTRY.size,
+                             len(INDEX_MAGIC) + (count - 1) * INDEX_ENTRY.size)
+            offset, length, crc, _ = INDEX_ENTRY.unpack(entry)
+            record = self._read_record(offset, data_size)
+            if record is not None and record[:2] == (length, crc):
+                data_end = offset + RECORD_HEADER.size + length
+                break
+            count -= 1
+
+        # Records that reached the data file but not the index are re-indexed
+        new_entries = []
+        while True:
+            record = self._read_record(data_end, data_size)
+            if record is None:
+                break
+            length, crc, payload = record
+            block_hash = Block.from_bytes(payload).hash
+            new_entries.append(INDEX_ENTRY.pack(data_end, length, crc, bytes.fromhex(block_hash)))
+            data_end += RECORD_HEADER.size + length
+
+        index_end = len(INDEX_MAGIC) + count * INDEX_ENTRY.size
+        self.truncated_bytes = (data_size - data_end) + max(0, index_size - index_end)
+        for f, end in ((self._data, data_end), (self._index, index_end)):
+            f.truncate(end)
+            f.seek(end)
+        if new_entries:
+            self._index.write(b"".join(new_entries))
+        for f in (self._data, self._index):
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._count = count + len(new_entries)
+        self._durable_count = self._count
+        self._data_end = data_end
+
+    def _remap(self):
+        if self._index_map is not None:
+            self._index_map.close()
+        size = len(INDEX_MAGIC) + self._durable_count * INDEX_ENTRY.size
+        self._index_map = mmap.mmap(self._index.fileno(), size, access=mmap.ACCESS_READ)
+
+    # ---- Writing ----
+
+    def append(self, block: Block, durable: bool = None) -> int:
+        """
+        Queues a block and returns its position. With durable=True (default: the
+        segment's setting) this only returns once the block is fsynced;
+        concurrent durable appends share a commit. Raises ValueError once closed.
+        """
+        if durable is None:
+            durable = self.durable
+        payload = block.to_bytes()
+        with self._lock:
+            if self._closed:
+                raise ValueError("segment is closed")
+            position = self._count
+            if block.index != position:
+                raise ValueError(f"Block index {block.index} does not follow the segment tip ({position - 1})")
+            self._pending.append((position, block, payload))
+            self._buffered[position] = block
+            self._count += 1
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+                if not durable:
+                    _FLUSHER.schedule(self, self._oldest_pending + self.max_delay)
+            due = (len(self._pending) >= self.group_size
+                   or time.monotonic() - self._oldest_pending >= self.max_delay)
+
+        if durable:
+            self.flush(until=position + 1)
+        elif due:
+            self.flush()
+        return position
+
+    def _flush_late_group(self):
+        # A deadline can outlive its group; a younger group has a deadline of its own
+        with self._lock:
+            waited = (self._oldest_pending is not None and not self._closed
+                      and time.monotonic() - self._oldest_pending >= self.max_delay)
+        if waited:
+            self.flush()
+
+    def flush(self, until: int = None) -> int:
+        """
+        Commits every queued block with a single fsync per file.
+        If until is given and another thread's commit already covered it, returns without I/O.
+        """
+        with self._io_lock:
+            if until is not None and self._durable_count >= until:
+                return 0
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._oldest_pending = None
+            if not batch:
+                return 0
+
+            records, entries = [], []
+            offset = self._data_end
+            for _, block, payload in batch:
+                crc = zlib.crc32(payload)
+                records.append(RECORD_HEADER.pack(len(payload), crc) + payload)
+                entries.append(INDEX_ENTRY.pack(offset, len(payload), crc, bytes.fromhex(block.hash)))
+                offset += RECORD_HEADER.size + len(payload)
+
+            self._data.write(b"".join(records))
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            self._index.write(b"".join(entries))
+            self._index.flush()
+            os.fsync(self._index.fileno())
+
+            with self._lock:
+                self._data_end = offset
+                self._durable_count += len(batch)
+                for position, _, _ in batch:
+                    del self._buffered[position]
+                self._remap()
+            return len(batch)
+
+    # ---- Reading ----
+
+    def _entry(self, position: int):
+        return INDEX_ENTRY.unpack_from(self._index_map, len(INDEX_MAGIC) + position * INDEX_ENTRY.size)
+
+    def _position(self, position: int) -> int:
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError(f"Segment has no block {position}")
+        return position
+
+    def hash_at(self, position: int) -> str:
+        """Hash of the block at position, straight from the index without decoding it."""
+        with self._lock:
+            position = self._position(position)
+            if position in self._buffered:
+                return self._buffered[position].hash
+            return self._entry(position)[3].hex()
+
+    def read(self, position: int) -> bytes:
+        """Raw encoded record of the block at position (O(1): one index lookup, one pread)."""
+        with self._lock:
+            position = self._position(position)
+            if position in self._buffered:
+                return self._buffered[position].to_bytes()
+            offset, length, crc, _ = self._entry(position)
+        payload = os.pread(self._data.fileno(), length, offset + RECORD_HEADER.size)
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Block {position} failed its checksum")
+        return payload
+
+    def get(self, position: int, previous_block: Block = None) -> Block:
+        """Decodes the block at position on demand."""
+        with self._lock:
+            block = self._buffered.get(position)
+        if block is not None:
+            return block
+        return Block.from_bytes(self.read(position), previous_block)
+
+    def __getitem__(self, position: int) -> Block:
+        return self.get(position)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """Decodes blocks lazily in chain order, linking each to its predecessor."""
+        previous = None
+        for position in range(len(self)):
+            previous = self.get(position, previous)
+            yield previous
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True         # appends are refused from here on, so this flush is the last
+        self.flush()
+        _OPEN_SEGMENTS.discard(self)
+        with self._io_lock:
+            self._index_map.close()
+            self._data.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentReader:
+    """
+    Read-only view of a segment's files for checking them (audits): nothing is
+    created, recovered or truncated, so a torn tail is left for the caller to
+    see. Raises OSError if a file is missing and ValueError if one is not a
+    segment file.
+    """
+
+    def __init__(self, path: str):
+        self.data_path = f"{path}.seg"
+        self.index_path = f"{path}.idx"
+        self._data = self._index = None
+        try:
+            self._data = self._open(self.data_path, DATA_MAGIC)
+            self._index = self._open(self.index_path, INDEX_MAGIC)
+        except BaseException:
+            self.close()
+            raise
+        self._data_size = os.fstat(self._data.fileno()).st_size
+        entries_size = os.fstat(self._index.fileno()).st_size - len(INDEX_MAGIC)
+        self._count = entries_size // INDEX_ENTRY.size
+        self.torn_index_bytes = entries_size % INDEX_ENTRY.size    # a partial entry after the last whole one
+
+    @staticmethod
+    def _open(path, magic):
+        f = open(path, "rb")
+        if f.read(len(magic)) != magic:
+            f.close()
+            raise ValueError(f"{path} is not a segment file")
+        return f
+
+    def entry(self, position: int):
+        """(offset, length, crc32, hash bytes) of the index entry at position."""
+        if not 0 <= position < self._count:
+            raise IndexError(f"Segment has no block {position}")
+        return INDEX_ENTRY.unpack(os.pread(self._index.fileno(), INDEX_ENTRY.size,
+                                           len(INDEX_MAGIC) + position * INDEX_ENTRY.size))
+
+    def read(self, position: int) -> bytes:
+        """Raw record at position; ValueError if the data file is cut short or the checksum fails."""
+        offset, length, crc, _ = self.entry(position)
+        if offset + RECORD_HEADER.size + length > self._data_size:
+            raise ValueError(f"Block {position} is cut short in {self.data_path}")
+        payload = os.pread(self._data.fileno(), length, offset + RECORD_HEADER.size)
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Block {position} failed its checksum")
+        return payload
+
+    @property
+    def unindexed_bytes(self) -> int:
+        """Data after the last indexed record (a commit torn between the two files)."""
+        if self._count == 0:
+            return self._data_size - len(DATA_MAGIC)
+        offset, length, _, _ = self.entry(self._count - 1)
+        return max(0, self._data_size - (offset + RECORD_HEADER.size + length))
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
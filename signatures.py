@@ -0,0 +1,68 @@
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519, padding
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.backends import default_backend
+
+
+class SignatureScheme:
+    """One way of signing transfer payloads. Verification raises InvalidSignature on mismatch."""
+    name = None
+
+    def generate_private_key(self):
+        raise NotImplementedError
+
+    def sign(self, private_key, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def verify(self, public_key, signature: bytes, payload: bytes):
+        raise NotImplementedError
+
+
+class RSAPSSScheme(SignatureScheme):
+    """The original scheme: RSA-2048 with PSS padding over SHA-256."""
+    name = "rsa-pss"
+
+    @staticmethod
+    def _padding():
+        return padding.PSS(
+            mgf=padding.MGF1(hashes.SHA256()),
+            salt_length=padding.PSS.MAX_LENGTH
+        )
+
+    def generate_private_key(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+    def sign(self, private_key, payload: bytes) -> bytes:
+        return private_key.sign(payload, self._padding(), hashes.SHA256())
+
+    def verify(self, public_key, signature: bytes, payload: bytes):
+        public_key.verify(signature, payload, self._padding(), hashes.SHA256())
+
+
+class Ed25519Scheme(SignatureScheme):
+    """Ed25519: much cheaper to sign and verify than RSA-PSS, 64 byte signatures."""
+    name = "ed25519"
+
+    def generate_private_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, private_key, payload: bytes) -> bytes:
+        return private_key.sign(payload)
+
+    def verify(self, public_key, signature: bytes, payload: bytes):
+        public_key.verify(signature, payload)
+
+
+DEFAULT_SCHEME = RSAPSSScheme.name
+SCHEMES = {scheme.name: scheme for scheme in (RSAPSSScheme(), Ed25519Scheme())}
+
+
+def get_scheme(name: str = None) -> SignatureScheme:
+    try:
+        return SCHEMES[name or DEFAULT_SCHEME]
+    except KeyError:
+        raise ValueError(f"Unknown signature scheme '{name}'")
+
+
+def register_scheme(scheme: SignatureScheme):
+    """Makes another scheme available to stakeholders and to chain verification."""
+    SCHEMES[scheme.name] = scheme
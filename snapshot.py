@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from block import Block
+
+SNAPSHOT_VERSION = 2
+# Version 1 had no Merkle frontier, restoring one rebuilds the tree from the segment index
+_READABLE_VERSIONS = (1, SNAPSHOT_VERSION)
+
+
+class SnapshotError(ValueError):
+    """The snapshot is corrupt or does not belong to the segment it is restored against."""
+    pass
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Ledger state of one chain at a point in time: the tip block in full plus
+    the facts a restart needs without touching older blocks.
+    """
+    length: int             # blocks in the chain, tip index + 1
+    tip_record: dict        # Block.to_record() of the tip
+    tip_hash: str
+    owner: str
+    status: str
+    watermark: tuple        # (index, hash) validate() had verified up to, or None
+    created: float
+    merkle_frontier: tuple = None   # MerkleAccumulator.frontier() at length, None in version 1 files
+
+    @classmethod
+    def of(cls, chain) -> 'Snapshot':
+        tip = chain.last_block
+        if chain.segment is not None:
+            # Never reference blocks that could still be lost in a crash
+            chain.segment.flush()
+        return cls(
+            length=tip.index + 1,
+            tip_record=tip.to_record(),
+            tip_hash=tip.hash,
+            owner=tip.current_owner,
+            status=tip.status,
+            watermark=chain.checkpoint,
+            created=time.time(),
+            merkle_frontier=tuple(chain.merkle.frontier(tip.index + 1)),
+        )
+
+    def _body(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "length": self.length,
+            "tip": self.tip_record,
+            "tip_hash": self.tip_hash,
+            "owner": self.owner,
+            "status": self.status,
+            "watermark": list(self.watermark) if self.watermark else None,
+            "created": self.created,
+            "merkle_frontier": list(self.merkle_frontier) if self.merkle_frontier is not None else None,
+        }
+
+    def tip_block(self) -> Block:
+        """Decodes the tip and checks it against every fact recorded next to it."""
+        try:
+            tip = Block.from_record(self.tip_record)
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Snapshot tip block is damaged: {e}")
+        if tip.hash != self.tip_hash or tip.index != self.length - 1:
+            raise SnapshotError("Snapshot tip does not match its recorded hash")
+        if tip.current_owner != self.owner or tip.status != self.status:
+            raise SnapshotError("Snapshot owner/status disagree with its tip block")
+        return tip
+
+    def save(self, path: str):
+        """Writes the snapshot atomically: a crash leaves the old file or the new one, never half."""
+        body = json.dumps(self._body(), sort_keys=True, separators=(',', ':'))
+        document = json.dumps({"body": body, "sha256": hashlib.sha256(body.encode('utf-8')).hexdigest()})
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(document)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Snapshot':
+        """Reads a snapshot written by save(), raising SnapshotError if it was damaged."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                document = json.load(f)
+            body, checksum = document["body"], document["sha256"]
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Snapshot {path} is unreadable: {e}")
+        if hashlib.sha256(body.encode('utf-8')).hexdigest() != checksum:
+            raise SnapshotError(f"Snapshot {path} failed its checksum")
+        # The checksum matched, so this is exactly what save() wrote
+        fields = json.loads(body)
+        if fields.get("version") not in _READABLE_VERSIONS:
+            raise SnapshotError(f"Unsupported snapshot version {fields.get('version')}")
+        snapshot = cls(
+            length=fields["length"],
+            tip_record=fields["tip"],
+            tip_hash=fields["tip_hash"],
+            owner=fields["owner"],
+            status=fields["status"],
+            watermark=tuple(fields["watermark"]) if fields["watermark"] else None,
+            created=fields["created"],
+            merkle_frontier=tuple(fields["merkle_frontier"]) if fields.get("merkle_frontier") is not None else None,
+        )
+        snapshot.tip_block()
+        return snapshot
+
+
+def save_snapshot(chain, path: str) -> Snapshot:
+    """Snapshots chain into path; restore it with BlockChain.restore(segment, snapshot=path)."""
+    snapshot = Snapshot.of(chain)
+    snapshot.save(path)
+    return snapshot
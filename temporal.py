@@ -0,0 +1,167 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class ChainTimeline:
+    """
+    Point-in-time view of one chain: a sorted array of block timestamps,
+    where entry i belongs to block i. Who held the batch, where it was and in
+    what state at time T is one bisect plus one block lookup, O(log n);
+    the blocks of a time window are two bisects.
+
+    Built from the chain once, then kept current by a chain listener (attach=True)
+    or by whoever feeds it on_append (LedgerTimeline does, through the registry).
+    Building it reads every block's timestamp but loads no block of a lazily
+    restored chain; at()/between() load the blocks they return.
+    """
+
+    def __init__(self, chain, attach: bool = True):
+        self.chain = chain
+        self._times = array("d")
+        self._lock = threading.Lock()
+        self._attached = attach
+        if attach:
+            # Listen first, then catch up: an append in between is picked up either way
+            chain.add_listener(self.on_append)
+        self.on_append(chain, chain.last_block)
+
+    def on_append(self, chain, block) -> list:
+        """Indexes block and anything before it not yet seen; returns the new (index, time) entries."""
+        with self._lock:
+            times = self._times
+            added = []
+            for index in range(len(times), block.index + 1):
+                timestamp = block.timestamp if index == block.index else chain.blocks.timestamp_at(index)
+                # Clocks can step backwards; clamp so the array stays sorted (a hop never precedes its parent)
+                if times and timestamp < times[-1]:
+                    timestamp = times[-1]
+                times.append(timestamp)
+                added.append((index, timestamp))
+            return added
+
+    def close(self):
+        """Stops following the chain."""
+        if self._attached:
+            self.chain.remove_listener(self.on_append)
+            self._attached = False
+
+    def __len__(self):
+        return len(self._times)
+
+    def index_at(self, timestamp: float) -> int:
+        """Index of the block in force at timestamp, -1 before the chain existed."""
+        return bisect_right(self._times, timestamp) - 1
+
+    def at(self, timestamp: float):
+        """The latest block appended at or before timestamp, or None."""
+        index = self.index_at(timestamp)
+        return self.chain.blocks.get(index) if index >= 0 else None
+
+    def owner_at(self, timestamp: float) -> str:
+        block = self.at(timestamp)
+        return block.current_owner if block is not None else None
+
+    def location_at(self, timestamp: float) -> str:
+        block = self.at(timestamp)
+        return block.location if block is not None else None
+
+    def status_at(self, timestamp: float) -> str:
+        block = self.at(timestamp)
+        return block.status if block is not None else None
+
+    def between(self, start: float, end: float) -> list:
+        """Blocks appended within [start, end], oldest first."""
+        first = bisect_left(self._times, start)
+        last = bisect_right(self._times, end)
+        return [self.chain.blocks.get(index) for index in range(first, last)]
+
+    def at_many(self, timestamps) -> list:
+        """
+        at() for many timestamps (a recall sweep), in the order given.
+        The timestamps are sorted once and each search starts where the
+        previous one ended, so the whole sweep is one pass over the array.
+        """
+        timestamps = list(timestamps)
+        times = self._times
+        results = [None] * len(timestamps)
+        low = 0
+        for position in sorted(range(len(timestamps)), key=timestamps.__getitem__):
+            low = bisect_right(times, timestamps[position], low)
+            if low:
+                results[position] = self.chain.blocks.get(low - 1)
+        return results
+
+
+class LedgerTimeline:
+    """
+    Time index over every chain of a LedgerRegistry: a ChainTimeline per batch
+    plus one ledger-wide array of (time, batch_id, index) for questions such as
+    "every hop between Monday and Wednesday". Fed by a registry listener, so
+    chains created or restored later are covered too.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._timelines = {}
+        self._times = array("d")
+        self._refs = []             # (batch_id, block index), parallel to _times
+        self._lock = threading.Lock()
+        registry.add_listener(self._on_append, replay=True)
+
+    def _on_append(self, chain, block):
+        batch_id = chain.last_block.data.batch_id
+        with self._lock:
+            timeline = self._timelines.get(batch_id)
+            if timeline is None:
+                timeline = self._timelines[batch_id] = ChainTimeline(chain, attach=False)
+                added = [(index, timeline._times[index]) for index in range(len(timeline))]
+            else:
+                added = timeline.on_append(chain, block)
+            for index, timestamp in added:
+                # Appends from different chains arrive in near time order: almost always a plain append
+                position = len(self._times)
+                if position and timestamp < self._times[-1]:
+                    position = bisect_right(self._times, timestamp)
+                self._times.insert(position, timestamp)
+                self._refs.insert(position, (batch_id, index))
+
+    def timeline(self, batch_id) -> ChainTimeline:
+        """Per-chain timeline of a batch, or None if the registry does not know it."""
+        return self._timelines.get(batch_id)
+
+    def at(self, batch_id, timestamp: float):
+        timeline = self._timelines.get(batch_id)
+        return timeline.at(timestamp) if timeline is not None else None
+
+    def owner_at(self, batch_id, timestamp: float) -> str:
+        block = self.at(batch_id, timestamp)
+        return block.current_owner if block is not None else None
+
+    def between(self, start: float, end: float) -> list:
+        """(batch_id, block) for every block appended anywhere within [start, end], in time order."""
+        with self._lock:
+            refs = self._refs[bisect_left(self._times, start):bisect_right(self._times, end)]
+        return [(batch_id, self._timelines[batch_id].chain.blocks.get(index)) for batch_id, index in refs]
+
+    def bulk_at(self, queries) -> list:
+        """
+        Answers many (batch_id, timestamp) questions at once, in the order given:
+        the block in force for each, or None. Queries are grouped per batch so
+        each chain is swept once.
+        """
+        queries = list(queries)
+        by_batch = {}
+        for position, (batch_id, timestamp) in enumerate(queries):
+            by_batch.setdefault(batch_id, []).append(position)
+        results = [None] * len(queries)
+        for batch_id, positions in by_batch.items():
+            timeline = self._timelines.get(batch_id)
+            if timeline is None:
+                continue
+            for position, block in zip(positions, timeline.at_many(queries[p][1] for p in positions)):
+                results[position] = block
+        return results
+
+    def __len__(self):
+        return len(self._times)
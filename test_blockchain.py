@@ -149,7 +149,8 @@ def test_chain_invalidation_on_tampering(fresh_blockchain):
     # Tamper with the location of the first block after it has been added
     # NOTE: In Python, we need to get the block by traversing the chain
     first_real_block = chain.last_block
-    first_real_block.location = "Tampered Location" # Maliciously change data
+    # Blocks refuse attribute assignment, so go around it like a memory/disk edit would
+    object.__setattr__(first_real_block, "location", "Tampered Location") # Maliciously change data
 
     # The `validate` method should now detect the mismatch
     # because the stored hash will not match the newly calculated hash.
@@ -211,3 +212,1588 @@ def test_rule_unauthorized_entity_fails(fresh_blockchain):
     
     with pytest.raises(RuleViolation, match="not authorized to add blocks"):
         chain.rule_engine._check_authorization("Unknown_Hacker")
+
+
+# --- Checkpointed Validation Tests ---
+
+def test_validate_records_checkpoint(fresh_blockchain):
+    """A successful validate() remembers the tip it verified."""
+    chain = fresh_blockchain
+    assert chain.checkpoint is None
+    assert chain.validate()
+    assert chain.checkpoint == (chain.last_block.index, chain.last_block.hash)
+
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    assert chain.validate()
+    assert chain.checkpoint == (2, chain.last_block.hash)
+
+
+def test_incremental_validate_checks_only_new_blocks(fresh_blockchain):
+    """
+    Blocks below the checkpoint are trusted by the incremental walk,
+    deep mode and an invalidated checkpoint still catch tampering there.
+    """
+    chain = fresh_blockchain
+    assert chain.validate()
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+
+    # Tamper with the already verified block 1
+    object.__setattr__(chain.last_block.previous_block, "location", "Tampered Location")
+
+    assert chain.validate(), "Incremental validation trusts the checkpointed block"
+    assert not chain.validate(deep=True), "Deep validation must re-hash every block"
+
+    chain.invalidate_checkpoint()
+    assert chain.checkpoint is None
+    assert not chain.validate(), "Without a checkpoint the full chain is re-checked"
+
+
+def test_incremental_validate_detects_tampering_above_checkpoint(fresh_blockchain):
+    chain = fresh_blockchain
+    assert chain.validate()
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    object.__setattr__(chain.last_block, "status", "Tampered")
+    assert not chain.validate()
+
+
+# --- Block Store Tests ---
+
+def test_block_store_lookup_by_index_and_hash(fresh_blockchain):
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    store = chain.blocks
+
+    assert len(store) == 3
+    assert store.get(0) is chain.head
+    assert store.get(-1) is chain.last_block
+    assert store.get_by_hash(chain.last_block.previous_hash) is store.get(1)
+    assert store.get_by_hash("not-a-hash") is None
+    assert chain.last_block.hash in store
+
+
+def test_block_store_slicing_and_iterators(fresh_blockchain):
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")
+    store = chain.blocks
+
+    assert [b.index for b in store.slice(1, 3)] == [1, 2]
+    assert [b.index for b in store[2:]] == [2, 3]
+    assert [b.index for b in store.iter_forward(2)] == [2, 3]
+    assert [b.index for b in store.iter_reverse()] == [3, 2, 1, 0]
+    assert chain.get_all_blocks() == list(store)
+
+
+def test_block_store_rejects_out_of_order_append(fresh_blockchain):
+    with pytest.raises(ValueError, match="does not follow the store tip"):
+        fresh_blockchain.blocks.append(fresh_blockchain.head)
+
+
+# --- Segment Log (Persistence) Tests ---
+
+def test_segment_log_persists_and_restores_chain(tmp_path, sample_data):
+    from segment_log import SegmentLog
+    path = str(tmp_path / "batch_101")
+
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ", segment=SegmentLog(path))
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.segment.close()
+
+    # A new process re-opens the files and gets the same chain back
+    with SegmentLog(path) as segment:
+        assert len(segment) == 3
+        assert segment.hash_at(2) == chain.last_block.hash
+        assert segment[1].hash == chain.blocks.get(1).hash
+        restored = BlockChain.restore(segment)
+        assert restored.validate(deep=True)
+        assert restored.last_block.current_owner == "Dist_X"
+        assert restored.last_block.transfer_history == ["PharmaCorp"]
+
+        restored.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")
+    with SegmentLog(path) as segment:
+        assert len(segment) == 4
+
+
+def test_segment_log_truncates_torn_tail(tmp_path, sample_data):
+    from segment_log import SegmentLog
+    path = str(tmp_path / "batch_101")
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ", segment=SegmentLog(path))
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.segment.close()
+
+    # Simulate a crash halfway through writing the last record and its index entry
+    with open(path + ".seg", "r+b") as f:
+        f.truncate(f.seek(0, 2) - 10)
+    with open(path + ".idx", "r+b") as f:
+        f.truncate(f.seek(0, 2) - 5)
+
+    with SegmentLog(path) as segment:
+        assert len(segment) == 2
+        assert segment.truncated_bytes > 0
+        assert [b.index for b in segment] == [0, 1]
+
+
+def test_segment_log_reindexes_records_missing_from_index(tmp_path, sample_data):
+    from segment_log import SegmentLog, INDEX_ENTRY
+    path = str(tmp_path / "batch_101")
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ", segment=SegmentLog(path))
+    chain.segment.close()
+
+    # Data was fsynced but the crash happened before the index write
+    with open(path + ".idx", "r+b") as f:
+        f.truncate(f.seek(0, 2) - INDEX_ENTRY.size)
+
+    with SegmentLog(path) as segment:
+        assert len(segment) == 2
+        assert segment.hash_at(1) == chain.last_block.hash
+
+
+def test_segment_log_group_commit(tmp_path, sample_data):
+    from segment_log import SegmentLog
+    segment = SegmentLog(str(tmp_path / "batch_101"), group_size=100, max_delay=60)
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ", segment=segment)
+
+    # Queued blocks are readable before they are committed
+    assert segment.get(1).hash == chain.last_block.hash
+    assert segment.flush() == 2
+    assert segment.flush() == 0
+    segment.close()
+
+
+def test_segment_log_commits_a_lone_group_after_max_delay(tmp_path, sample_data):
+    import time
+    from segment_log import SegmentLog
+    path = str(tmp_path / "batch_101")
+    segment = SegmentLog(path, group_size=100, max_delay=0.05)
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ", segment=segment)
+    chain.secure_add_block("Dist_X", "SHIPPED", "Depot")
+    time.sleep(0.3)
+    # Reopening without close() sees exactly what a crash would leave behind
+    with SegmentLog(path) as reopened:
+        assert len(reopened) == 3
+
+    durable = SegmentLog(str(tmp_path / "durable"), max_delay=60, durable=True)
+    BlockChain(sample_data, "Retail_Y", "Shop", segment=durable)
+    assert durable.flush() == 0, "Every append already waited for its fsync"
+    durable.close()
+    segment.close()
+
+
+def test_segment_logs_share_one_flusher_and_refuse_appends_once_closed(tmp_path, fresh_blockchain):
+    import threading
+    import time
+    from segment_log import SegmentLog
+    genesis = fresh_blockchain.blocks.get(0)
+    before = threading.active_count()
+    segments = [SegmentLog(str(tmp_path / f"batch_{n}"), max_delay=0.02) for n in range(50)]
+    for segment in segments:
+        segment.append(genesis)
+    assert threading.active_count() <= before + 1, "No thread per segment or per group"
+    time.sleep(0.3)
+    for n in range(50):
+        with SegmentLog(str(tmp_path / f"batch_{n}")) as reopened:
+            assert len(reopened) == 1
+
+    for segment in segments:
+        segment.close()
+    with pytest.raises(ValueError, match="closed"):
+        segments[0].append(genesis)
+
+
+# --- Ledger Registry Tests ---
+
+def _batch(batch_id):
+    return data(
+        batch_id=batch_id,
+        name=f"Batch {batch_id}",
+        manufacturer="PharmaCorp",
+        expiry_date=date.today() + timedelta(days=365)
+    )
+
+
+def test_registry_creates_and_looks_up_chains():
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    for batch_id in range(1, 9):
+        registry.create_chain(_batch(batch_id), "PharmaCorp", "Factory")
+
+    assert len(registry) == 8
+    assert 3 in registry and 42 not in registry
+    assert registry.get(3).last_block.data.batch_id == 3
+    assert registry.get(42) is None
+    with pytest.raises(ValueError, match="already has a chain"):
+        registry.create_chain(_batch(3), "PharmaCorp", "Factory")
+
+
+def test_registry_parallel_transfers_and_stats():
+    from concurrent.futures import ThreadPoolExecutor
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    for batch_id in range(1, 9):
+        registry.create_chain(_batch(batch_id), "PharmaCorp", "Factory")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda b: registry.transfer(b, "Dist_X", "SHIPPED", "Warehouse"), range(1, 9)))
+
+    assert all(chain.last_block.current_owner == "Dist_X" for _, chain in registry)
+    stats = registry.shard_stats()
+    assert sum(s.chains for s in stats) == 8
+    assert sum(s.appends for s in stats) == 8
+    assert sum(s.blocks for s in stats) == 8 * 3
+    assert registry.imbalance() >= 1.0
+    with pytest.raises(KeyError):
+        registry.transfer(42, "Dist_X", "SHIPPED", "Warehouse")
+
+
+def test_registry_listener_can_replay_existing_chains():
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=2)
+    registry.create_chain(_batch(11), "PharmaCorp", "Factory")
+    quiet, replayed = [], []
+    registry.add_listener(lambda chain, block: quiet.append(block.index))
+    registry.add_listener(lambda chain, block: replayed.append(block.index), replay=True)
+    assert quiet == [] and replayed == [1]
+
+    registry.transfer(11, "Dist_X", "SHIPPED", "Warehouse")
+    assert quiet == [2] and replayed == [1, 2]
+
+
+def test_registry_listener_attaches_once_to_chains_joining_concurrently():
+    import sys
+    import threading
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    chains = [BlockChain(_batch(batch_id), "PharmaCorp", "Factory") for batch_id in range(20, 80)]
+    adder = threading.Thread(target=lambda: [registry.add_chain(chain) for chain in chains])
+    callbacks = [lambda chain, block: None for _ in range(200)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)     # switch threads as often as possible
+    try:
+        adder.start()
+        for callback in callbacks:
+            registry.add_listener(callback, replay=True)
+        adder.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert all(chain._listeners.count(callback) == 1 for chain in chains for callback in callbacks)
+
+
+# --- Hybrid Encryption Tests ---
+
+def _long_batch():
+    return data(
+        batch_id=202,
+        name="Amoxicillin Clavulanate Extended Release Oral Suspension " * 3,
+        manufacturer="PharmaCorp International Manufacturing Division " * 3,
+        expiry_date=date.today() + timedelta(days=365)
+    )
+
+
+def test_hybrid_transfer_is_lossless_for_large_payloads():
+    long_data = _long_batch()
+    chain = BlockChain(long_data, "PharmaCorp", "Factory", hybrid_transfers=True)
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+
+    assert chain.last_block.data == long_data, "Nothing may be dropped or truncated"
+    assert chain.validate()
+
+
+def test_hybrid_session_key_is_reused_within_ttl():
+    from SecureTransfer import SecureTransfer
+    SecureTransfer.clear_session_keys()
+    chain = BlockChain(_long_batch(), "PharmaCorp", "Factory")
+    payload = b"payload"
+
+    first, _ = SecureTransfer.initiate_transfer("PharmaCorp", "Dist_X", chain.last_block, payload, hybrid=True)
+    second, _ = SecureTransfer.initiate_transfer("PharmaCorp", "Dist_X", chain.last_block, payload, hybrid=True)
+    header = len(SecureTransfer.HYBRID_MAGIC) + 2 + 256
+    assert first[:header] == second[:header], "Same wrapped key for the same pair"
+    assert first[header:] != second[header:], "Fresh nonce per envelope"
+
+    SecureTransfer.clear_session_keys()
+    third, _ = SecureTransfer.initiate_transfer("PharmaCorp", "Dist_X", chain.last_block, payload, hybrid=True)
+    assert third[:header] != first[:header]
+
+
+def test_session_key_caches_drop_expired_entries(monkeypatch):
+    from SecureTransfer import SecureTransfer
+    SecureTransfer.clear_session_keys()
+    monkeypatch.setattr(SecureTransfer, "SESSION_KEY_TTL", 0.0)
+    chain = BlockChain(_long_batch(), "PharmaCorp", "Factory", hybrid_transfers=True)
+    for buyer in ("Dist_X", "Retail_Y", "Dist_X", "Retail_Y"):
+        chain.secure_add_block(buyer, "SHIPPED", "Hub")
+    # Every insert evicts what already expired, only the newest entry survives
+    assert len(SecureTransfer._session_keys) <= 1
+    assert len(SecureTransfer._unwrapped_keys) <= 1
+
+    monkeypatch.setattr(SecureTransfer, "SESSION_KEY_TTL", 300.0)
+    monkeypatch.setattr(SecureTransfer, "MAX_SESSION_KEYS", 1)
+    chain.secure_add_block("Dist_X", "SHIPPED", "Hub")
+    chain.secure_add_block("Retail_Y", "SHIPPED", "Hub")
+    assert len(SecureTransfer._session_keys) == 1 and len(SecureTransfer._unwrapped_keys) == 1
+    SecureTransfer.clear_session_keys()
+
+
+def test_hybrid_envelope_is_bound_to_seller_and_buyer(fresh_blockchain):
+    from SecureTransfer import SecureTransfer
+    chain = fresh_blockchain
+    envelope, _ = SecureTransfer.initiate_transfer(
+        "PharmaCorp", "Dist_X", chain.last_block, b"payload", hybrid=True
+    )
+    # A validly signed replay from another seller fails the AES-GCM associated data check
+    replay_signature = SecureTransfer._sign("Retail_Y", b"payload")
+    with pytest.raises(ValueError, match="could not be opened"):
+        SecureTransfer.receive_transfer("Retail_Y", "Dist_X", envelope, "Somewhere", replay_signature, b"payload")
+
+
+def test_receive_transfer_still_accepts_legacy_format(fresh_blockchain):
+    from SecureTransfer import SecureTransfer
+    chain = fresh_blockchain
+    payload = b"payload"
+    legacy, signature = SecureTransfer.initiate_transfer("PharmaCorp", "Dist_X", chain.last_block, payload)
+    received, location, buyer, _ = SecureTransfer.receive_transfer(
+        "PharmaCorp", "Dist_X", legacy, "Dist_X Warehouse", signature, payload
+    )
+    assert received == chain.last_block.data
+    assert (location, buyer) == ("Dist_X Warehouse", "Dist_X")
+
+
+# --- Keystore Tests ---
+
+def test_keystore_generates_missing_keys_and_loads_lazily(tmp_path, monkeypatch):
+    import key_gen
+    from keystore import KeyStore
+    store = KeyStore(str(tmp_path / "keys"), cache_size=2)
+    assert store.generate_missing(["Lab_A", "Lab_B", "Lab_A"], workers=2) == ["Lab_A", "Lab_B"]
+    assert store.generate_missing(["Lab_A"]) == [], "Existing keys are not regenerated"
+    assert store.loads == 0, "Nothing is deserialized until it is used"
+
+    monkeypatch.setattr(key_gen, "KEYSTORE", store)
+    assert "Lab_A" in PRIVATE_KEYS and "Lab_C" not in PRIVATE_KEYS
+    signature = PRIVATE_KEYS["Lab_A"].sign(
+        b"payload",
+        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+        hashes.SHA256()
+    )
+    key_gen.ALLOWED_KEYS["Lab_A"].verify(
+        signature,
+        b"payload",
+        padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+        hashes.SHA256()
+    )
+    assert store.loads == 2
+
+    # Cached objects are reused, the LRU keeps at most cache_size of them
+    PRIVATE_KEYS["Lab_A"]
+    assert store.loads == 2
+    PRIVATE_KEYS["Lab_B"]                   # evicts the least recently used public key of Lab_A
+    PRIVATE_KEYS["Lab_A"]
+    assert store.loads == 3
+    key_gen.ALLOWED_KEYS["Lab_A"]
+    assert store.loads == 4
+    with pytest.raises(KeyError):
+        PRIVATE_KEYS["Lab_C"]
+
+    # Membership checks come from the scanned name sets, not the filesystem
+    monkeypatch.setattr("os.path.exists", lambda path: pytest.fail("filesystem hit"))
+    assert "Lab_B" in key_gen.ALLOWED_KEYS and "Lab_C" not in key_gen.ALLOWED_KEYS
+
+
+def test_keystore_checks_rsa_keys_unless_told_not_to(tmp_path):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from keystore import KeyStore
+    store = KeyStore(str(tmp_path / "keys"))
+    store.generate_missing(["Lab_A"])
+    with open(store.private_path("Lab_A"), "rb") as f:
+        numbers = serialization.load_pem_private_key(f.read(), password=None).private_numbers()
+    # A tampered key file: a CRT parameter that no longer fits the modulus
+    broken = rsa.RSAPrivateNumbers(
+        numbers.p, numbers.q, numbers.d, numbers.dmp1 ^ 2, numbers.dmq1, numbers.iqmp, numbers.public_numbers
+    ).private_key(unsafe_skip_rsa_key_validation=True)
+    with open(store.private_path("Lab_A"), "wb") as f:
+        f.write(broken.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption()))
+
+    with pytest.raises(ValueError):
+        KeyStore(str(tmp_path / "keys")).private_key("Lab_A")
+    assert KeyStore(str(tmp_path / "keys"), check_rsa_keys=False).private_key("Lab_A") is not None
+
+
+# --- Signature Scheme Tests ---
+
+@pytest.fixture
+def ed25519_dist_x(monkeypatch):
+    """Switches Dist_X to Ed25519 signing for one test."""
+    import key_gen
+    monkeypatch.setattr(key_gen, "SIGNING_SCHEMES", {})
+    monkeypatch.setattr(key_gen, "SIGNING_KEYS", {})
+    monkeypatch.setattr(key_gen, "VERIFY_KEYS", {})
+    key_gen.generate_signing_keys(["Dist_X"], scheme="ed25519")
+    return key_gen
+
+
+def test_mixed_signature_schemes_in_one_chain(fresh_blockchain, ed25519_dist_x):
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")     # signed by PharmaCorp (RSA)
+    chain.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")  # signed by Dist_X (Ed25519)
+
+    blocks = chain.get_all_blocks()
+    assert [b.sig_scheme for b in blocks[1:]] == ["rsa-pss", "rsa-pss", "ed25519"]
+    assert len(blocks[3].signature) == 64
+    assert chain.validate(deep=True)
+
+
+def test_signature_scheme_is_part_of_block_hash(fresh_blockchain):
+    chain = fresh_blockchain
+    object.__setattr__(chain.last_block, "sig_scheme", "ed25519")
+    assert not chain.validate()
+
+
+def test_rule_engine_verifies_with_recorded_scheme(fresh_blockchain, ed25519_dist_x):
+    from signatures import get_scheme
+    chain = fresh_blockchain
+    payload = "payload"
+    signature = get_scheme("ed25519").sign(ed25519_dist_x.signing_key("Dist_X"), payload.encode())
+
+    chain.rule_engine._verify_signature(signature, payload, "Dist_X", "ed25519")
+    with pytest.raises(RuleViolation, match="Invalid digital signature."):
+        chain.rule_engine._verify_signature(signature, payload, "Dist_X", "rsa-pss")
+
+
+def test_unknown_signature_scheme_is_rejected():
+    from signatures import get_scheme
+    with pytest.raises(ValueError, match="Unknown signature scheme"):
+        get_scheme("dsa-1024")
+
+
+# --- Verification Cache Tests ---
+
+def test_transfer_verifies_sender_signature_once(fresh_blockchain):
+    from verify_cache import VERIFY_CACHE
+    VERIFY_CACHE.clear()
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    # receive_transfer misses, the RuleEngine check right after hits
+    assert (VERIFY_CACHE.misses, VERIFY_CACHE.hits) == (1, 1)
+
+
+def test_verification_cache_never_caches_failures(fresh_blockchain):
+    import key_gen
+    from verify_cache import VerificationCache
+    from signatures import get_scheme
+    from cryptography.exceptions import InvalidSignature
+    cache = VerificationCache(maxsize=2)
+    scheme = get_scheme("rsa-pss")
+    public_key = key_gen.ALLOWED_KEYS["PharmaCorp"]
+    bad_signature = scheme.sign(PRIVATE_KEYS["Retail_Y"], b"payload")
+
+    for _ in range(2):
+        with pytest.raises(InvalidSignature):
+            cache.verify(scheme, public_key, bad_signature, b"payload")
+    assert len(cache) == 0 and cache.misses == 2
+
+    # LRU bound
+    for n in range(3):
+        payload = f"payload {n}".encode()
+        cache.verify(scheme, public_key, scheme.sign(PRIVATE_KEYS["PharmaCorp"], payload), payload)
+    assert len(cache) == 2
+
+
+def test_key_rotation_and_revocation_invalidate_cached_verifications():
+    import key_gen
+    from verify_cache import VERIFY_CACHE
+    from signatures import get_scheme
+    scheme = get_scheme("rsa-pss")
+    key_gen.generate_keys_for_stakeholders(["Lab_Rotated"])
+    old_key = key_gen.ALLOWED_KEYS["Lab_Rotated"]
+    signature = scheme.sign(PRIVATE_KEYS["Lab_Rotated"], b"payload")
+    VERIFY_CACHE.verify(scheme, old_key, signature, b"payload")
+    assert VERIFY_CACHE.invalidate_key(old_key) == 1
+
+    VERIFY_CACHE.verify(scheme, old_key, signature, b"payload")
+    key_gen.rotate_keys("Lab_Rotated")
+    assert key_gen.ALLOWED_KEYS["Lab_Rotated"] is not old_key
+    assert VERIFY_CACHE.invalidate_key(old_key) == 0, "Rotation already dropped the entry"
+
+    new_key = key_gen.ALLOWED_KEYS["Lab_Rotated"]
+    new_signature = scheme.sign(PRIVATE_KEYS["Lab_Rotated"], b"payload")
+    VERIFY_CACHE.verify(scheme, new_key, new_signature, b"payload")
+    key_gen.revoke_keys("Lab_Rotated")
+    assert "Lab_Rotated" not in key_gen.ALLOWED_KEYS
+    assert VERIFY_CACHE.invalidate_key(new_key) == 0
+    with pytest.raises(KeyError):
+        key_gen.verification_key("Lab_Rotated")
+
+
+def test_verification_cache_keeps_no_key_objects_alive():
+    from cryptography.hazmat.primitives import serialization
+    from signatures import get_scheme
+    from verify_cache import VerificationCache
+    cache = VerificationCache()
+    scheme = get_scheme("rsa-pss")
+    signature = scheme.sign(PRIVATE_KEYS["Dist_X"], b"payload")
+    public_key = PRIVATE_KEYS["Dist_X"].public_key()
+    cache.verify(scheme, public_key, signature, b"payload")
+
+    # A reloaded copy of the same key (as after a KeyStore LRU eviction) still hits
+    reloaded = serialization.load_pem_public_key(public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    cache.verify(scheme, reloaded, signature, b"payload")
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert not any(value is public_key for value in vars(cache).values())
+
+
+# --- Compact Block Tests ---
+
+def test_block_is_immutable_and_slotted(fresh_blockchain):
+    block = fresh_blockchain.last_block
+    with pytest.raises(AttributeError, match="immutable"):
+        block.location = "Elsewhere"
+    with pytest.raises(AttributeError):
+        block.__dict__
+    block.transfer_history.append("Mallory")
+    assert block.transfer_history == [], "The history list handed out is a copy"
+
+
+def test_block_interns_repeated_strings(sample_data):
+    owner = "".join(["Dist", "_X"])  # equal value, different object
+    block = Block(2, sample_data, None, "0" * 64, "Warehouse", owner, b"sig", "SHIPPED", owner, [owner])
+    import sys
+    assert block.current_owner is sys.intern("Dist_X")
+    assert block.transfer_history[0] is block.current_owner
+
+
+def test_canonical_encoding_is_unambiguous(sample_data):
+    def make(location, added_by):
+        return Block(1, sample_data, None, "0" * 64, location, added_by, b"sig", "SHIPPED",
+                     "Dist_X", [], timestamp=1.0)
+    # The old f-string concatenation hashed both of these identically
+    assert make("ab", "c").hash != make("a", "bc").hash
+    assert make("ab", "c").hash == make("ab", "c").hash
+
+
+def test_swapped_signature_breaks_validation(fresh_blockchain):
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Depot")
+    object.__setattr__(fresh_blockchain.blocks.get(2), "signature", b"forged")
+    assert not fresh_blockchain.validate(deep=True)
+
+
+def test_blocks_do_not_pin_their_ancestors(sample_data):
+    import gc
+    chain = BlockChain(sample_data, "PharmaCorp", "PharmaCorp HQ")
+    chain.secure_add_block("Dist_X", "SHIPPED", "Depot")
+    tip = chain.last_block
+    assert tip.previous_block is chain.blocks.get(1), "Resolvable while the chain holds it"
+    del chain
+    gc.collect()
+    assert tip.previous_block is None
+
+
+# --- Shared History Tests ---
+
+def test_consecutive_blocks_share_history_nodes(fresh_blockchain):
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")
+    second, third = chain.blocks.get(2), chain.blocks.get(3)
+
+    assert third.history.parent is second.history, "Only one node is added per transfer"
+    assert third.transfer_history == ["PharmaCorp", "Dist_X"]
+    assert list(third.iter_history(newest_first=True)) == ["Dist_X", "PharmaCorp"]
+    assert len(third.history) == 2
+
+
+def test_history_digest_covers_every_owner():
+    from block import History
+    history = History.from_iterable(["PharmaCorp", "Dist_X"])
+    assert history == History.from_iterable(["PharmaCorp", "Dist_X"])
+    assert history != History.from_iterable(["PharmaCorp", "Retail_Y"])
+    assert history != History.from_iterable(["Dist_X", "PharmaCorp"])
+    with pytest.raises(AttributeError):
+        history.owner = "Mallory"
+
+
+def test_history_survives_persistence(tmp_path, fresh_blockchain):
+    from segment_log import SegmentLog
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")
+    with SegmentLog(str(tmp_path / "batch")) as segment:
+        for block in chain.blocks:
+            segment.append(block)
+    with SegmentLog(str(tmp_path / "batch")) as segment:
+        assert segment.get(3).transfer_history == ["PharmaCorp", "Dist_X"], "Random access decodes alone"
+        restored = BlockChain.restore(segment)
+        assert restored.blocks.get(3).history.parent is restored.blocks.get(2).history
+
+
+def test_shared_history_still_checks_the_recorded_prefix(fresh_blockchain):
+    chain = fresh_blockchain
+    chain.secure_add_block("Dist_X", "SHIPPED", "Dist_X Warehouse")
+    chain.secure_add_block("Retail_Y", "DELIVERED", "Retail_Y Pharmacy")
+    record = chain.blocks.get(3).to_record()
+    assert Block.from_record(record, chain.blocks.get(2)).hash == record['hash']
+
+    tampered = {**record, 'transfer_history': ["Mallory", "Dist_X"]}
+    with pytest.raises(ValueError, match="recorded hash"):
+        Block.from_record(tampered, chain.blocks.get(2))
+
+
+# --- Bulk Transfer Tests ---
+
+def test_bulk_transfer_commits_each_chain_in_order():
+    from bulk_transfer import bulk_secure_transfer
+    chains = [BlockChain(_batch(batch_id), "PharmaCorp", "Factory") for batch_id in (301, 302, 303)]
+    requests = []
+    for chain in chains:
+        requests.append((chain, "Dist_X", "SHIPPED", "Dist_X Warehouse"))
+    for chain in chains:
+        requests.append((chain, "Retail_Y", "DELIVERED", "Retail_Y Pharmacy"))
+
+    results = bulk_secure_transfer(requests, max_workers=3)
+
+    assert all(result.ok for result in results)
+    assert [result.block.index for result in results] == [2, 2, 2, 3, 3, 3]
+    for chain in chains:
+        assert chain.last_block.transfer_history == ["PharmaCorp", "Dist_X"]
+        assert chain.validate(deep=True)
+
+
+def test_bulk_transfer_reports_violations_per_item(expired_data):
+    from bulk_transfer import bulk_secure_transfer
+    good = BlockChain(_batch(304), "PharmaCorp", "Factory")
+    expired = BlockChain(expired_data, "PharmaCorp", "Factory")
+
+    results = bulk_secure_transfer([
+        (expired, "Dist_X", "SHIPPED", "Dist_X Warehouse"),
+        (good, "Dist_X", "SHIPPED", "Dist_X Warehouse"),
+        (good, "Unknown_Hacker", "SHIPPED", "Somewhere"),
+    ])
+
+    assert isinstance(results[0].error, RuleViolation)
+    assert results[1].ok and results[1].block is good.last_block
+    assert not results[2].ok
+    assert len(expired.blocks) == 2 and len(good.blocks) == 3
+
+
+# --- Async Front-end Tests ---
+
+def test_async_transfers_keep_per_chain_order():
+    import asyncio
+    from async_ledger import AsyncLedger
+
+    async def scenario():
+        async with AsyncLedger(max_workers=4, max_in_flight=3) as ledger:
+            chains = await asyncio.gather(*(
+                ledger.create_chain(_batch(batch_id), "PharmaCorp", "Factory") for batch_id in (401, 402)
+            ))
+            hops = []
+            for chain in chains:
+                hops.append(ledger.transfer(chain, "Dist_X", "SHIPPED", "Dist_X Warehouse"))
+                hops.append(ledger.transfer(chain, "Retail_Y", "DELIVERED", "Retail_Y Pharmacy"))
+            blocks = await asyncio.gather(*hops)
+            assert ledger.in_flight == 0
+            valid = await asyncio.gather(*(ledger.validate(chain, deep=True) for chain in chains))
+            return chains, blocks, valid
+
+    chains, blocks, valid = asyncio.run(scenario())
+    assert [block.index for block in blocks] == [2, 3, 2, 3]
+    assert all(valid)
+    for chain in chains:
+        assert chain.last_block.transfer_history == ["PharmaCorp", "Dist_X"]
+
+
+def test_async_busy_chain_does_not_starve_other_batches():
+    import asyncio
+    from async_ledger import AsyncLedger
+
+    async def scenario():
+        async with AsyncLedger(max_workers=2, max_in_flight=2) as ledger:
+            busy, other = await asyncio.gather(*(
+                ledger.create_chain(_batch(batch_id), "PharmaCorp", "Factory") for batch_id in (411, 412)
+            ))
+            finished = []
+
+            async def hop(chain, buyer, label):
+                await ledger.transfer(chain, buyer, "SHIPPED", "Hub")
+                finished.append(label)
+
+            hops = [hop(busy, ["Dist_X", "Retail_Y"][n % 2], "busy") for n in range(6)]
+            await asyncio.gather(*hops, hop(other, "Dist_X", "other"))
+            return finished
+
+    finished = asyncio.run(scenario())
+    # Queued hops of the busy batch wait on its chain lock without holding slots
+    assert finished.index("other") <= 2
+
+
+def test_async_transfer_raises_rule_violation(expired_data):
+    import asyncio
+    from async_ledger import AsyncLedger
+
+    async def scenario():
+        async with AsyncLedger(max_workers=1) as ledger:
+            chain = await ledger.create_chain(expired_data, "PharmaCorp", "Factory")
+            await ledger.transfer(chain, "Dist_X", "SHIPPED", "Dist_X Warehouse")
+
+    with pytest.raises(RuleViolation, match="expired"):
+        asyncio.run(scenario())
+
+
+# --- Concurrent Append Tests ---
+
+def test_stale_tip_is_rejected_with_chain_conflict(fresh_blockchain):
+    from blockchain import ChainConflict
+    chain = fresh_blockchain
+    first = chain.prepare_transfer("Dist_X", "Dist_X Warehouse")
+    second = chain.prepare_transfer("Retail_Y", "Retail_Y Pharmacy")
+
+    chain.commit_transfer(first, "SHIPPED")
+    with pytest.raises(ChainConflict):
+        chain.commit_transfer(second, "SHIPPED")
+    assert len(chain.blocks) == 3
+
+
+def test_concurrent_appends_never_fork_the_chain(fresh_blockchain):
+    import threading
+    from blockchain import ChainConflict
+    chain = fresh_blockchain
+    outcomes = []
+    barrier = threading.Barrier(8)
+
+    def transfer(buyer):
+        barrier.wait()
+        try:
+            chain.secure_add_block(buyer, "SHIPPED", f"{buyer} Warehouse")
+            outcomes.append("ok")
+        except ChainConflict:
+            outcomes.append("conflict")
+
+    threads = [threading.Thread(target=transfer, args=(["Dist_X", "Retail_Y"][n % 2],)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(outcomes) == 8
+    assert len(chain.blocks) == 2 + outcomes.count("ok")
+    assert [block.index for block in chain.blocks] == list(range(len(chain.blocks)))
+    for block in chain.blocks.slice(2):
+        previous = chain.blocks.get(block.index - 1)
+        assert block.previous_hash == previous.hash
+        assert block.transfer_history == previous.transfer_history + [previous.current_owner]
+    assert chain.validate(deep=True)
+
+
+# --- Benchmark Suite Tests ---
+
+def test_benchmark_compare_flags_regressions_only():
+    from benchmarks import compare
+    baseline = {"results": {"x": {"init_us": 100.0, "transfers_per_s@4": 1000.0, "blocks": 10}}}
+    current = {"results": {"x": {"init_us": 125.0, "transfers_per_s@4": 850.0, "blocks": 99}}}
+
+    regressions = compare(baseline, current, threshold=0.10)
+    assert len(regressions) == 2
+    assert compare(baseline, current, threshold=0.30) == []
+    assert compare(current, baseline, threshold=0.10) == [], "Getting faster is never a regression"
+
+
+def test_benchmark_run_produces_saved_format():
+    from benchmarks import run
+    report = run(["chain_scans"], chain_scans={"lengths": (10,)})
+    assert set(report) == {"meta", "results"}
+    assert "validate_deep_us@10" in report["results"]["chain_scans"]
+
+
+# --- Instrumentation Tests ---
+
+@pytest.fixture
+def instruments():
+    from instrumentation import INSTRUMENTS
+    INSTRUMENTS.reset()
+    INSTRUMENTS.enabled = True
+    yield INSTRUMENTS
+    INSTRUMENTS.enabled = False
+    INSTRUMENTS.reset()
+
+
+def test_instrumentation_is_a_no_op_when_disabled(fresh_blockchain):
+    from instrumentation import INSTRUMENTS
+    INSTRUMENTS.reset()
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    assert INSTRUMENTS.snapshot() == {"counters": [], "histograms": {}}
+
+
+def test_transfer_records_every_phase(fresh_blockchain, instruments):
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+
+    assert instruments.counter("transfers_total") == 1
+    for phase in ("sign", "encrypt", "verify", "decrypt", "rules", "hash"):
+        assert instruments.histogram(phase).count == 1, phase
+
+    text = instruments.export_prometheus()
+    assert "medichain_transfers_total 1" in text
+    assert 'medichain_phase_seconds_bucket{phase="sign",le="+Inf"} 1' in text
+    assert 'medichain_phase_seconds_count{phase="rules"} 1' in text
+
+
+def test_rule_violations_are_counted_and_streamed(expired_data, instruments):
+    from instrumentation import WARNING
+    chain = BlockChain(expired_data, "PharmaCorp", "Factory")
+    events = []
+    instruments.subscribe(events.append)
+    try:
+        with pytest.raises(RuleViolation):
+            chain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    finally:
+        instruments.unsubscribe(events.append)
+
+    assert instruments.counter("rule_violations_total", rule="expiry") == 1
+    assert instruments.counter("transfers_total") == 0
+    violation = [event for event in events if event.name == "transfer.rule_violation"]
+    assert len(violation) == 1 and violation[0].level == WARNING
+    assert violation[0].fields["batch_id"] == 999
+
+    exported = []
+    instruments.export(exported.append)
+    assert {"name": "rule_violations_total", "labels": {"rule": "expiry"}, "value": 1} in exported[0]["counters"]
+
+
+# --- Rule Pipeline Tests ---
+
+def test_rules_run_cheapest_first_and_short_circuit(fresh_blockchain):
+    from RuleEngine import Rule, SignatureRule
+
+    calls = []
+
+    class Recall(Rule):
+        name, cost = "recall", 0
+
+        def check(self, engine, transfer):
+            calls.append(self.name)
+            if transfer.data.batch_id == 101:
+                raise RuleViolation("Batch 101 is recalled.")
+
+    class CountingSignature(SignatureRule):
+        def check(self, engine, transfer):
+            calls.append(self.name)
+            super().check(engine, transfer)
+
+    engine = fresh_blockchain.rule_engine
+    engine.unregister("signature")
+    engine.register(CountingSignature())
+    engine.register(Recall())
+    assert [rule.name for rule in engine.rules] == [
+        "recall", "authorization", "required_fields", "expiry", "duplicate_batch", "signature"
+    ]
+
+    with pytest.raises(RuleViolation, match="recalled"):
+        fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    assert calls == ["recall"], "The signature rule must not run after a cheap rule failed"
+    with pytest.raises(ValueError):
+        engine.register(Recall())
+
+
+def test_expired_transfer_never_reaches_rsa(expired_data, monkeypatch):
+    from SecureTransfer import SecureTransfer
+    chain = BlockChain(expired_data, "PharmaCorp", "Factory")
+
+    def no_crypto(*args, **kwargs):
+        raise AssertionError("RSA work done for an expired batch")
+    monkeypatch.setattr(SecureTransfer, "initiate_transfer", no_crypto)
+
+    with pytest.raises(RuleViolation, match="expired"):
+        chain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+
+
+def test_evaluate_batch_checks_fields_and_expiry_at_once(fresh_blockchain):
+    today = date(2030, 6, 1)
+    pending = [
+        data(batch_id=1, name="A", manufacturer="M", expiry_date=date(2030, 6, 2)),
+        data(batch_id=2, name="B", manufacturer="M", expiry_date=date(2030, 6, 1)),
+        data(batch_id=3, name="", manufacturer="M", expiry_date=date(2020, 1, 1)),
+    ]
+    verdicts = fresh_blockchain.rule_engine.evaluate_batch(pending, today)
+
+    assert verdicts[0] is None
+    assert isinstance(verdicts[1], RuleViolation) and "expired" in str(verdicts[1])
+    assert "Missing" in str(verdicts[2]), "Cheaper field check reports first"
+
+
+# --- Batch Index Tests ---
+
+@pytest.fixture
+def installed_index():
+    import batch_index
+    index = batch_index.use_batch_index()
+    yield index
+    batch_index.BATCH_INDEX = None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    from batch_index import BloomFilter
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for n in range(5000):
+        bloom.add(f"batch-{n}")
+
+    assert all(f"batch-{n}" in bloom for n in range(5000))
+    false_positives = sum(f"other-{n}" in bloom for n in range(5000))
+    assert false_positives < 5000 * 0.03
+
+
+def test_clone_chain_is_rejected_at_creation_and_transfer(sample_data, installed_index):
+    original = BlockChain(sample_data, "PharmaCorp", "Factory")
+    assert installed_index.origin(101) == original.blocks.get(1).hash
+    with pytest.raises(RuleViolation, match="clone"):
+        BlockChain(sample_data, "PharmaCorp", "Elsewhere")
+    with pytest.raises(RuleViolation, match="clone"):
+        BlockChain(_batch("101"), "PharmaCorp", "Elsewhere")
+
+    # A clone minted while nothing was watching still cannot change hands
+    import batch_index
+    batch_index.BATCH_INDEX = None
+    clone = BlockChain(sample_data, "PharmaCorp", "Backyard")
+    batch_index.BATCH_INDEX = installed_index
+    with pytest.raises(RuleViolation, match="clone"):
+        clone.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    original.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+
+
+def test_batch_index_persists_and_rebuilds_from_segments(tmp_path, sample_data):
+    from batch_index import BatchIndex
+    from segment_log import SegmentLog
+    first = BlockChain(_batch(401), "PharmaCorp", "Factory", segment=SegmentLog(str(tmp_path / "a")))
+    other = BlockChain(_batch(402), "PharmaCorp", "Factory", segment=SegmentLog(str(tmp_path / "b")))
+    clone = BlockChain(_batch(401), "PharmaCorp", "Backyard", segment=SegmentLog(str(tmp_path / "c")))
+    for chain in (first, other, clone):
+        chain.segment.close()
+
+    segments = [SegmentLog(str(tmp_path / name)) for name in "abc"]
+    index = BatchIndex.rebuild(segments, path=str(tmp_path / "batches.db"))
+    assert len(index) == 2
+    assert index.conflicts == [(401, clone.blocks.get(1).hash)]
+    index.close()
+
+    reopened = BatchIndex(path=str(tmp_path / "batches.db"))
+    assert reopened.origin(401) == first.blocks.get(1).hash
+    assert reopened.origin(403) is None
+    reopened.close()
+
+
+def test_batch_index_grows_past_its_capacity(tmp_path):
+    from batch_index import BatchIndex
+    index = BatchIndex(path=str(tmp_path / "batches.db"), capacity=100, error_rate=0.01)
+    for n in range(2000):
+        index.register(n, f"origin-{n}")
+    index.exact_lookups = 0
+    assert sum(index.origin(f"other-{n}") is not None for n in range(2000)) == 0
+    assert index.exact_lookups < 2000 * 0.03
+    index.close()
+
+    reopened = BatchIndex(path=str(tmp_path / "batches.db"), capacity=100)
+    assert reopened._bloom._filters[0].capacity == 4000, "Sized from the rows already on disk"
+    reopened.close()
+
+
+def test_failed_mint_releases_its_batch_claim(sample_data, installed_index, monkeypatch):
+    def broken_append(self, block, expected_tip=None):
+        if block.index == 1:
+            raise OSError("disk full")
+        return original_append(self, block, expected_tip)
+    original_append = BlockChain._append_block
+    monkeypatch.setattr(BlockChain, "_append_block", broken_append)
+    with pytest.raises(OSError):
+        BlockChain(sample_data, "PharmaCorp", "Factory")
+    assert 101 not in installed_index
+
+    monkeypatch.setattr(BlockChain, "_append_block", original_append)
+    BlockChain(sample_data, "PharmaCorp", "Factory")
+    assert 101 in installed_index
+
+
+def test_installing_the_index_backfills_registry_chains(sample_data):
+    import batch_index
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=2)
+    chain = registry.create_chain(sample_data, "PharmaCorp", "Factory")
+    index = batch_index.use_batch_index(registry=registry)
+    try:
+        assert index.origin(101) == chain.blocks.get(1).hash
+        chain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    finally:
+        batch_index.BATCH_INDEX = None
+
+
+# --- Lookup Service Tests ---
+
+def test_lookup_answers_scans_without_raising():
+    from lookup import LookupService
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    registry.create_chain(_batch(501), "PharmaCorp", "Factory")
+    service = LookupService(registry)
+
+    genuine, wrong_owner, wrong_place, unknown, malformed = service.verify_many([
+        (501, "PharmaCorp", "Factory"),
+        (501, "Dist_X"),
+        (501, "PharmaCorp", "Street Market"),
+        (999999, "PharmaCorp"),
+        None,
+    ])
+    assert genuine.genuine and genuine.status == "MANUFACTURED"
+    assert wrong_owner.known and not wrong_owner.owner_matches and not wrong_owner.genuine
+    assert wrong_place.owner_matches and wrong_place.location_matches is False
+    assert not unknown.known and not unknown.genuine
+    assert malformed.error and not malformed.genuine
+
+
+def test_lookup_cache_is_invalidated_by_transfers():
+    from lookup import LookupService
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    chain = registry.create_chain(_batch(502), "PharmaCorp", "Factory")
+    service = LookupService(registry, ttl=3600)
+
+    assert service.verify(502, "PharmaCorp").genuine
+    assert service.verify(502, "PharmaCorp").genuine
+    assert service.stats()["hits"] == 1
+
+    # Straight on the chain, not through the registry: the listener still fires
+    chain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    assert not service.verify(502, "PharmaCorp").genuine
+    assert service.verify(502, "Dist_X", "Mumbai").genuine
+
+    # A cached miss is dropped once the batch gets minted
+    assert not service.verify(503, "PharmaCorp").known
+    registry.create_chain(_batch(503), "PharmaCorp", "Factory")
+    assert service.verify(503, "PharmaCorp").genuine
+
+
+def test_lookup_reads_tips_outside_its_lock():
+    from lookup import LookupService
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=4)
+    chain = registry.create_chain(_batch(504), "PharmaCorp", "Factory")
+    service = LookupService(registry, ttl=3600)
+
+    read_tip = service._tip
+    def transfer_during_read(batch_id):
+        tip = read_tip(batch_id)
+        service._tip = read_tip
+        # The listener takes the service lock, this would hang if verify_many held it
+        chain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+        return tip
+    service._tip = transfer_during_read
+
+    assert service.verify_many([(504, "PharmaCorp")])[0].genuine, "Answered from the tip it read"
+    assert service.verify(504, "Dist_X", "Mumbai").genuine, "The pre-transfer tip was not cached"
+
+
+# --- Snapshot Tests ---
+
+def _snapshotted_chain(tmp_path, transfers: int = 3):
+    from segment_log import SegmentLog
+    from snapshot import save_snapshot
+    chain = BlockChain(_batch(601), "PharmaCorp", "Factory", segment=SegmentLog(str(tmp_path / "batch_601")))
+    owners = ["Dist_X", "Retail_Y"]
+    for n in range(transfers):
+        chain.secure_add_block(owners[n % 2], "SHIPPED", "Warehouse")
+    assert chain.validate()
+    save_snapshot(chain, str(tmp_path / "batch_601.snap"))
+    return chain
+
+
+def test_snapshot_restart_loads_older_blocks_lazily(tmp_path):
+    from segment_log import SegmentLog
+    chain = _snapshotted_chain(tmp_path)
+    chain.secure_add_block("Dist_X", "SHIPPED", "After Snapshot")
+    chain.segment.close()
+
+    with SegmentLog(str(tmp_path / "batch_601")) as segment:
+        restored = BlockChain.restore(segment, snapshot=str(tmp_path / "batch_601.snap"))
+        assert restored.last_block.hash == chain.last_block.hash
+        assert restored.last_block.location == "After Snapshot"
+        assert restored.merkle.root() == chain.merkle.root()
+        assert restored.blocks.loads == 1, "Only the genesis head is decoded up front"
+        assert restored.checkpoint == (4, chain.blocks.get(4).hash)
+        assert restored.validate()
+        assert restored.blocks.loads == 1, "Incremental validation stays above the watermark"
+
+        # A history query pulls the older blocks in on demand
+        assert [block.hash for block in restored.get_all_blocks()] == [block.hash for block in chain.blocks]
+        assert chain.blocks.get(2).hash in restored.blocks
+        assert restored.validate(deep=True)
+        restored.secure_add_block("Retail_Y", "DELIVERED", "Pharmacy")
+        assert restored.last_block.transfer_history == chain.last_block.transfer_history + ["Dist_X"]
+
+
+def test_snapshot_restore_takes_the_merkle_frontier(tmp_path, monkeypatch):
+    from segment_log import SegmentLog
+    chain = _snapshotted_chain(tmp_path, transfers=5)
+    chain.segment.close()
+
+    with SegmentLog(str(tmp_path / "batch_601")) as segment:
+        reads = []
+        hash_at = segment.hash_at
+        monkeypatch.setattr(segment, "hash_at", lambda position: (reads.append(position), hash_at(position))[1])
+        restored = BlockChain.restore(segment, snapshot=str(tmp_path / "batch_601.snap"))
+        assert set(reads) == {0, 6}, "Tip, watermark and genesis head only, no Merkle leaves"
+        assert restored.merkle.root() == chain.merkle.root()
+        assert restored.merkle.inclusion_proof(2) == chain.merkle.inclusion_proof(2)
+        assert restored.merkle.consistency_proof(3) == chain.merkle.consistency_proof(3)
+
+
+def test_lazy_load_checks_the_link_to_the_block_below(tmp_path):
+    from segment_log import SegmentLog
+    chain = _snapshotted_chain(tmp_path, transfers=3)
+    chain.segment.close()
+    original = chain.blocks.get(1)
+    forged = Block(original.index, original.data, None, "0" * 64, original.location, original.added_by,
+                   original.signature, original.status, original.current_owner, original.history,
+                   timestamp=original.timestamp, sig_scheme=original.sig_scheme)
+    with SegmentLog(str(tmp_path / "forged")) as segment:
+        for block in chain.blocks:
+            segment.append(forged if block.index == 1 else block)
+
+    with SegmentLog(str(tmp_path / "forged")) as segment:
+        restored = BlockChain.restore(segment, snapshot=str(tmp_path / "batch_601.snap"))
+        with pytest.raises(ValueError, match="does not link to block 0"):
+            restored.blocks.get(1)
+
+
+def test_corrupted_snapshot_is_detected(tmp_path):
+    import json
+    from segment_log import SegmentLog
+    from snapshot import Snapshot, SnapshotError
+    chain = _snapshotted_chain(tmp_path, transfers=1)
+    chain.segment.close()
+    path = str(tmp_path / "batch_601.snap")
+
+    with open(path) as f:
+        document = json.load(f)
+    with open(path, "w") as f:
+        json.dump({**document, "body": document["body"].replace("Dist_X", "Dist_Z")}, f)
+    with pytest.raises(SnapshotError, match="checksum"):
+        Snapshot.load(path)
+
+    # A self-consistent snapshot of another chain does not match this segment's tip
+    (tmp_path / "other").mkdir()
+    other = _snapshotted_chain(tmp_path / "other", transfers=2)
+    other.segment.close()
+    with SegmentLog(str(tmp_path / "batch_601")) as segment:
+        with pytest.raises(SnapshotError, match="not in the segment"):
+            BlockChain.restore(segment, snapshot=str(tmp_path / "other" / "batch_601.snap"))
+
+
+# --- Streaming Export/Import Tests ---
+
+@pytest.mark.parametrize("format", ["ndjson", "binary"])
+def test_export_import_round_trip(format, fresh_blockchain, tmp_path):
+    import io
+    from ledger_stream import export_blocks, import_blocks, import_to_segment
+    from segment_log import SegmentLog
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Mumbai")
+    fresh_blockchain.secure_add_block("Retail_Y", "DELIVERED", "Pune")
+
+    out = io.BytesIO()
+    assert export_blocks(fresh_blockchain.blocks.iter_forward(), out, format) == 4
+
+    imported = list(import_blocks(io.BytesIO(out.getvalue())))
+    for original, copy in zip(fresh_blockchain.blocks, imported):
+        assert copy.to_record() == original.to_record()
+        assert copy.signature == original.signature
+
+    with SegmentLog(str(tmp_path / "imported")) as segment:
+        assert import_to_segment(io.BytesIO(out.getvalue()), segment) == 4
+        restored = BlockChain.restore(segment)
+        assert restored.validate(deep=True)
+        assert restored.last_block.transfer_history == ["PharmaCorp", "Dist_X"]
+
+
+def test_import_rejects_broken_links_as_it_streams(fresh_blockchain):
+    import io
+    from ledger_stream import export_blocks, import_blocks
+    for buyer in ("Dist_X", "Retail_Y", "Dist_X"):
+        fresh_blockchain.secure_add_block(buyer, "SHIPPED", "Hub")
+    out = io.BytesIO()
+    export_blocks(fresh_blockchain.blocks.iter_forward(), out)
+    lines = out.getvalue().splitlines(keepends=True)
+
+    # Dropping a block breaks the link right where it happened
+    blocks = import_blocks(io.BytesIO(b"".join(lines[:2] + lines[3:])))
+    assert [next(blocks).index for _ in range(2)] == [0, 1]
+    with pytest.raises(ValueError):
+        next(blocks)
+
+    tampered = lines[2].replace(b'"Hub"', b'"Elsewhere"')
+    with pytest.raises(ValueError, match="recorded hash"):
+        list(import_blocks(io.BytesIO(b"".join(lines[:2] + [tampered] + lines[3:]))))
+
+
+# --- Merkle Proof Tests ---
+
+def test_merkle_proofs_for_every_leaf_and_size():
+    import hashlib
+    from merkle import MerkleAccumulator, verify_consistency, verify_inclusion
+    hashes = [hashlib.sha256(str(n).encode()).hexdigest() for n in range(19)]
+    tree = MerkleAccumulator(hashes)
+
+    for size in range(1, 20):
+        root = tree.root(size)
+        for index in range(size):
+            proof = tree.inclusion_proof(index, size)
+            assert len(proof) <= size.bit_length()
+            assert verify_inclusion(hashes[index], index, size, proof, root)
+            assert not verify_inclusion(hashes[index], (index + 1) % size, size, proof, root) or size == 1
+        for old_size in range(size + 1):
+            proof = tree.consistency_proof(old_size, size)
+            assert verify_consistency(old_size, size, tree.root(old_size), root, proof)
+
+
+def test_merkle_tree_restored_from_its_frontier():
+    import hashlib
+    from merkle import MerkleAccumulator
+    hashes = [hashlib.sha256(str(n).encode()).hexdigest() for n in range(40)]
+    for size in (0, 1, 12, 16, 21):
+        full = MerkleAccumulator(hashes[:size])
+        reads = []
+        restored = MerkleAccumulator.from_frontier(size, full.frontier(), lambda p: (reads.append(p), hashes[p])[1])
+        for block_hash in hashes[size:]:
+            full.append(block_hash)
+            restored.append(block_hash)
+        assert restored.root() == full.root() and restored.root(size) == full.root(size)
+        assert not reads, "Appends only need the peaks"
+        assert all(restored.inclusion_proof(i) == full.inclusion_proof(i) for i in range(40))
+        assert all(restored.consistency_proof(s) == full.consistency_proof(s) for s in range(41))
+
+
+def test_chain_keeps_a_merkle_accumulator(fresh_blockchain):
+    from merkle import verify_consistency, verify_inclusion
+    old_size, old_root = fresh_blockchain.merkle.size, fresh_blockchain.merkle.root()
+    for buyer in ("Dist_X", "Retail_Y", "Dist_X"):
+        fresh_blockchain.secure_add_block(buyer, "SHIPPED", "Hub")
+    tree = fresh_blockchain.merkle
+    assert tree.size == len(fresh_blockchain.blocks)
+
+    # A scanner holding only block 3 and the current root
+    block = fresh_blockchain.blocks.get(3)
+    assert verify_inclusion(block.hash, 3, tree.size, tree.inclusion_proof(3), tree.root())
+    forged = fresh_blockchain.blocks.get(2).hash
+    assert not verify_inclusion(forged, 3, tree.size, tree.inclusion_proof(3), tree.root())
+
+    proof = tree.consistency_proof(old_size)
+    assert verify_consistency(old_size, tree.size, old_root, tree.root(), proof)
+    assert not verify_consistency(old_size, tree.size, tree.root(1), tree.root(), proof)
+
+
+# --- Audit Tests ---
+
+def _persisted_chains(tmp_path, count: int = 3, transfers: int = 2):
+    from segment_log import SegmentLog
+    paths = []
+    for n in range(count):
+        path = str(tmp_path / f"batch_{701 + n}")
+        chain = BlockChain(_batch(701 + n), "PharmaCorp", "Factory", segment=SegmentLog(path))
+        for hop in range(transfers):
+            chain.secure_add_block(["Dist_X", "Retail_Y"][hop % 2], "SHIPPED", "Hub")
+        chain.segment.close()
+        paths.append(path)
+    return paths
+
+
+def _forge_signature(path, position):
+    # A forger who also recomputes the block hash; only the signature check can tell
+    from segment_log import SegmentLog
+    with SegmentLog(path) as segment:
+        blocks = [Block.from_bytes(segment.read(p)) for p in range(len(segment))]
+    original = blocks[position]
+    blocks[position] = Block(
+        original.index, original.data, None, original.previous_hash, original.location, original.added_by,
+        b"forged", original.status, original.current_owner, original.history,
+        timestamp=original.timestamp, sig_scheme=original.sig_scheme
+    )
+    with SegmentLog(path + "_forged") as forged:
+        for block in blocks:
+            forged.append(block)
+    return path + "_forged"
+
+
+def test_audit_verifies_links_and_stored_signatures(tmp_path):
+    from audit import AuditEngine, audit_chain
+    paths = _persisted_chains(tmp_path)
+    forged = _forge_signature(paths[0], 3)
+    progress = []
+    results = {a.path: a for a in AuditEngine(processes=1, progress=progress.append).run(paths + [forged])}
+
+    assert all(results[path].ok and results[path].blocks == 4 for path in paths)
+    assert results[paths[1]].batch_id == 702
+    assert [(f.index, f.kind) for f in results[forged].findings] == [(3, "bad_signature")]
+    assert [p.chains_done for p in progress] == [1, 2, 3, 4]
+    assert progress[-1].blocks == 16 and progress[-1].blocks_per_s > 0
+
+    chain = BlockChain(_batch(799), "PharmaCorp", "Factory")
+    chain.secure_add_block("Dist_X", "SHIPPED", "Hub")
+    assert audit_chain(chain).ok
+
+
+def test_audit_reports_unknown_signers_and_unreadable_chains(tmp_path):
+    from audit import AuditEngine, public_key_pems
+    paths = _persisted_chains(tmp_path, count=1)
+    (tmp_path / "junk.seg").write_bytes(b"not a segment")
+
+    engine = AuditEngine(processes=0, keys=public_key_pems(["PharmaCorp"]))
+    results = {a.path: a for a in engine.run(paths + [str(tmp_path / "junk")])}
+    # Block 3 is signed by Dist_X, whose key the auditor was not given
+    assert [(f.index, f.kind) for f in results[paths[0]].findings] == [(3, "unknown_signer")]
+    assert [f.kind for f in results[str(tmp_path / "junk")].findings] == ["unreadable"]
+
+
+def _rewrite_record(path, position, **changes):
+    # Edits a record in place of the files, keeping its recorded hash and a valid checksum
+    import json
+    import zlib
+    from segment_log import DATA_MAGIC, INDEX_ENTRY, INDEX_MAGIC, RECORD_HEADER, SegmentReader
+    with SegmentReader(path) as segment:
+        records = [(segment.read(p), segment.entry(p)[3]) for p in range(len(segment))]
+    payload, block_hash = records[position]
+    records[position] = (json.dumps({**json.loads(payload), **changes}).encode(), block_hash)
+    data, index = [DATA_MAGIC], [INDEX_MAGIC]
+    offset = len(DATA_MAGIC)
+    for payload, block_hash in records:
+        crc = zlib.crc32(payload)
+        data.append(RECORD_HEADER.pack(len(payload), crc) + payload)
+        index.append(INDEX_ENTRY.pack(offset, len(payload), crc, block_hash))
+        offset += RECORD_HEADER.size + len(payload)
+    with open(f"{path}.seg", "wb") as f:
+        f.write(b"".join(data))
+    with open(f"{path}.idx", "wb") as f:
+        f.write(b"".join(index))
+
+
+def test_audit_reads_segments_without_changing_them(tmp_path):
+    import os
+    from audit import AuditEngine
+    tampered, torn = _persisted_chains(tmp_path, count=2)
+    _rewrite_record(tampered, 2, location="Elsewhere")
+    with open(f"{torn}.seg", "ab") as f:
+        f.write(b"\x00\x00\x01")
+    torn_size = os.path.getsize(f"{torn}.seg")
+    missing = str(tmp_path / "missing")
+
+    results = {a.path: a for a in AuditEngine(processes=0).run([tampered, torn, missing])}
+    assert (2, "hash_mismatch") in [(f.index, f.kind) for f in results[tampered].findings]
+    assert [(f.index, f.kind) for f in results[torn].findings] == [(4, "torn_tail")]
+    assert os.path.getsize(f"{torn}.seg") == torn_size, "The torn tail is reported, not cut off"
+    assert [f.kind for f in results[missing].findings] == ["unreadable"]
+    assert not os.path.exists(f"{missing}.seg") and not os.path.exists(f"{missing}.idx")
+
+
+def test_audit_reports_rewritten_history(tmp_path):
+    from audit import AuditEngine
+    from block import History
+    from segment_log import SegmentLog
+    stale, forged = _persisted_chains(tmp_path, count=2, transfers=3)
+    # An earlier owner replaced, the recorded hash left as it was
+    _rewrite_record(stale, 3, transfer_history=["Mallory", "Dist_X"])
+
+    # A forger who also recomputes the hash; no signature covers the history
+    with SegmentLog(forged) as segment:
+        blocks = [Block.from_bytes(segment.read(p)) for p in range(len(segment))]
+    original = blocks[3]
+    blocks[3] = Block(
+        original.index, original.data, None, original.previous_hash, original.location, original.added_by,
+        original.signature, original.status, original.current_owner, History.from_iterable(["Mallory", "Dist_X"]),
+        timestamp=original.timestamp, sig_scheme=original.sig_scheme
+    )
+    with SegmentLog(forged + "_rewritten") as segment:
+        for block in blocks:
+            segment.append(block)
+
+    results = {a.path: a for a in AuditEngine(processes=0).run([stale, forged + "_rewritten"])}
+    assert {(3, "hash_mismatch"), (3, "bad_history")} <= {(f.index, f.kind) for f in results[stale].findings}
+    assert (3, "bad_history") in [(f.index, f.kind) for f in results[forged + "_rewritten"].findings]
+
+
+def test_audit_resumes_after_interruption(tmp_path):
+    from audit import AuditEngine
+    paths = _persisted_chains(tmp_path, count=4, transfers=1)
+    state = str(tmp_path / "audit_state.jsonl")
+
+    first = AuditEngine(processes=0, state_path=state).run(paths)
+    done = [next(first).path for _ in range(2)]
+    first.close()       # interrupted
+
+    progress = []
+    resumed = [a.path for a in AuditEngine(processes=0, state_path=state, progress=progress.append).run(paths)]
+    assert sorted(resumed + done) == sorted(paths)
+    assert progress[-1].chains_done == progress[-1].chains_total == 4
+
+
+# --- Workload Generator Tests ---
+
+def _small_workload(**overrides):
+    from workload import StakeholderGraph, Workload, WorkloadSpec
+    graph = StakeholderGraph(("PharmaCorp",), ("Dist_X",), ("Retail_Y",))
+    spec = WorkloadSpec(**{"batches": 60, "in_flight": 8, "first_batch_id": 8001, "seed": 7, **overrides})
+    return Workload(spec, graph)
+
+
+def test_workload_is_reproducible_and_follows_the_graph():
+    from workload import StakeholderGraph
+    ops = list(_small_workload())
+    assert ops == list(_small_workload())
+    assert ops != list(_small_workload(seed=8))
+
+    graph = StakeholderGraph.from_stakeholders()
+    assert "PharmaCorp" in graph.manufacturers and graph.distributors == ("Dist_X",)
+    assert "SYSTEM" not in graph.manufacturers + graph.retailers
+
+    # Every genuine batch is minted before it moves and ends with a retailer
+    seen, last_hop = set(), {}
+    for op in ops:
+        if op.kind == "create":
+            seen.add(op.batch_id)
+        elif op.kind == "transfer":
+            assert op.batch_id in seen
+            last_hop[op.batch_id] = op
+    assert all(op.final for op in last_hop.values())
+    assert all(op.actor == "Retail_Y" for op in last_hop.values() if op.expect_commit)
+
+
+def test_workload_driver_refuses_every_injected_attack(installed_index):
+    from workload import run_workload
+    workload = _small_workload(counterfeit_rate=0.1, clone_rate=0.1, expiry_mix={"valid": 0.8, "expired": 0.2})
+    kinds = {op.kind for op in workload}
+    assert {"create", "transfer", "clone", "counterfeit"} <= kinds
+
+    report = run_workload(workload, trace_memory=True)
+    assert report.operations == len(list(workload))
+    assert report.rejected > 0 and report.undetected == 0 and report.failed == 0
+    assert report.committed + report.rejected == report.operations
+    assert report.p50_ms <= report.p99_ms <= report.max_ms
+    assert report.peak_bytes > 0
+
+
+def test_workload_driver_holds_a_target_rate(installed_index):
+    from workload import run_workload
+    workload = _small_workload(batches=10, hops={1: 1})
+    report = run_workload(workload, rate=100)
+    assert report.operations == 20
+    assert report.seconds >= 19 / 100
+
+
+# --- Temporal Index Tests ---
+
+def test_chain_timeline_answers_point_in_time_queries(fresh_blockchain):
+    from temporal import ChainTimeline
+    timeline = ChainTimeline(fresh_blockchain)
+    for buyer, location in (("Dist_X", "Depot"), ("Retail_Y", "Pharmacy"), ("Dist_X", "Returns")):
+        fresh_blockchain.secure_add_block(buyer, "SHIPPED", location)
+    blocks = fresh_blockchain.get_all_blocks()
+    assert len(timeline) == len(blocks), "Built from the chain, then kept current on append"
+
+    assert timeline.at(blocks[0].timestamp - 1) is None
+    for block in blocks:
+        assert timeline.at(block.timestamp) is block
+    third = blocks[3]
+    assert timeline.owner_at(third.timestamp) == "Retail_Y"
+    assert timeline.location_at(third.timestamp) == "Pharmacy"
+    assert timeline.status_at(blocks[-1].timestamp + 3600) == "SHIPPED"
+    assert timeline.between(blocks[2].timestamp, blocks[3].timestamp) == blocks[2:4]
+
+    times = [blocks[4].timestamp, blocks[0].timestamp - 1, blocks[2].timestamp]
+    assert timeline.at_many(times) == [timeline.at(t) for t in times]
+
+    timeline.close()
+    fresh_blockchain.secure_add_block("Retail_Y", "DELIVERED", "Pharmacy")
+    assert len(timeline) == len(blocks)
+
+
+def test_ledger_timeline_covers_existing_and_new_chains():
+    from registry import LedgerRegistry
+    from temporal import LedgerTimeline
+    registry = LedgerRegistry(shards=2)
+    early = registry.create_chain(_batch(901), "PharmaCorp", "Factory")
+    index = LedgerTimeline(registry)
+    late = registry.create_chain(_batch(902), "PharmaCorp", "Factory")
+    registry.transfer(901, "Dist_X", "SHIPPED", "Depot")
+    registry.transfer(902, "Dist_X", "SHIPPED", "Depot")
+    registry.transfer(901, "Retail_Y", "DELIVERED", "Pharmacy")
+
+    assert len(index) == len(early.blocks) + len(late.blocks)
+    shipped = early.blocks.get(2)
+    assert index.owner_at(901, shipped.timestamp) == "Dist_X"
+    assert index.at(903, shipped.timestamp) is None
+
+    hops = index.between(shipped.timestamp, early.last_block.timestamp)
+    assert [(batch_id, block.index) for batch_id, block in hops] == [(901, 2), (902, 2), (901, 3)]
+
+    queries = [(902, late.last_block.timestamp), (901, shipped.timestamp), (901, 0.0), (903, 1.0)]
+    assert index.bulk_at(queries) == [late.last_block, shipped, None, None]
+
+
+def test_ledger_timeline_keeps_a_lazy_restore_lazy(tmp_path):
+    from registry import LedgerRegistry
+    from segment_log import SegmentLog
+    from temporal import LedgerTimeline
+    chain = _snapshotted_chain(tmp_path, transfers=4)
+    chain.segment.close()
+    with SegmentLog(str(tmp_path / "batch_601")) as segment:
+        restored = BlockChain.restore(segment, snapshot=str(tmp_path / "batch_601.snap"))
+        registry = LedgerRegistry(shards=2)
+        registry.add_chain(restored)
+        loads = restored.blocks.loads
+        index = LedgerTimeline(registry)
+        assert len(index) == len(chain.blocks)
+        assert restored.blocks.loads == loads, "Timestamps come from the records, no block is decoded"
+
+        shipped = chain.blocks.get(2)
+        assert index.at(601, shipped.timestamp).hash == shipped.hash
+        assert restored.blocks.loads == loads + 1
+
+
+# --- Inventory Index Tests ---
+
+def test_inventory_follows_transfers_and_pages():
+    from inventory import InventoryIndex
+    from registry import LedgerRegistry
+    registry = LedgerRegistry(shards=2)
+    registry.create_chain(_batch(951), "PharmaCorp", "Factory")
+    inventory = InventoryIndex(registry)
+    for batch_id in range(952, 957):
+        registry.create_chain(_batch(batch_id), "PharmaCorp", "Factory")
+    assert inventory.count_held_by("PharmaCorp") == 6
+    assert inventory.count_with_status("MANUFACTURED") == 6
+
+    for batch_id in (951, 953, 955):
+        registry.transfer(batch_id, "Dist_X", "SHIPPED", "Depot")
+    registry.transfer(953, "Retail_Y", "DELIVERED", "Pharmacy")
+    assert sorted(inventory.held_by("Dist_X")) == [951, 955]
+    assert inventory.holder(953) == ("Retail_Y", "DELIVERED")
+    assert inventory.count_held_by("PharmaCorp") == 3 and inventory.count_with_status("SHIPPED") == 2
+    assert inventory.owners() == {"PharmaCorp": 3, "Dist_X": 2, "Retail_Y": 1}
+    assert inventory.count_held_by("Nobody") == 0 and inventory.held_by("Nobody") == []
+
+    pages = list(inventory.iter_held_by("PharmaCorp", page_size=2))
+    assert [len(page) for page in pages] == [2, 1]
+    assert sorted(sum(pages, [])) == [952, 954, 956]
+    assert inventory.with_status("MANUFACTURED", offset=1, limit=1) == inventory.with_status("MANUFACTURED")[1:2]
+    assert inventory.check() == []
+
+
+def test_inventory_rebuild_reports_and_repairs_drift(fresh_blockchain):
+    from inventory import InventoryIndex
+    inventory = InventoryIndex()
+    inventory.track(fresh_blockchain)
+    fresh_blockchain.secure_add_block("Dist_X", "SHIPPED", "Depot")
+    assert inventory.held_by("Dist_X") == [101]
+
+    inventory.untrack(fresh_blockchain)
+    fresh_blockchain.secure_add_block("Retail_Y", "DELIVERED", "Pharmacy")
+    inventory._on_append(None, fresh_blockchain.blocks.get(2))   # a stale copy
+    problems = inventory.check([fresh_blockchain])
+    assert problems and "Retail_Y" in problems[0]
+
+    assert inventory.rebuild([fresh_blockchain]) == problems
+    assert inventory.check([fresh_blockchain]) == []
+    assert inventory.held_by("Retail_Y") == [101] and inventory.count_held_by("Dist_X") == 0
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives import serialization
+
+
+class VerificationCache:
+    """
+    Bounded LRU of signatures that already verified, keyed by
+    (scheme, signer key fingerprint, payload digest, signature digest).
+    Only successful verifications are cached; a failure always re-runs the check.
+    """
+
+    def __init__(self, maxsize: int = 8192):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, public_key) -> bytes:
+        """
+        SHA-256 of the key's SubjectPublicKeyInfo. Recomputed on every call (~2us):
+        key objects are neither hashable nor weak-referenceable, and memoizing
+        by id() would pin every key ever seen.
+        """
+        der = public_key.public_bytes(
+            encoding=serialization.Encoding.DER,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return hashlib.sha256(der).digest()
+
+    def verify(self, scheme, public_key, signature: bytes, payload: bytes):
+        """scheme.verify() unless this exact triple already passed; raises like scheme.verify()."""
+        key = (
+            scheme.name,
+            self.fingerprint(public_key),
+            hashlib.sha256(payload).digest(),
+            hashlib.sha256(signature).digest()
+        )
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return
+            self.misses += 1
+
+        scheme.verify(public_key, signature, payload)
+
+        with self._lock:
+            self._entries[key] = True
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_key(self, public_key) -> int:
+        """Forgets everything verified with public_key (rotation/revocation). Returns entries dropped."""
+        fingerprint = self.fingerprint(public_key)
+        with self._lock:
+            stale = [key for key in self._entries if key[1] == fingerprint]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by SecureTransfer.receive_transfer and RuleEngine._verify_signature
+VERIFY_CACHE = VerificationCache()
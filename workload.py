@@ -0,0 +1,292 @@
+"""
+Synthetic supply-chain load for capacity testing.
+Usage: python workload.py [--batches N] [--rate OPS_PER_S] [--seed S] [--batch-index]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import NamedTuple
+
+import key_gen
+from block import data
+from blockchain import BlockChain
+
+
+@dataclass(frozen=True)
+class StakeholderGraph:
+    """Who can ship to whom: manufacturers -> distributors (one or more) -> retailers."""
+    manufacturers: tuple
+    distributors: tuple
+    retailers: tuple
+
+    @classmethod
+    def from_stakeholders(cls, names=None) -> 'StakeholderGraph':
+        """Sorts names (default key_gen.stakeholders) into roles by their prefix; SYSTEM takes no part."""
+        roles = {"manufacturers": [], "distributors": [], "retailers": []}
+        for name in key_gen.stakeholders if names is None else names:
+            if name == "SYSTEM":
+                continue
+            if name.startswith("Dist"):
+                roles["distributors"].append(name)
+            elif name.startswith("Retail"):
+                roles["retailers"].append(name)
+            else:
+                roles["manufacturers"].append(name)
+        if not all(roles.values()):
+            raise ValueError("A stakeholder graph needs at least one manufacturer, distributor and retailer")
+        return cls(**{role: tuple(members) for role, members in roles.items()})
+
+    def route(self, rng: random.Random, hops: int) -> list[str]:
+        """Buyers of a batch's hops: distributors first, a retailer last."""
+        route = []
+        for _ in range(hops - 1):
+            # Prefer handing on to a different distributor when there is one
+            choices = [d for d in self.distributors if not route or d != route[-1]] or self.distributors
+            route.append(rng.choice(choices))
+        route.append(rng.choice(self.retailers))
+        return route
+
+
+class Operation(NamedTuple):
+    kind: str               # create, transfer, counterfeit (unlicensed mint) or clone (re-mint of a known batch)
+    batch_id: int
+    actor: str              # creator for mints, buyer for transfers
+    status: str
+    location: str
+    medicine: data = None   # mints only
+    expect_commit: bool = True
+    final: bool = False     # last operation on this batch
+
+
+@dataclass
+class WorkloadSpec:
+    batches: int = 1000
+    hops: dict = field(default_factory=lambda: {1: 1, 2: 3, 3: 4, 5: 2})   # hop count -> weight
+    expiry_mix: dict = field(default_factory=lambda: {"valid": 0.9, "near_expiry": 0.07, "expired": 0.03})
+    counterfeit_rate: float = 0.01      # share of mints by an unlicensed manufacturer
+    clone_rate: float = 0.01            # share of mints reusing the batch_id of an earlier batch
+    in_flight: int = 64                 # batches moving through the supply chain at once
+    first_batch_id: int = 1
+    seed: int = 0
+
+
+_UNLICENSED = "Unlicensed_Lab"
+
+
+def _expiry(rng: random.Random, kind: str, today: date) -> date:
+    if kind == "valid":
+        return today + timedelta(days=rng.randint(180, 1095))
+    if kind == "near_expiry":
+        return today + timedelta(days=rng.randint(1, 30))
+    if kind == "expired":
+        return today - timedelta(days=rng.randint(0, 365))
+    raise ValueError(f"Unknown expiry kind '{kind}'")
+
+
+class Workload:
+    """
+    Seeded stream of ledger operations: every iteration yields the same sequence.
+    Hops of up to spec.in_flight batches are interleaved the way a busy supply
+    chain would. Operations are generated lazily and only the in-flight batches
+    (plus a bounded sample of batch ids to clone) are remembered, so millions of
+    batches cost no more memory than a thousand.
+    """
+
+    def __init__(self, spec: WorkloadSpec = None, graph: StakeholderGraph = None):
+        self.spec = spec or WorkloadSpec()
+        self.graph = graph or StakeholderGraph.from_stakeholders()
+
+    def __iter__(self):
+        spec, graph = self.spec, self.graph
+        rng = random.Random(spec.seed)
+        today = date.today()
+        hop_counts, hop_weights = list(spec.hops), list(spec.hops.values())
+        expiry_kinds, expiry_weights = list(spec.expiry_mix), list(spec.expiry_mix.values())
+        minted = deque(maxlen=1024)     # recently minted genuine batches, clone targets
+        active = []                     # [batch_id, route, next hop, expired]
+        next_id = spec.first_batch_id
+
+        for _ in range(spec.batches):
+            attack = rng.random()
+            if attack < spec.clone_rate and minted:
+                original = rng.choice(minted)
+                yield Operation("clone", original.batch_id, rng.choice(graph.manufacturers), "MANUFACTURED",
+                                "Backyard", original, expect_commit=False, final=True)
+            else:
+                batch_id, next_id = next_id, next_id + 1
+                kind = rng.choices(expiry_kinds, expiry_weights)[0]
+                name, expiry = f"Medicine {batch_id % 500}", _expiry(rng, kind, today)
+                if attack < spec.clone_rate + spec.counterfeit_rate:
+                    yield Operation("counterfeit", batch_id, _UNLICENSED, "MANUFACTURED", f"{_UNLICENSED} Site",
+                                    data(batch_id, name, _UNLICENSED, expiry), expect_commit=False, final=True)
+                else:
+                    maker = rng.choice(graph.manufacturers)
+                    medicine = data(batch_id, name, maker, expiry)
+                    route = graph.route(rng, rng.choices(hop_counts, hop_weights)[0])
+                    minted.append(medicine)
+                    yield Operation("create", batch_id, maker, "MANUFACTURED", f"{maker} Plant", medicine)
+                    active.append([batch_id, route, 0, kind == "expired"])
+
+            # Move batches along until there is room for the next one
+            while len(active) >= spec.in_flight:
+                yield self._advance(rng, active)
+        while active:
+            yield self._advance(rng, active)
+
+    @staticmethod
+    def _advance(rng: random.Random, active: list) -> Operation:
+        slot = rng.randrange(len(active))
+        batch = active[slot]
+        batch_id, route, hop, expired = batch
+        buyer = route[hop]
+        final = hop == len(route) - 1 or expired    # an expired batch goes nowhere
+        if final:
+            active[slot] = active[-1]
+            active.pop()
+        else:
+            batch[2] += 1
+        status = "DELIVERED" if hop == len(route) - 1 else "SHIPPED"
+        return Operation("transfer", batch_id, buyer, status, f"{buyer} Warehouse",
+                         expect_commit=not expired, final=final)
+
+
+@dataclass
+class WorkloadReport:
+    operations: int = 0
+    committed: int = 0
+    rejected: int = 0           # refused as expected: counterfeits, clones, expired batches
+    undetected: int = 0         # should have been refused but went through
+    failed: int = 0             # legitimate operations that were refused
+    seconds: float = 0.0
+    target_rate: float = None
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    peak_bytes: int = None      # tracemalloc peak, when traced
+
+    @property
+    def ops_per_s(self) -> float:
+        return self.operations / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "operations": self.operations, "committed": self.committed, "rejected": self.rejected,
+            "undetected": self.undetected, "failed": self.failed, "seconds": self.seconds,
+            "ops_per_s": self.ops_per_s, "target_rate": self.target_rate,
+            "p50_ms": self.p50_ms, "p99_ms": self.p99_ms, "max_ms": self.max_ms, "peak_bytes": self.peak_bytes,
+        }
+
+
+def _percentile(ordered, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _apply(operation: Operation, chains: dict, registry):
+    if operation.kind == "transfer":
+        if registry is not None:
+            chain = registry.get(operation.batch_id)
+        else:
+            # Done with the batch after its last hop, whether that hop is refused or not
+            chain = chains.pop(operation.batch_id) if operation.final else chains[operation.batch_id]
+        chain.secure_add_block(operation.actor, operation.status, operation.location)
+    elif registry is not None:
+        registry.create_chain(operation.medicine, operation.actor, operation.location)
+    else:
+        chain = BlockChain(operation.medicine, operation.actor, operation.location)
+        if operation.kind == "create":
+            # A clone that got through must not replace the genuine chain
+            chains[operation.batch_id] = chain
+
+
+def run_workload(workload, rate: float = None, registry=None, trace_memory: bool = False) -> WorkloadReport:
+    """
+    Drives workload through BlockChain/secure_add_block and reports what it sustained.
+
+    With rate (operations per second) the load is open-loop: operation i is due
+    at start + i / rate and its latency counts from then, so time spent waiting
+    behind a ledger that cannot keep up shows in the tail instead of hiding.
+    Without rate operations run back to back.
+    Chains live in registry if one is given, else only until their last hop.
+    Without a registry, clones are only caught with a batch index installed
+    (batch_index.use_batch_index()).
+    trace_memory records the peak with tracemalloc, which slows everything down.
+    """
+    report = WorkloadReport(target_rate=rate)
+    latencies = array("d")
+    chains = {}
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        for n, operation in enumerate(workload):
+            due = time.perf_counter()
+            if rate:
+                due = start + n / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                _apply(operation, chains, registry)
+                ok = True
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - due)
+
+            report.operations += 1
+            if ok:
+                report.committed += operation.expect_commit
+                report.undetected += not operation.expect_commit
+            else:
+                report.rejected += not operation.expect_commit
+                report.failed += operation.expect_commit
+        report.seconds = time.perf_counter() - start
+        if trace_memory:
+            report.peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    report.p50_ms = _percentile(ordered, 0.50) * 1e3
+    report.p99_ms = _percentile(ordered, 0.99) * 1e3
+    report.max_ms = ordered[-1] * 1e3 if ordered else 0.0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=1000)
+    parser.add_argument("--rate", type=float, help="target operations per second (default: as fast as possible)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--in-flight", type=int, default=64)
+    parser.add_argument("--counterfeit-rate", type=float, default=0.01)
+    parser.add_argument("--clone-rate", type=float, default=0.01)
+    parser.add_argument("--batch-index", action="store_true", help="install a batch index so clones are caught")
+    parser.add_argument("--trace-memory", action="store_true")
+    args = parser.parse_args(argv)
+
+    import logging
+    import batch_index
+    # Every refused attack logs a warning, keep the report readable
+    logging.getLogger("medichain").setLevel(logging.ERROR)
+    missing = [name for name in key_gen.stakeholders if name not in key_gen.PRIVATE_KEYS]
+    key_gen.generate_keys_for_stakeholders(missing)
+    if args.batch_index:
+        batch_index.use_batch_index(capacity=max(args.batches, 1000))
+
+    spec = WorkloadSpec(batches=args.batches, in_flight=args.in_flight, seed=args.seed,
+                        counterfeit_rate=args.counterfeit_rate, clone_rate=args.clone_rate)
+    report = run_workload(Workload(spec), rate=args.rate, trace_memory=args.trace_memory)
+    for name, value in report.as_dict().items():
+        print(f"  {name:<14} {value}")
+
+
+if __name__ == "__main__":
+    main()